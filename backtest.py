@@ -0,0 +1,153 @@
+from array import array
+from dataclasses import dataclass
+
+import numpy as np
+
+from portfolio import Portfolio
+from portfolio_arrays import rebalance_arrays, sequential_sum
+from rebalance import Rebalance
+from rebalance_plan import RebalancePlan
+
+
+def load_prices(path: str, n_tickers: int | None = None) -> np.ndarray:
+    """ Abre un historial de precios (pasos x tickers) como memoria mapeada, sin leerlo completo.
+    Acepta archivos .npy, o binarios crudos de float64 en orden fila por fila indicando n_tickers."""
+    if path.endswith(".npy"):
+        prices = np.load(path, mmap_mode="r")
+    else:
+        if n_tickers is None:
+            raise ValueError("Para un archivo binario crudo se debe indicar la cantidad de tickers")
+        prices = np.memmap(path, dtype=np.float64, mode="r").reshape(-1, n_tickers)
+    if prices.ndim != 2:
+        raise ValueError("El historial de precios debe tener 2 dimensiones (pasos x tickers)")
+    return prices
+
+
+@dataclass
+class BacktestResult:
+    """ Resultado de un backtest"""
+
+    plan: RebalancePlan #Todas las operaciones en el orden en que se ejecutaron
+    steps: array #Paso en que se ejecuto cada operacion del plan
+    values: np.ndarray #Valor del portafolio en cada paso, despues de las operaciones
+    holdings: dict[str, float] #Cantidad final de acciones
+    turnover: float #Valor total operado dividido por el valor promedio del portafolio
+    tracking_error: float #Desviacion estandar de la diferencia de retornos contra el portafolio objetivo
+
+    @property
+    def trades(self) -> list[tuple[int, Rebalance]]:
+        """ (paso, operacion) en el orden en que se ejecutaron, los Rebalance se crean al pedirlos"""
+        return list(zip(self.steps, self.plan))
+
+    @property
+    def n_trades(self) -> int:
+        return len(self.plan)
+
+    @property
+    def n_rebalances(self) -> int:
+        """ Cantidad de pasos en que se rebalanceo"""
+        return len(set(self.steps))
+
+
+class Backtest:
+    """ Simula el rebalanceo por tolerancia de un portafolio a lo largo de un historial de precios.
+    El historial se recorre en bloques: la desviacion de todos los pasos del bloque se revisa de forma vectorizada
+    y solo se avanza paso a paso hasta el primer rebalanceo, donde cambian las cantidades.
+    Las operaciones son las mismas que entregaria Portfolio.rebalance en cada paso."""
+
+    def __init__(self, portfolio: Portfolio, prices: np.ndarray, tickers: list[str]):
+        if prices.ndim != 2 or prices.shape[1] != len(tickers):
+            raise ValueError("El historial de precios debe tener una columna por ticker")
+        portfolio.check_single_currency()
+        if not portfolio.target_allocation:
+            raise ValueError("No se ha establecido una distribucion objetivo para el portafolio")
+        missing = [name for name in portfolio.stocks if name not in tickers]
+        if missing:
+            raise ValueError(f"No hay historial de precios para {', '.join(missing)}")
+
+        self._tickers = list(tickers)
+        self._prices = prices
+        holdings = portfolio.holdings
+        targets = portfolio.target_allocation
+        self._shares = np.array([holdings.get(name, 0.0) for name in tickers], dtype=float)
+        self._targets = np.array([targets.get(name, 0.0) for name in tickers], dtype=float)
+        self._has_target = np.array([name in targets for name in tickers])
+
+    def run(self, tolerance: float = 0.01, chunk_size: int = 1024) -> BacktestResult:
+        prices = self._prices
+        steps = len(prices)
+        shares = self._shares.copy()
+        targets, has_target = self._targets, self._has_target
+        # Columnas de las operaciones de cada rebalanceo, se juntan en un solo plan al final
+        trade_steps, trade_cols = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.intp)]
+        trade_buys, trade_shares, trade_values = [np.zeros(0, dtype=bool)], [np.zeros(0)], [np.zeros(0)]
+        traded_value = 0.0
+        pre_values = np.empty(steps) #Valor al llegar al paso (con las cantidades anteriores)
+        post_values = np.empty(steps) #Valor despues de rebalancear en el paso
+
+        t = 0
+        while t < steps:
+            block = np.asarray(prices[t:t + chunk_size])
+            total = sequential_sum(block * shares)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                value_diff, trade = rebalance_arrays(block, shares, targets, total[:, None], tolerance)
+            trade &= has_target
+            # Un portafolio sin valor no se puede rebalancear
+            trade &= (total != 0)[:, None]
+
+            triggered = np.flatnonzero(trade.any(axis=1))
+            stop = triggered[0] + 1 if len(triggered) else len(block)
+            pre_values[t:t + stop] = total[:stop]
+            post_values[t:t + stop] = total[:stop]
+            if not len(triggered):
+                t += stop
+                continue
+
+            row = stop - 1
+            cols = np.flatnonzero(trade[row])
+            diff = value_diff[row, cols]
+            trade_prices = block[row, cols]
+            if (trade_prices == 0).any():
+                raise ZeroDivisionError("float division by zero")
+            values = np.abs(diff)
+            amounts = values / trade_prices
+            shares[cols] += np.where(diff > 0, amounts, -amounts)
+            traded_value += float(values.sum())
+            trade_steps.append(np.full(len(cols), t + row, dtype=np.int64))
+            trade_cols.append(cols)
+            trade_buys.append(diff > 0)
+            trade_shares.append(amounts)
+            trade_values.append(values)
+            post_values[t + row] = sequential_sum(block[row] * shares)
+            t += stop
+
+        mean_value = post_values.mean() if steps else 0.0
+        plan = RebalancePlan.from_arrays([self._tickers[col] for col in np.concatenate(trade_cols).tolist()],
+                                         np.concatenate(trade_buys), np.concatenate(trade_shares),
+                                         np.concatenate(trade_values))
+        return BacktestResult(
+            plan=plan,
+            steps=array("q", np.concatenate(trade_steps).tobytes()),
+            values=post_values,
+            holdings=dict(zip(self._tickers, shares.tolist())),
+            turnover=traded_value / mean_value if mean_value else 0.0,
+            tracking_error=self._tracking_error(pre_values, post_values, chunk_size),
+        )
+
+    def _tracking_error(self, pre_values: np.ndarray, post_values: np.ndarray, chunk_size: int) -> float:
+        """ Desviacion estandar de (retorno del portafolio - retorno del objetivo rebalanceado en cada paso)"""
+        steps = len(pre_values)
+        if steps < 3:
+            return 0.0
+        weights = self._targets / self._targets.sum()
+        target_returns = np.empty(steps - 1)
+        for start in range(0, steps - 1, chunk_size):
+            block = np.asarray(self._prices[start:start + chunk_size + 1])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                asset_returns = block[1:] / block[:-1] - 1
+            target_returns[start:start + len(block) - 1] = np.nan_to_num(asset_returns) @ weights
+        with np.errstate(divide="ignore", invalid="ignore"):
+            portfolio_returns = pre_values[1:] / post_values[:-1] - 1
+        difference = portfolio_returns - target_returns
+        difference = difference[np.isfinite(difference)]
+        return float(difference.std(ddof=1)) if len(difference) > 1 else 0.0
@@ -0,0 +1,279 @@
+""" Rebalanceo por lotes de archivos grandes de portafolios, sin cargarlos completos en memoria.
+
+Uso:
+    python batch_rebalance.py portafolios.jsonl precios.csv --output acciones.jsonl
+    python batch_rebalance.py portafolios.csv precios.jsonl --format csv --workers 8 --tolerance 0.02
+
+Portafolios en JSONL (uno por linea):
+    {"name": "Jhano", "holdings": {"META": 10, "AAPL": 30}, "target": {"META": 0.4, "AAPL": 0.6}}
+Portafolios en CSV (columnas name,ticker,shares,target; las filas de un portafolio deben ser contiguas
+y target puede quedar vacio si la accion no tiene objetivo).
+Precios en CSV (ticker,price) o JSONL ({"ticker": "META", "price": 520.5}), se cargan completos en memoria.
+
+La salida tiene una fila por operacion (portfolio, ticker, action, shares, value) y se escribe a medida que se procesa,
+en el mismo orden que la entrada aunque se usen varios procesos. Un portafolio que no se puede leer o rebalancear
+(linea mal formada, cantidades no numericas, precio 0, etc.) se reporta como error y la corrida sigue con los demas.
+"""
+import argparse
+import csv
+import json
+import sys
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import groupby, islice
+from typing import TextIO
+
+from portfolio import Portfolio
+from rebalance_plan import RebalancePlan
+from stock import Stock
+
+OUTPUT_COLUMNS = ("portfolio", "ticker", "action", "shares", "value")
+
+
+@dataclass
+class PortfolioRecord:
+    """ Un portafolio leido del archivo de entrada"""
+
+    name: str
+    holdings: dict[str, float]
+    target: dict[str, float]
+    line: int #Linea del archivo donde empieza, para reportar errores
+    error: str | None = None #Error al leer el registro, se reporta al rebalancear
+
+
+@dataclass
+class BatchStats:
+    """ Contadores de una corrida"""
+
+    portfolios: int = 0 #Portafolios procesados (con o sin error)
+    actions: int = 0 #Operaciones escritas
+    errors: list[tuple[int, str, str]] = field(default_factory=list) #(linea, portafolio, mensaje)
+
+
+def _is_jsonl(path: str) -> bool:
+    return path.endswith((".jsonl", ".json", ".ndjson"))
+
+
+def read_prices(path: str) -> dict[str, float]:
+    """ Lee el archivo de precios (CSV o JSONL segun la extension)"""
+    prices = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        if _is_jsonl(path):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            prices[row["ticker"]] = float(row["price"])
+    return prices
+
+
+def _error_message(error: Exception) -> str:
+    # Los ValueError ya traen un mensaje para el usuario, al resto se le agrega el tipo (ej: KeyError: 'name')
+    if isinstance(error, ValueError):
+        return str(error)
+    return f"{type(error).__name__}: {error}"
+
+
+def _amounts(values) -> dict[str, float]:
+    """ Cantidades u objetivos por ticker convertidos a float (en JSON pueden venir como texto)"""
+    if not isinstance(values, dict):
+        raise ValueError("holdings y target deben ser objetos {ticker: cantidad}")
+    return {str(ticker): float(value) for ticker, value in values.items()}
+
+
+def _parse_jsonl_record(line: str, i: int) -> PortfolioRecord:
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("El registro debe ser un objeto JSON")
+    return PortfolioRecord(str(record["name"]), _amounts(record.get("holdings", {})),
+                           _amounts(record.get("target", {})), i)
+
+
+def read_portfolios(path: str) -> Iterator[PortfolioRecord]:
+    """ Lee los portafolios de a uno (CSV o JSONL segun la extension).
+    Un registro mal formado no detiene la lectura: se entrega con error para reportarlo en las estadisticas."""
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        if _is_jsonl(path):
+            for i, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield _parse_jsonl_record(line, i)
+                except Exception as e:
+                    name = ""
+                    try:
+                        name = str(json.loads(line).get("name", ""))
+                    except Exception:
+                        pass
+                    yield PortfolioRecord(name, {}, {}, i, f"Registro invalido: {_error_message(e)}")
+        else:
+            # Linea 1 es el encabezado
+            rows = enumerate(csv.DictReader(f), 2)
+            for name, group in groupby(rows, key=lambda row: row[1].get("name") or ""):
+                record = PortfolioRecord(name, {}, {}, 0)
+                for i, row in group:
+                    record.line = record.line or i
+                    if record.error is not None:
+                        continue #Se consumen las demas filas del portafolio
+                    try:
+                        record.holdings[row["ticker"]] = float(row["shares"] or 0)
+                        if row["target"]:
+                            record.target[row["ticker"]] = float(row["target"])
+                    except Exception as e:
+                        record.error = f"Fila invalida en la linea {i}: {_error_message(e)}"
+                yield record
+
+
+def rebalance_record(record: PortfolioRecord, stocks: dict[str, Stock], tolerance: float) -> RebalancePlan:
+    """ Arma el portafolio del registro con las acciones compartidas y lo rebalancea con Portfolio.rebalance"""
+    portfolio = Portfolio(record.name)
+    tickers = dict.fromkeys([*record.holdings, *record.target])
+    for ticker in tickers:
+        if ticker not in stocks:
+            raise ValueError(f"La accion {ticker} no tiene precio")
+    portfolio.add_stocks(stocks[ticker] for ticker in tickers)
+    portfolio.set_holdings_many(record.holdings)
+    portfolio.set_target_allocation(record.target)
+    return portfolio.rebalance(tolerance)
+
+
+def _rebalance_chunk(chunk: list[PortfolioRecord], stocks: dict[str, Stock], tolerance: float) -> list[tuple]:
+    """ Rebalancea un bloque de registros. Retorna (portafolio, linea, operaciones, error) con las operaciones como tuplas,
+    que son mas baratas de enviar entre procesos que el plan completo."""
+    results = []
+    for record in chunk:
+        if record.error is not None:
+            results.append((record.name, record.line, [], record.error))
+            continue
+        # Cualquier error de un registro (ej: ZeroDivisionError con precio 0) se reporta sin detener el bloque
+        try:
+            actions = list(rebalance_record(record, stocks, tolerance).records())
+            results.append((record.name, record.line, actions, None))
+        except Exception as e:
+            results.append((record.name, record.line, [], _error_message(e)))
+    return results
+
+
+def _failed_chunk(chunk: list[PortfolioRecord], error: Exception) -> list[tuple]:
+    """ Resultado de un bloque cuyo proceso fallo (ej: el proceso murio): un error por registro"""
+    message = f"Fallo el proceso del bloque: {_error_message(error)}"
+    return [(record.name, record.line, [], message) for record in chunk]
+
+
+# Estado de cada proceso del pool: los precios se envian una sola vez al iniciarlo
+_worker_stocks : dict[str, Stock] = {}
+
+
+def _init_worker(prices: dict[str, float]) -> None:
+    global _worker_stocks
+    _worker_stocks = {ticker: Stock(ticker, price) for ticker, price in prices.items()}
+
+
+def _worker_chunk(chunk: list[PortfolioRecord], tolerance: float) -> list[tuple]:
+    return _rebalance_chunk(chunk, _worker_stocks, tolerance)
+
+
+def _chunks(records: Iterable[PortfolioRecord], chunk_size: int) -> Iterator[list[PortfolioRecord]]:
+    records = iter(records)
+    while chunk := list(islice(records, chunk_size)):
+        yield chunk
+
+
+def _chunk_result(chunk: list[PortfolioRecord], future, stocks: dict[str, Stock] | None, tolerance: float) -> list[tuple]:
+    """ Resultado de un bloque enviado al pool (future) o a procesar en este proceso (future None)"""
+    if future is None:
+        return _rebalance_chunk(chunk, stocks, tolerance)
+    try:
+        return future.result()
+    except Exception as e:
+        return _failed_chunk(chunk, e)
+
+
+def rebalance_stream(records: Iterable[PortfolioRecord], prices: dict[str, float], tolerance: float = 0.01,
+                     workers: int | None = None, chunk_size: int = 1000) -> Iterator[tuple]:
+    """ Entrega (portafolio, linea, operaciones, error) por cada registro, en el orden de entrada.
+    Con workers > 1 los bloques se procesan en paralelo, manteniendo como maximo 2 bloques pendientes por proceso
+    para que la memoria no crezca con el tamaño del archivo."""
+    if chunk_size <= 0:
+        raise ValueError("El tamaño del bloque debe ser positivo")
+    if not workers or workers <= 1:
+        stocks = {ticker: Stock(ticker, price) for ticker, price in prices.items()}
+        for chunk in _chunks(records, chunk_size):
+            yield from _rebalance_chunk(chunk, stocks, tolerance)
+        return
+
+    # Si un bloque falla en el pool solo se reportan sus registros; si el pool queda roto
+    # los bloques siguientes se procesan en este proceso
+    stocks = None
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(prices,)) as pool:
+        pending = deque()
+        for chunk in _chunks(records, chunk_size):
+            if stocks is None:
+                try:
+                    pending.append((chunk, pool.submit(_worker_chunk, chunk, tolerance)))
+                except BrokenExecutor:
+                    stocks = {ticker: Stock(ticker, price) for ticker, price in prices.items()}
+            if stocks is not None:
+                pending.append((chunk, None))
+            while len(pending) >= 2 * workers or (pending and pending[0][1] is None):
+                yield from _chunk_result(*pending.popleft(), stocks, tolerance)
+        while pending:
+            yield from _chunk_result(*pending.popleft(), stocks, tolerance)
+
+
+def run(portfolios_path: str, prices_path: str, output: TextIO, fmt: str = "jsonl", tolerance: float = 0.01,
+        workers: int | None = None, chunk_size: int = 1000) -> BatchStats:
+    """ Rebalancea todos los portafolios del archivo y escribe las operaciones en output a medida que salen"""
+    if fmt not in ("jsonl", "csv"):
+        raise ValueError("El formato de salida debe ser jsonl o csv")
+    prices = read_prices(prices_path)
+    stats = BatchStats()
+    writer = None
+    if fmt == "csv":
+        writer = csv.writer(output)
+        writer.writerow(OUTPUT_COLUMNS)
+
+    results = rebalance_stream(read_portfolios(portfolios_path), prices, tolerance, workers, chunk_size)
+    for name, line, actions, error in results:
+        stats.portfolios += 1
+        if error is not None:
+            stats.errors.append((line, name, error))
+            continue
+        for action in actions:
+            if writer is not None:
+                writer.writerow((name, *action))
+            else:
+                output.write(json.dumps(dict(zip(OUTPUT_COLUMNS, (name, *action)))) + "\n")
+        stats.actions += len(actions)
+    return stats
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Rebalanceo por lotes de un archivo de portafolios")
+    parser.add_argument("portfolios", help="Archivo de portafolios (.jsonl o .csv)")
+    parser.add_argument("prices", help="Archivo de precios (.jsonl o .csv)")
+    parser.add_argument("--output", default="-", help="Archivo de salida ('-' para stdout)")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default=None,
+                        help="Formato de salida, por defecto segun la extension del archivo de salida")
+    parser.add_argument("--tolerance", type=float, default=0.01)
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto 1)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("csv" if args.output.endswith(".csv") else "jsonl")
+    if args.output == "-":
+        stats = run(args.portfolios, args.prices, sys.stdout, fmt, args.tolerance, args.workers, args.chunk_size)
+    else:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            stats = run(args.portfolios, args.prices, f, fmt, args.tolerance, args.workers, args.chunk_size)
+
+    for line, name, error in stats.errors:
+        print(f"Linea {line} ({name}): {error}", file=sys.stderr)
+    print(f"{stats.portfolios} portafolios, {stats.actions} operaciones, {len(stats.errors)} errores", file=sys.stderr)
+    return 1 if stats.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
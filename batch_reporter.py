@@ -0,0 +1,192 @@
+""" Generacion de reportes de muchos portafolios en paralelo.
+
+Los portafolios se reparten en bloques (shards). A cada proceso se le envian una sola vez los tickers, precios,
+monedas y tipos de cambio,
+y por cada bloque solo las cantidades y distribuciones objetivo en arreglos compactos (sin serializar Portfolio
+ni Stock). Cada proceso reconstruye los portafolios de su bloque, escribe un archivo de reporte por portafolio
+y retorna los tiempos del bloque, que quedan en un manifest.json junto a los reportes.
+"""
+import json
+import os
+import re
+import time
+from array import array
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+
+from fx_rates import FxRates
+from portafolio_reporter import PortfolioReporter
+from portfolio import Portfolio
+from stock import Stock
+
+_EXTENSIONS = {"text": "txt", "csv": "csv", "json": "json"}
+
+
+@dataclass
+class ShardResult:
+    """ Resultado de un bloque de portafolios"""
+
+    shard: int
+    portfolios: int
+    seconds: float #Tiempo de construir los portafolios y escribir los reportes del bloque
+    bytes: int #Bytes escritos
+    pid: int #Proceso que lo genero
+    files: list[str] = field(default_factory=list)
+
+
+@dataclass
+class ReportManifest:
+    """ Resumen de una corrida: archivos generados y tiempo de cada bloque"""
+
+    output_dir: str
+    format: str
+    seconds: float
+    shards: list[ShardResult]
+
+    @property
+    def files(self) -> list[str]:
+        return [name for shard in self.shards for name in shard.files]
+
+    @property
+    def portfolios(self) -> int:
+        return sum(shard.portfolios for shard in self.shards)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), indent=2)
+
+
+@dataclass
+class _Shard:
+    """ Estado compacto de un bloque de portafolios, en columnas tipo CSR como en portfolio_snapshot"""
+
+    index: int
+    first: int #Posicion global del primer portafolio, para numerar los archivos
+    names: list[str] = field(default_factory=list)
+    currencies: list[str] = field(default_factory=list) #Moneda de cada portafolio
+    uses_fx: array = field(default_factory=lambda: array("b")) #1 si el portafolio usa los tipos de cambio
+    position_offsets: array = field(default_factory=lambda: array("I", [0]))
+    position_ids: array = field(default_factory=lambda: array("I"))
+    shares: array = field(default_factory=lambda: array("d"))
+    target_offsets: array = field(default_factory=lambda: array("I", [0]))
+    target_ids: array = field(default_factory=lambda: array("I"))
+    targets: array = field(default_factory=lambda: array("d"))
+
+
+def _file_name(position: int, name: str, format: str) -> str:
+    safe = re.sub(r"[^\w.-]+", "_", name).strip("._") or "portafolio"
+    return f"{position:08d}_{safe}.{_EXTENSIONS[format]}"
+
+
+def _write_shard(stocks: list[Stock], fx: FxRates | None, shard: _Shard, output_dir: str, format: str,
+                 tolerance: float) -> ShardResult:
+    start = time.perf_counter()
+    result = ShardResult(shard.index, len(shard.names), 0.0, 0, os.getpid())
+    for i, name in enumerate(shard.names):
+        portfolio = Portfolio(name, fx=fx if shard.uses_fx[i] else None, currency=shard.currencies[i])
+        begin, end = shard.position_offsets[i], shard.position_offsets[i + 1]
+        position_stocks = [stocks[stock_id] for stock_id in shard.position_ids[begin:end]]
+        portfolio.add_stocks(position_stocks)
+        portfolio.set_holdings_many(dict(zip((s.name for s in position_stocks), shard.shares[begin:end])))
+        begin, end = shard.target_offsets[i], shard.target_offsets[i + 1]
+        if end > begin:
+            names = (stocks[stock_id].name for stock_id in shard.target_ids[begin:end])
+            portfolio.set_target_allocation(dict(zip(names, shard.targets[begin:end])))
+
+        reporter = PortfolioReporter(portfolio, tolerance)
+        file_name = _file_name(shard.first + i, name, format)
+        path = os.path.join(output_dir, file_name)
+        with open(path, "w", encoding="utf-8") as f:
+            reporter.write(f, format)
+        result.bytes += os.path.getsize(path)
+        reporter.close()
+        result.files.append(file_name)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def _make_stocks(tickers: list[str], prices: array, currencies: list[str]) -> list[Stock]:
+    return [Stock(ticker, price, currency) for ticker, price, currency in zip(tickers, prices, currencies)]
+
+
+def _make_fx(rates: tuple[str, dict[str, float]] | None) -> FxRates | None:
+    return None if rates is None else FxRates(*rates)
+
+
+# Acciones y tipos de cambio de cada proceso del pool, se crean una sola vez al iniciarlo
+_worker_stocks : list[Stock] = []
+_worker_fx : FxRates | None = None
+
+
+def _init_worker(tickers: list[str], prices: array, currencies: list[str],
+                 rates: tuple[str, dict[str, float]] | None) -> None:
+    global _worker_stocks, _worker_fx
+    _worker_stocks = _make_stocks(tickers, prices, currencies)
+    _worker_fx = _make_fx(rates)
+
+
+def _worker_shard(shard: _Shard, output_dir: str, format: str, tolerance: float) -> ShardResult:
+    return _write_shard(_worker_stocks, _worker_fx, shard, output_dir, format, tolerance)
+
+
+def _build_shards(portfolios: list[Portfolio], shard_size: int):
+    stocks : dict[str, Stock] = {}
+    fx : FxRates | None = None
+    for portfolio in portfolios:
+        for name, stock in portfolio.stocks.items():
+            other = stocks.setdefault(name, stock)
+            if other is not stock and (other.price != stock.price or other.currency != stock.currency):
+                raise ValueError(f"Hay dos acciones distintas llamadas {name} con precios diferentes")
+        if portfolio.fx is not None:
+            if fx is not None and portfolio.fx is not fx:
+                raise ValueError("Todos los portafolios deben usar los mismos tipos de cambio")
+            fx = portfolio.fx
+    ticker_ids = {name: i for i, name in enumerate(stocks)}
+    prices = array("d", (stock.price for stock in stocks.values()))
+    currencies = [stock.currency for stock in stocks.values()]
+    rates = None if fx is None else (fx.base, {c: fx.to_base(c) for c in fx.currencies if c != fx.base})
+
+    shards = []
+    for first in range(0, len(portfolios), shard_size):
+        shard = _Shard(len(shards), first)
+        for portfolio in portfolios[first:first + shard_size]:
+            shard.names.append(portfolio.name)
+            shard.currencies.append(portfolio.currency)
+            shard.uses_fx.append(portfolio.fx is not None)
+            holdings = portfolio.holdings
+            shard.position_ids.extend(ticker_ids[name] for name in holdings)
+            shard.shares.extend(holdings.values())
+            shard.position_offsets.append(len(shard.shares))
+            targets = portfolio.target_allocation
+            shard.target_ids.extend(ticker_ids[name] for name in targets)
+            shard.targets.extend(targets.values())
+            shard.target_offsets.append(len(shard.targets))
+        shards.append(shard)
+    return (list(stocks), prices, currencies, rates), shards
+
+
+def generate_reports(portfolios: Iterable[Portfolio], output_dir: str, format: str = "text",
+                     workers: int | None = None, shard_size: int = 1000, tolerance: float = 0.01) -> ReportManifest:
+    """ Escribe un reporte por portafolio en output_dir (archivos numerados en el orden de entrada)
+    y un manifest.json con los tiempos por bloque. Con workers > 1 los bloques se reparten en un pool de procesos."""
+    if format not in _EXTENSIONS:
+        raise ValueError(f"Formato de reporte desconocido: {format}")
+    if shard_size <= 0:
+        raise ValueError("El tamaño del bloque debe ser positivo")
+    start = time.perf_counter()
+    universe, shards = _build_shards(list(portfolios), shard_size)
+    os.makedirs(output_dir, exist_ok=True)
+
+    if workers is not None and workers > 1 and len(shards) > 1:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=universe) as pool:
+            futures = [pool.submit(_worker_shard, shard, output_dir, format, tolerance) for shard in shards]
+            results = [future.result() for future in futures]
+    else:
+        tickers, prices, currencies, rates = universe
+        stocks, fx = _make_stocks(tickers, prices, currencies), _make_fx(rates)
+        results = [_write_shard(stocks, fx, shard, output_dir, format, tolerance) for shard in shards]
+
+    manifest = ReportManifest(output_dir, format, time.perf_counter() - start, results)
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        f.write(manifest.to_json())
+    return manifest
@@ -0,0 +1,183 @@
+""" Benchmark de las operaciones principales del portafolio a distintos tamaños.
+
+Uso:
+    python benchmark.py run --sizes 10 1000 100000 --output resultados.json
+    python benchmark.py compare baseline.json resultados.json --threshold 0.2
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from portafolio_reporter import PortfolioReporter
+from portfolio import Portfolio
+from stock import Stock
+
+OPERATIONS = ("get_total_value", "get_current_allocation", "rebalance", "generate_report")
+
+
+def build_portfolio(size: int, seed: int, vectorized: bool = False) -> tuple[Portfolio, list[Stock]]:
+    """ Crea un portafolio sintetico con `size` acciones, cantidades aleatorias y objetivo uniforme"""
+    rng = random.Random(seed)
+    stocks = [Stock(f"T{i:07d}", rng.uniform(1, 1000)) for i in range(size)]
+    portfolio = Portfolio(f"Benchmark {size}", vectorized=vectorized)
+    for stock in stocks:
+        portfolio.add_stock(stock)
+        portfolio.set_holdings(stock.name, rng.uniform(0, 100))
+    portfolio.set_target_allocation({stock.name: 1 / size for stock in stocks})
+    return portfolio, stocks
+
+
+def _operation(portfolio: Portfolio, name: str):
+    if name == "generate_report":
+        reporter = PortfolioReporter(portfolio)
+        return reporter.generate_report
+    if name == "rebalance":
+        return lambda: portfolio.rebalance(0.01)
+    return getattr(portfolio, name)
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(portfolio: Portfolio, stocks: list[Stock], operation: str, rate: int,
+            repeat: int, min_time: float, seed: int) -> dict:
+    """ Mide latencia (percentiles), throughput y memoria maxima de una operacion.
+    Antes de cada llamada se aplican `rate` cambios de precio (no se cuentan en la latencia)."""
+    rng = random.Random(seed)
+    call = _operation(portfolio, operation)
+    samples = []
+    tick_seconds = 0.0
+    ticks = 0
+    started = time.perf_counter()
+    while len(samples) < repeat or time.perf_counter() - started < min_time:
+        tick_start = time.perf_counter()
+        for _ in range(rate):
+            stock = stocks[rng.randrange(len(stocks))]
+            stock.update_price(stock.price * rng.uniform(0.99, 1.01))
+        tick_seconds += time.perf_counter() - tick_start
+        ticks += rate
+
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+        if len(samples) >= 100 * repeat:
+            break
+
+    # La memoria se mide en una llamada aparte, tracemalloc hace mas lenta la ejecucion
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "runs": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": _percentile(samples, 50) * 1000,
+        "p95_ms": _percentile(samples, 95) * 1000,
+        "p99_ms": _percentile(samples, 99) * 1000,
+        "throughput_per_s": len(samples) / sum(samples) if sum(samples) > 0 else 0.0,
+        "price_updates_per_s": ticks / tick_seconds if tick_seconds > 0 else 0.0,
+        "peak_memory_bytes": peak,
+    }
+
+
+def run(sizes: list[int], rates: list[int], operations: list[str], repeat: int = 20, min_time: float = 0.2,
+        seed: int = 0, vectorized: bool = False) -> dict:
+    results = []
+    for size in sizes:
+        portfolio, stocks = build_portfolio(size, seed, vectorized)
+        for rate in rates:
+            for operation in operations:
+                result = {"operation": operation, "size": size, "rate": rate, "vectorized": vectorized}
+                result.update(measure(portfolio, stocks, operation, rate, repeat, min_time, seed))
+                results.append(result)
+                print(f"{operation:<24} size={size:<9} rate={rate:<6} p50={result['p50_ms']:.3f}ms "
+                      f"p99={result['p99_ms']:.3f}ms", file=sys.stderr)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+        "results": results,
+    }
+
+
+def _key(result: dict) -> tuple:
+    return result["operation"], result["size"], result["rate"], result.get("vectorized", False)
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.2, metric: str = "p50_ms") -> list[dict]:
+    """ Compara dos resultados y retorna las mediciones que empeoraron mas que `threshold` (0.2 = 20%)"""
+    base = {_key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        previous = base.get(_key(result))
+        if previous is None or previous[metric] <= 0:
+            continue
+        change = result[metric] / previous[metric] - 1
+        if change > threshold:
+            regressions.append({"operation": result["operation"], "size": result["size"], "rate": result["rate"],
+                                "vectorized": result.get("vectorized", False), "baseline": previous[metric],
+                                "current": result[metric], "change": change})
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de rebalanceo, distribucion y reportes")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Ejecuta el benchmark y guarda los resultados en JSON")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    run_parser.add_argument("--rates", type=int, nargs="+", default=[0, 100],
+                            help="Cambios de precio aplicados antes de cada llamada")
+    run_parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=list(OPERATIONS))
+    run_parser.add_argument("--repeat", type=int, default=20)
+    run_parser.add_argument("--min-time", type=float, default=0.2)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--vectorized", action="store_true")
+    run_parser.add_argument("--output", default="-", help="Archivo JSON de salida ('-' para stdout)")
+
+    compare_parser = commands.add_parser("compare", help="Compara contra un baseline y marca regresiones")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+    compare_parser.add_argument("--metric", default="p50_ms")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        results = run(args.sizes, args.rates, args.operations, args.repeat, args.min_time, args.seed, args.vectorized)
+        text = json.dumps(results, indent=2)
+        if args.output == "-":
+            print(text)
+        else:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(text)
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold, args.metric)
+    for r in regressions:
+        print(f"REGRESION {r['operation']} size={r['size']} rate={r['rate']}: "
+              f"{r['baseline']:.3f} -> {r['current']:.3f} ({r['change']:+.1%})")
+    if not regressions:
+        print("Sin regresiones")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
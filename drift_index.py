@@ -0,0 +1,153 @@
+import heapq
+
+from portfolio import Portfolio
+from stock import Stock
+from stock_registry import StockRegistry
+
+
+class DriftIndex:
+    """ Indice de portafolios ordenado por su mayor desviacion respecto a la distribucion objetivo.
+    Responde "los k portafolios mas desbalanceados" y "todos los que superan un umbral" sin recorrer todo el libro.
+
+    Los cambios de precio (usando el StockRegistry para saber que portafolios tienen la accion) y de holdings
+    solo marcan los portafolios afectados como desactualizados; se recalculan la proxima vez que se consulta el indice.
+
+    Los portafolios se guardan en un heap (O(log n) por cambio). Al recalcular un portafolio no se busca su entrada
+    anterior: se agrega una nueva con otra secuencia y la vieja queda invalida, se descarta cuando llega a la cima
+    del heap o cuando las entradas invalidas superan a las validas (ahi se reconstruye el heap)."""
+
+    _COMPACT_MIN = 64 #Con pocas entradas no vale la pena reconstruir el heap
+
+    def __init__(self, registry: StockRegistry):
+        self._registry = registry
+        # (-desviacion, secuencia, portafolio), la secuencia es unica: desempata y nunca se compara el portafolio
+        self._heap : list[tuple[float, int, Portfolio]] = []
+        self._key_of : dict[Portfolio, tuple[float, int]] = {} #Entrada valida de cada portafolio
+        self._stale : set[Portfolio] = set()
+        self._sequence = 0
+        self._registered : set[Portfolio] = set() #Portafolios que el indice agrego al registro (los saca en untrack)
+        # Acciones a las que esta suscrito el indice: las de cada portafolio y cuantos portafolios usan cada una,
+        # para desuscribirse solo cuando ningun portafolio del indice la tiene
+        self._stocks_of : dict[Portfolio, dict[str, Stock]] = {}
+        self._stock_count : dict[Stock, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._key_of)
+
+    def __contains__(self, portfolio: Portfolio) -> bool:
+        return portfolio in self._key_of
+
+    def track(self, portfolio: Portfolio) -> None:
+        """ Agrega un portafolio al indice (y al registro, si no estaba)"""
+        if portfolio in self._key_of:
+            return
+        if portfolio not in self._registry:
+            self._registry.register(portfolio)
+            self._registered.add(portfolio)
+        portfolio.subscribe(self)
+        self._stocks_of[portfolio] = {}
+        self._watch(portfolio, portfolio.stocks)
+        self._insert(portfolio)
+
+    def untrack(self, portfolio: Portfolio) -> None:
+        """ Saca el portafolio del indice, deshaciendo lo que hizo track (suscripciones y registro)"""
+        if portfolio not in self._key_of:
+            return
+        portfolio.unsubscribe(self)
+        for stock in self._stocks_of.pop(portfolio).values():
+            self._release(stock)
+        if portfolio in self._registered:
+            self._registered.discard(portfolio)
+            self._registry.unregister(portfolio)
+        # Su entrada en el heap queda invalida
+        del self._key_of[portfolio]
+        self._stale.discard(portfolio)
+        self._maybe_compact()
+
+    def _watch(self, portfolio: Portfolio, stock_names) -> None:
+        """ Se suscribe a las acciones del portafolio que aun no seguia (nuevas o reemplazadas)"""
+        watched = self._stocks_of[portfolio]
+        for stock_name in stock_names:
+            stock = portfolio.get_stock(stock_name)
+            previous = watched.get(stock_name)
+            if previous is stock:
+                continue
+            if previous is not None:
+                self._release(previous)
+            watched[stock_name] = stock
+            count = self._stock_count.get(stock, 0)
+            if count == 0:
+                stock.subscribe(self)
+            self._stock_count[stock] = count + 1
+
+    def _release(self, stock: Stock) -> None:
+        count = self._stock_count[stock] - 1
+        if count:
+            self._stock_count[stock] = count
+        else:
+            del self._stock_count[stock]
+            stock.unsubscribe(self)
+
+    def _insert(self, portfolio: Portfolio) -> None:
+        self._sequence += 1
+        key = (-portfolio.get_max_drift(), self._sequence)
+        heapq.heappush(self._heap, (*key, portfolio))
+        self._key_of[portfolio] = key
+
+    def _is_valid(self, entry: tuple[float, int, Portfolio]) -> bool:
+        key = self._key_of.get(entry[2])
+        return key is not None and key[1] == entry[1]
+
+    def _maybe_compact(self) -> None:
+        """ Reconstruye el heap solo con las entradas validas cuando la mitad o mas son invalidas (O(n) amortizado)"""
+        if len(self._heap) > max(2 * len(self._key_of), self._COMPACT_MIN):
+            self._heap = [(*key, portfolio) for portfolio, key in self._key_of.items()]
+            heapq.heapify(self._heap)
+
+    def _refresh(self) -> None:
+        for portfolio in self._stale:
+            self._insert(portfolio)
+        self._stale.clear()
+        self._maybe_compact()
+
+    def _pop_while(self, keep) -> list[tuple[float, int, Portfolio]]:
+        """ Saca entradas de la cima mientras keep(entrada, validas sacadas) sea verdadero, descartando
+        las invalidas que encuentre, y vuelve a agregar las validas. Retorna las validas en orden."""
+        heap, taken = self._heap, []
+        while heap and keep(heap[0], len(taken)):
+            entry = heapq.heappop(heap)
+            if self._is_valid(entry):
+                taken.append(entry)
+        for entry in taken:
+            heapq.heappush(heap, entry)
+        return taken
+
+    def on_price_update(self, stock: Stock, old_price: float) -> None:
+        for portfolio in self._registry.holders(stock):
+            if portfolio in self._key_of:
+                self._stale.add(portfolio)
+
+    def on_portfolio_change(self, portfolio: Portfolio, stock_names) -> None:
+        if portfolio not in self._key_of:
+            return
+        # Las acciones agregadas despues de track tambien deben avisar sus cambios de precio
+        self._watch(portfolio, stock_names)
+        self._stale.add(portfolio)
+
+    def drift(self, portfolio: Portfolio) -> float:
+        if portfolio not in self._key_of:
+            raise ValueError("El portafolio no esta en el indice")
+        self._refresh()
+        return -self._key_of[portfolio][0]
+
+    def top(self, k: int) -> list[tuple[Portfolio, float]]:
+        """ Los k portafolios con mayor desviacion, de mayor a menor"""
+        self._refresh()
+        taken = self._pop_while(lambda entry, count: count < k)
+        return [(portfolio, -neg_drift) for neg_drift, _, portfolio in taken]
+
+    def above(self, threshold: float) -> list[tuple[Portfolio, float]]:
+        """ Todos los portafolios con desviacion estrictamente mayor a threshold, de mayor a menor"""
+        self._refresh()
+        taken = self._pop_while(lambda entry, count: entry[0] < -threshold)
+        return [(portfolio, -neg_drift) for neg_drift, _, portfolio in taken]
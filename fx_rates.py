@@ -0,0 +1,95 @@
+import weakref
+from array import array
+from collections.abc import Mapping
+
+
+class FxRates:
+    """ Tipos de cambio entre monedas. Cada moneda tiene su valor en la moneda base (ej: 1 EUR = 1.08 USD)
+    y se mantiene una matriz con todos los cruces ya calculados, asi convertir entre dos monedas es una lectura.
+    Cuando cambia el tipo de cambio de una moneda solo se recalculan su fila y su columna de la matriz.
+
+    Igual que Stock, avisa los cambios a los suscriptores con on_fx_update(fx, currency, old_rate)."""
+
+    def __init__(self, base: str = "USD", rates: Mapping[str, float] | None = None):
+        self._base = base
+        self._index : dict[str, int] = {base: 0} #Posicion de cada moneda en la matriz
+        self._to_base = array("d", [1.0]) #Valor de 1 unidad de cada moneda en la moneda base
+        self._matrix : list[array] = [array("d", [1.0])] #_matrix[i][j]: unidades de j por 1 unidad de i
+        self._subscribers = None
+        for currency, rate in (rates or {}).items():
+            self.set_rate(currency, rate)
+
+    @property
+    def base(self) -> str:
+        return self._base
+
+    @property
+    def currencies(self) -> list[str]:
+        return list(self._index)
+
+    def __contains__(self, currency: str) -> bool:
+        return currency in self._index
+
+    def subscribe(self, subscriber) -> None:
+        """ Suscribe un objeto a los cambios de tipo de cambio, debe implementar on_fx_update(fx, currency, old_rate)"""
+        if self._subscribers is None:
+            self._subscribers = weakref.WeakSet()
+        self._subscribers.add(subscriber)
+
+    def unsubscribe(self, subscriber) -> None:
+        if self._subscribers is not None:
+            self._subscribers.discard(subscriber)
+
+    def _position(self, currency: str) -> int:
+        position = self._index.get(currency)
+        if position is None:
+            raise ValueError(f"No hay tipo de cambio para la moneda {currency}")
+        return position
+
+    def set_rate(self, currency: str, rate: float) -> None:
+        """ Fija cuantas unidades de la moneda base vale 1 unidad de currency (agrega la moneda si no existia)"""
+        if currency == self._base:
+            raise ValueError("El tipo de cambio de la moneda base siempre es 1")
+        if rate <= 0:
+            raise ValueError("El tipo de cambio debe ser positivo")
+
+        position = self._index.get(currency)
+        if position is None:
+            # Moneda nueva: una columna mas en cada fila y una fila nueva
+            position = self._index[currency] = len(self._to_base)
+            self._to_base.append(rate)
+            for row in self._matrix:
+                row.append(0.0)
+            self._matrix.append(array("d", bytes(8 * len(self._to_base))))
+            old_rate = None
+        else:
+            old_rate = self._to_base[position]
+            if old_rate == rate:
+                return
+            self._to_base[position] = rate
+
+        # Solo cambian la fila y la columna de esta moneda
+        to_base = self._to_base
+        row = self._matrix[position]
+        for j, other in enumerate(to_base):
+            row[j] = rate / other
+            self._matrix[j][position] = other / rate
+        row[position] = 1.0
+
+        if old_rate is not None and self._subscribers:
+            for subscriber in list(self._subscribers):
+                subscriber.on_fx_update(self, currency, old_rate)
+
+    def set_rates(self, rates: Mapping[str, float]) -> None:
+        for currency, rate in rates.items():
+            self.set_rate(currency, rate)
+
+    def to_base(self, currency: str) -> float:
+        return self._to_base[self._position(currency)]
+
+    def rate(self, from_currency: str, to_currency: str) -> float:
+        """ Unidades de to_currency por 1 unidad de from_currency"""
+        return self._matrix[self._position(from_currency)][self._position(to_currency)]
+
+    def convert(self, amount: float, from_currency: str, to_currency: str) -> float:
+        return amount * self.rate(from_currency, to_currency)
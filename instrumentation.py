@@ -0,0 +1,177 @@
+""" Instrumentacion de los metodos principales de Portfolio y PortfolioReporter.
+
+Mientras esta desactivada no tiene costo: los metodos originales solo se reemplazan por versiones medidas
+al llamar enable(sink), y disable() los restaura.
+"""
+import cProfile
+import io
+import pstats
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from portafolio_reporter import PortfolioReporter
+from portfolio import Portfolio
+
+# Limites (en segundos) de los buckets del histograma de tiempos
+BUCKETS = (0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0, 10.0)
+
+
+# Se cuenta directo en el almacenamiento del portafolio (y no con las vistas stocks/target_allocation,
+# que tambien estan instrumentadas): arreglos por id con universo, diccionarios en los demas modos.
+
+def _stock_count(p: Portfolio) -> int:
+    return len(p._positions) if p._positions is not None else len(p._stocks)
+
+
+def _target_count(p: Portfolio) -> int:
+    return len(p._positions.target_positions()) if p._positions is not None else len(p._target_allocation)
+
+
+# (clase, atributo, funcion que cuenta las posiciones recorridas en una llamada)
+_INSTRUMENTED = (
+    (Portfolio, "rebalance", _target_count),
+    (Portfolio, "get_total_value", lambda p: 0),
+    (Portfolio, "get_current_allocation", _stock_count),
+    (Portfolio, "set_holdings", lambda p: 1),
+    (Portfolio, "stocks", lambda p: 0), #Propiedades, retornan vistas sin copiar
+    (Portfolio, "holdings", lambda p: 0),
+    (Portfolio, "target_allocation", lambda p: 0),
+    (PortfolioReporter, "generate_report", lambda r: _stock_count(r.portfolio)),
+)
+
+
+@dataclass
+class MethodMetrics:
+    """ Metricas acumuladas de un metodo"""
+
+    calls: int = 0
+    seconds: float = 0.0
+    positions: int = 0 #Posiciones recorridas
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(BUCKETS) + 1))
+
+
+class InMemorySink:
+    """ Destino de metricas que las guarda en memoria, se puede exportar en formato de texto de Prometheus"""
+
+    def __init__(self):
+        self.metrics : dict[str, MethodMetrics] = {}
+
+    def observe(self, method: str, seconds: float, positions: int) -> None:
+        metrics = self.metrics.get(method)
+        if metrics is None:
+            metrics = self.metrics[method] = MethodMetrics()
+        metrics.calls += 1
+        metrics.seconds += seconds
+        metrics.positions += positions
+        metrics.buckets[bisect_left(BUCKETS, seconds)] += 1
+
+    def reset(self) -> None:
+        self.metrics.clear()
+
+    def to_prometheus(self, prefix: str = "portfolio") -> str:
+        lines = [f"# TYPE {prefix}_calls_total counter"]
+        for method, m in self.metrics.items():
+            lines.append(f'{prefix}_calls_total{{method="{method}"}} {m.calls}')
+
+        lines.append(f"# TYPE {prefix}_positions_scanned_total counter")
+        for method, m in self.metrics.items():
+            lines.append(f'{prefix}_positions_scanned_total{{method="{method}"}} {m.positions}')
+
+        lines.append(f"# TYPE {prefix}_duration_seconds histogram")
+        for method, m in self.metrics.items():
+            cumulative = 0
+            for limit, count in zip(BUCKETS + (float("inf"),), m.buckets):
+                cumulative += count
+                le = "+Inf" if limit == float("inf") else repr(limit)
+                lines.append(f'{prefix}_duration_seconds_bucket{{method="{method}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_duration_seconds_sum{{method="{method}"}} {m.seconds}')
+            lines.append(f'{prefix}_duration_seconds_count{{method="{method}"}} {m.calls}')
+        return "\n".join(lines) + "\n"
+
+
+_originals : dict[tuple[type, str], object] = {}
+
+
+def _timed(function, method: str, count_positions, sink):
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(self, *args, **kwargs)
+        finally:
+            sink.observe(method, time.perf_counter() - start, count_positions(self))
+    wrapper.__name__ = function.__name__
+    wrapper.__doc__ = function.__doc__
+    return wrapper
+
+
+def enable(sink) -> None:
+    """ Activa la instrumentacion enviando las metricas a `sink` (cualquier objeto con observe(method, seconds, positions))"""
+    disable()
+    for cls, attr, count_positions in _INSTRUMENTED:
+        original = cls.__dict__[attr]
+        _originals[(cls, attr)] = original
+        method = f"{cls.__name__}.{attr}"
+        if isinstance(original, property):
+            setattr(cls, attr, property(_timed(original.fget, method, count_positions, sink)))
+        else:
+            setattr(cls, attr, _timed(original, method, count_positions, sink))
+
+
+def disable() -> None:
+    """ Restaura los metodos originales"""
+    for (cls, attr), original in _originals.items():
+        setattr(cls, attr, original)
+    _originals.clear()
+
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+
+@contextmanager
+def instrumented(sink=None):
+    """ Activa la instrumentacion solo dentro del bloque `with`, retorna el sink usado"""
+    sink = sink if sink is not None else InMemorySink()
+    enable(sink)
+    try:
+        yield sink
+    finally:
+        disable()
+
+
+class ProfileCapture:
+    """ Resultado de un perfilado con cProfile"""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+
+    def stats(self) -> pstats.Stats:
+        return pstats.Stats(self.profiler)
+
+    def report(self, limit: int = 20, sort: str = "cumulative") -> str:
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+@contextmanager
+def profile_rebalance(portfolio: Portfolio):
+    """ Perfila con cProfile solo las llamadas a rebalance de este portafolio dentro del bloque `with`"""
+    capture = ProfileCapture()
+    rebalance = portfolio.rebalance
+
+    def profiled(*args, **kwargs):
+        capture.profiler.enable()
+        try:
+            return rebalance(*args, **kwargs)
+        finally:
+            capture.profiler.disable()
+
+    # Se reemplaza solo en la instancia, el resto de portafolios no se ve afectado
+    portfolio.rebalance = profiled
+    try:
+        yield capture
+    finally:
+        del portfolio.rebalance
@@ -1,67 +1,195 @@
+import json
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import TextIO
+
 from portfolio import Portfolio
+from rebalance_plan import RebalancePlan
+from stock import Stock
+
+
+@dataclass(slots=True)
+class ReportRow:
+    """ Datos de una posicion del reporte"""
+
+    ticker: str
+    currency: str #Moneda del precio
+    price: float
+    shares: float
+    value: float #En la moneda del portafolio
+    target: float
+
+
+@dataclass
+class ReportSnapshot:
+    """ Estado del portafolio calculado una vez y compartido por todos los formatos del reporte"""
+
+    name: str
+    currency: str
+    total_value: float
+    rows: list[ReportRow]
+    actions: RebalancePlan | None #None si no se pudo rebalancear
+    error: str | None #Motivo por el que no se pudo rebalancear
+
+    def current(self, row: ReportRow) -> float:
+        """ Distribucion actual de una posicion"""
+        return row.value / self.total_value if self.total_value else 0.0
 
 
 class PortfolioReporter:
     """
     Clase encargada de generar representaciones legibles del estado de un portafolio.
     Separa la lógica de presentación de la lógica de negocio.
+
+    Se suscribe al portafolio y a sus acciones: solo vuelve a calcular y formatear las posiciones
+    cuyo precio o cantidad cambio desde el ultimo reporte, y si nada cambio reutiliza el reporte anterior.
     """
-    def __init__(self, portfolio: Portfolio):
+    FORMATS = ("text", "csv", "json")
+
+    def __init__(self, portfolio: Portfolio, tolerance: float = 0.01):
         self.portfolio = portfolio
+        self.tolerance = tolerance
+        self._rows : dict[str, ReportRow] = {}
+        self._lines : dict[str, tuple] = {} #Fila de texto formateada: (fila, total usado, (inicio, fin), linea)
+        self._text : tuple[ReportSnapshot, str] | None = None #Ultimo reporte de texto completo
+        self._dirty : set[str] = set(portfolio.stocks)
+        self._snapshot : ReportSnapshot | None = None
+        portfolio.subscribe(self)
+        for stock in portfolio.stocks.values():
+            stock.subscribe(self)
 
-    def generate_report(self) -> str:
-        """Genera un reporte completo en formato texto (tabla + rebalanceo)."""
-        lines = []
-        lines.append(f"REPORTE DE PORTAFOLIO: {self.portfolio.name.upper()}")
-        lines.append("=" * 60)
-        
-        total_value = self.portfolio.get_total_value()
-        lines.append(f"Valor Total: ${total_value:,.2f}")
-        lines.append("-" * 60)
-        
-        # Encabezados de la tabla
-        # Ticker | Precio | Cantidad | Valor Total | Actual % | Target %
-        header = f"{'Ticker':<10} | {'Precio':>10} | {'Cant.':>8} | {'Valor':>12} | {'Actual %':>8} | {'Target %':>8}"
-        lines.append(header)
-        lines.append("-" * 60)
-
-        # Obtener datos calculados
-        current_allocations = self.portfolio.get_current_allocation()
-        target_allocations = self.portfolio.target_allocation
-        
-        for stock_name, stock in self.portfolio.stocks.items():
-            price = stock.price
-            shares = self.portfolio.holdings.get(stock_name, 0.0)
-            value = shares * price
-            curr_pct = current_allocations.get(stock_name, 0.0)
-            targ_pct = target_allocations.get(stock_name, 0.0)
-            
-            # Formateo de fila
-            row = (f"{stock_name:<10} | "
-                   f"${price:>9.2f} | "
-                   f"{shares:>8.2f} | "
-                   f"${value:>11.2f} | "
-                   f"{curr_pct:>7.1%} | " # Formato porcentaje con 1 decimal
-                   f"{targ_pct:>7.1%}")
-            lines.append(row)
-            
-        lines.append("=" * 60)
-        
-        # Sección de Rebalanceo
-        lines.append("SUGERENCIAS DE REBALANCEO:")
+    def close(self) -> None:
+        """ Deja de escuchar cambios del portafolio y sus acciones"""
+        self.portfolio.unsubscribe(self)
+        for stock in self.portfolio.stocks.values():
+            stock.unsubscribe(self)
+
+    def on_price_update(self, stock: Stock, old_price: float) -> None:
+        # Una accion reemplazada por otra con el mismo nombre puede seguir avisando, se ignora
+        if self.portfolio.stocks.get(stock.name) is stock:
+            self._dirty.add(stock.name)
+            self._snapshot = None
+
+    def on_portfolio_change(self, portfolio: Portfolio, stock_names) -> None:
+        for stock_name in stock_names:
+            portfolio.get_stock(stock_name).subscribe(self)
+        self._dirty.update(stock_names)
+        self._snapshot = None
+
+    def snapshot(self) -> ReportSnapshot:
+        """ Calcula el estado del reporte, recalculando solo las posiciones que cambiaron"""
+        if self._snapshot is not None:
+            return self._snapshot
+        portfolio = self.portfolio
+        stocks = portfolio.stocks
+        holdings = portfolio.holdings
+        targets = portfolio.target_allocation
+        fx, currency = portfolio.fx, portfolio.currency
+        for stock_name in self._dirty:
+            stock = stocks[stock_name]
+            shares = float(holdings.get(stock_name, 0.0))
+            value = shares * stock.price
+            if fx is not None:
+                value *= fx.rate(stock.currency, currency)
+            self._rows[stock_name] = ReportRow(stock_name, stock.currency, stock.price, shares, value,
+                                               targets.get(stock_name, 0.0))
+        self._dirty.clear()
+
+        actions, error = None, None
         try:
             # Usamos un try-except por si el portafolio está vacío o sin target
-            rebalance_actions = self.portfolio.rebalance(tolerance=0.01)
-            
-            if not rebalance_actions:
-                lines.append(" >> El portafolio está balanceado dentro de la tolerancia.")
-            else:
-                for action in rebalance_actions:
-                    # Asumiendo que action tiene .action (Enum), .name, .shares, .value
-                    tipo = "COMPRAR" if "BUY" in str(action.action) else "VENDER"
-                    lines.append(f" >> {tipo} {action.shares:.2f} acciones de {action.name} "
-                                 f"(Valor: ${abs(action.value):.2f})")
+            actions = portfolio.rebalance(tolerance=self.tolerance)
         except ValueError as e:
-            lines.append(f" >> No se puede calcular rebalanceo: {e}")
+            error = str(e)
+        self._snapshot = ReportSnapshot(portfolio.name, currency, portfolio.get_total_value(),
+                                        [self._rows[stock_name] for stock_name in stocks], actions, error)
+        return self._snapshot
+
+    def _text_row(self, snapshot: ReportSnapshot, row: ReportRow) -> str:
+        cached = self._lines.get(row.ticker)
+        if cached is not None and cached[0] is row:
+            if cached[1] == snapshot.total_value:
+                return cached[3]
+            # Cambio el total pero no la posicion: solo se vuelve a formatear el porcentaje actual
+            prefix, suffix = cached[2]
+        else:
+            # Formateo de fila
+            prefix = (f"{row.ticker:<10} | "
+                      f"${row.price:>9.2f} | "
+                      f"{row.shares:>8.2f} | "
+                      f"${row.value:>11.2f} | ")
+            suffix = f" | {row.target:>7.1%}"
+        line = f"{prefix}{snapshot.current(row):>7.1%}{suffix}" # Formato porcentaje con 1 decimal
+        self._lines[row.ticker] = (row, snapshot.total_value, (prefix, suffix), line)
+        return line
+
+    def iter_text(self) -> Iterator[str]:
+        """ Reporte completo en formato texto (tabla + rebalanceo), una linea a la vez"""
+        snapshot = self.snapshot()
+        yield f"REPORTE DE PORTAFOLIO: {snapshot.name.upper()}"
+        yield "=" * 60
+        yield f"Valor Total: ${snapshot.total_value:,.2f}"
+        yield "-" * 60
+
+        # Encabezados de la tabla
+        # Ticker | Precio | Cantidad | Valor Total | Actual % | Target %
+        yield f"{'Ticker':<10} | {'Precio':>10} | {'Cant.':>8} | {'Valor':>12} | {'Actual %':>8} | {'Target %':>8}"
+        yield "-" * 60
+        for row in snapshot.rows:
+            yield self._text_row(snapshot, row)
+        yield "=" * 60
+
+        # Sección de Rebalanceo
+        yield "SUGERENCIAS DE REBALANCEO:"
+        if snapshot.actions is None:
+            yield f" >> No se puede calcular rebalanceo: {snapshot.error}"
+        elif not snapshot.actions:
+            yield " >> El portafolio está balanceado dentro de la tolerancia."
+        else:
+            for name, action, shares, value in snapshot.actions.records():
+                tipo = "COMPRAR" if action == "BUY" else "VENDER"
+                yield f" >> {tipo} {shares:.2f} acciones de {name} (Valor: ${abs(value):.2f})"
+
+    def iter_csv(self) -> Iterator[str]:
+        """ Posiciones en CSV (ticker,currency,price,shares,value,current,target), una linea a la vez.
+        El precio esta en la moneda de la accion y el valor en la del portafolio."""
+        snapshot = self.snapshot()
+        yield "ticker,currency,price,shares,value,current,target"
+        for row in snapshot.rows:
+            yield (f"{row.ticker},{row.currency},{row.price!r},{row.shares!r},{row.value!r},"
+                   f"{snapshot.current(row)!r},{row.target!r}")
+
+    def iter_json(self) -> Iterator[str]:
+        """ Reporte en JSON, con una posicion por linea"""
+        snapshot = self.snapshot()
+        yield ("{" + f'"name": {json.dumps(snapshot.name)}, "currency": {json.dumps(snapshot.currency)}, '
+               f'"total_value": {snapshot.total_value!r}, "positions": [')
+        last = len(snapshot.rows) - 1
+        for i, row in enumerate(snapshot.rows):
+            position = {"ticker": row.ticker, "currency": row.currency, "price": row.price, "shares": row.shares,
+                        "value": row.value, "current": snapshot.current(row), "target": row.target}
+            yield json.dumps(position) + ("," if i < last else "")
+        if snapshot.actions is None:
+            yield f'], "rebalance": null, "error": {json.dumps(snapshot.error)}' + "}"
+        else:
+            actions = [{"name": n, "action": a, "shares": s, "value": v} for n, a, s, v in snapshot.actions.records()]
+            yield f'], "rebalance": {json.dumps(actions)}, "error": null' + "}"
+
+    def iter_lines(self, format: str = "text") -> Iterator[str]:
+        if format not in self.FORMATS:
+            raise ValueError(f"Formato de reporte desconocido: {format}")
+        return getattr(self, f"iter_{format}")()
+
+    def write(self, f: TextIO, format: str = "text") -> None:
+        """ Escribe el reporte linea a linea en un archivo o socket (ej: sock.makefile("w")), sin armarlo completo en memoria"""
+        for line in self.iter_lines(format):
+            f.write(line + "\n")
 
-        return "\n".join(lines)
\ No newline at end of file
+    def generate_report(self, format: str = "text") -> str:
+        """Genera un reporte completo (por defecto en formato texto: tabla + rebalanceo)."""
+        if format != "text":
+            return "\n".join(self.iter_lines(format))
+        snapshot = self.snapshot()
+        if self._text is None or self._text[0] is not snapshot:
+            self._text = (snapshot, "\n".join(self.iter_text()))
+        return self._text[1]
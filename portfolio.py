@@ -1,55 +1,456 @@
+import math
+import weakref
+from collections.abc import Iterable, Mapping
+from types import MappingProxyType
+
 from rebalance import Action, Rebalance
+from rebalance_plan import RebalancePlan
 from stock import Stock
+from universe_positions import UniversePositions
 
 
 class Portfolio:
     """ Clase portafolio, almacena la informacion de un portafolio, tiene un nombre y distintos activos, 
     tiene la capacidad de hace run rebalanceo, y actualizar los precios de los activos"""
+
+    # Cada cuantas actualizaciones incrementales se recalcula el total desde cero,
+    # para que el error de redondeo acumulado por los deltas no crezca sin limite.
+    _RESYNC_INTERVAL = 4096
+    # Si el total queda muy chico respecto a los valores que se sumaron o restaron desde el ultimo recalculo,
+    # el error de redondeo de los deltas ya no es despreciable (ej: 0.1 + 0.2 - 0.1 - 0.2 = 2.8e-17) y se recalcula.
+    _CANCELLATION = 1e-3
+    # Un total menor a esto se considera 0 (residuo de redondeo, no valor real)
+    _ZERO_TOTAL = 1e-9
     
-    def __init__(self, name: str):
+    def __init__(self, name: str, vectorized: bool = False, universe=None, fx=None, currency: str | None = None):
         self._name = name
+        self._universe = universe #StockUniverse opcional, permite referirse a las acciones por id entero
         self._stocks : dict[str, Stock] = {} #Diccionario de acciones disponibles
         self._holdings : dict[str, float] = {} #Cantidad actual de acciones por nombre 
         self._target_allocation : dict[str, float] = {} #Distribucion objetivo -> Debe sumar 1
 
+        # Valor total, se mantiene al dia con deltas en set_holdings y cuando un Stock avisa un cambio de precio,
+        # asi leer el total es O(1). El valor de cada posicion no se guarda: es cantidad * precio, y el aviso
+        # de cambio de precio trae el precio anterior para calcular el delta.
+        self._total_value = 0.0
+        self._updates_since_resync = 0
+        self._magnitude = 0.0 #Mayor valor sumado o restado al total desde el ultimo recalculo
+
+        # Multimoneda: los valores por posicion quedan en la moneda de cada accion y se suman por moneda.
+        # El total (en la moneda del portafolio) es la suma de cada subtotal por su tipo de cambio,
+        # asi un cambio de tipo de cambio actualiza el total sin recorrer las posiciones.
+        # Sin FxRates todas las acciones deben estar en la moneda del portafolio.
+        self._fx = fx #FxRates opcional
+        self._currency = currency or (fx.base if fx is not None else "USD")
+        self._subtotals : dict[str, float] = {} #Valor por moneda, en esa moneda
+        self._rates : dict[str, float] = {self._currency: 1.0} #Tipo de cambio de cada moneda a la del portafolio
+        if fx is not None:
+            if self._currency not in fx:
+                raise ValueError(f"No hay tipo de cambio para la moneda {self._currency}")
+            fx.subscribe(self)
+
+        # Objetos suscritos a cambios de holdings, acciones o distribucion objetivo (se crea al suscribirse)
+        self._subscribers = None
+
+        # Modo vectorizado (opcional): ademas de los diccionarios se mantienen arreglos NumPy alineados por ticker,
+        # los calculos de valor total, distribucion y rebalanceo se hacen sobre los arreglos.
+        # Se importa aca para que NumPy solo sea necesario si se usa este modo.
+        self._arrays = None
+        if vectorized:
+            from portfolio_arrays import PortfolioArrays
+            self._arrays = PortfolioArrays()
+            self._arrays.set_rate(self._currency, 1.0)
+
+        # Con un universo (y sin modo vectorizado) las posiciones se guardan por id de instrumento en arreglos
+        # (UniversePositions) en vez de los diccionarios: no hay un Stock ni entradas por ticker por posicion,
+        # y los cambios de precio llegan por el indice inverso del universo (watch).
+        # Solo se aceptan acciones de ese universo.
+        self._positions = None
+        if universe is not None and not vectorized:
+            self._positions = UniversePositions(universe)
+
     @property
     def name(self) -> str:
         return self._name
 
     @property
-    def stocks(self) -> dict[str, Stock]:
-        return dict(self._stocks) 
+    def vectorized(self) -> bool:
+        return self._arrays is not None
+
+    @property
+    def currency(self) -> str:
+        """ Moneda en la que se expresan el valor total, la distribucion y el rebalanceo"""
+        return self._currency
+
+    @property
+    def fx(self):
+        return self._fx
+
+    def check_single_currency(self) -> None:
+        """ Para los modulos que solo trabajan en USD sin tipos de cambio (libro, escenarios, backtest, snapshots):
+        error si el portafolio usa FxRates o esta en otra moneda, en vez de sumar valores de monedas distintas"""
+        if self._fx is not None or self._currency != "USD":
+            raise ValueError(f"El portafolio {self._name} usa varias monedas o no esta en USD, "
+                             "esta operacion solo soporta portafolios en USD sin tipos de cambio")
+
+    def get_subtotals(self) -> dict[str, float]:
+        """ Valor de las posiciones agrupado por moneda, cada uno en su propia moneda"""
+        return dict(self._subtotals)
+
+    # Las propiedades retornan vistas de solo lectura (sin copiar), asi se mantiene el encapsulamiento
+    # sin el costo de copiar el diccionario completo en cada acceso.
+    @property
+    def stocks(self) -> Mapping[str, Stock]:
+        if self._positions is not None:
+            return self._positions.stocks
+        return MappingProxyType(self._stocks)
 
     @property
-    def holdings(self) -> dict[str, float]:
-        return dict(self._holdings)
+    def holdings(self) -> Mapping[str, float]:
+        if self._positions is not None:
+            return self._positions.holdings
+        return MappingProxyType(self._holdings)
 
     @property
-    def target_allocation(self) -> dict[str, float]:
-        return dict(self._target_allocation)
+    def target_allocation(self) -> Mapping[str, float]:
+        if self._positions is not None:
+            return self._positions.target_allocation
+        return MappingProxyType(self._target_allocation)
         
+    def add_instrument(self, instrument_id: int) -> None:
+        """ Agrega una accion del universo del portafolio usando su id"""
+        self.add_instruments((instrument_id,))
+
+    def add_instruments(self, instrument_ids: Iterable[int]) -> None:
+        """ Agrega muchas acciones del universo por id, avisando a los suscriptores una sola vez.
+        No se crea un Stock por accion (salvo en modo vectorizado, que guarda las acciones por ticker)."""
+        if self._universe is None:
+            raise ValueError("El portafolio no tiene un universo de acciones")
+        if self._positions is None:
+            self.add_stocks([self._universe.stock(instrument_id) for instrument_id in instrument_ids])
+            return
+        instrument_ids = list(instrument_ids)
+        if any(not 0 <= instrument_id < len(self._universe) for instrument_id in instrument_ids):
+            raise ValueError("El instrumento no existe en el universo")
+        if not instrument_ids:
+            return
+        positions = self._positions
+        self._check_currency(self._universe.name_of(instrument_ids[0]), positions.currency)
+        self._register_currency(positions.currency)
+        for instrument_id in instrument_ids:
+            # Una posicion nueva parte con 0 acciones, no cambia el total
+            if positions.add(instrument_id):
+                self._universe.watch(instrument_id, self)
+        if self._subscribers:
+            self._notify(tuple(dict.fromkeys(self._universe.name_of(i) for i in instrument_ids)))
+
+    def _instrument_id(self, stock: Stock) -> int:
+        if getattr(stock, "universe", None) is not self._universe:
+            raise ValueError(f"La accion {stock.name} no es del universo del portafolio")
+        return stock.id
+
+    def set_holdings_by_id(self, instrument_id: int, shares: float) -> None:
+        if self._universe is None:
+            raise ValueError("El portafolio no tiene un universo de acciones")
+        if self._positions is None:
+            self.set_holdings(self._universe.name_of(instrument_id), shares)
+            return
+        position = self._positions.find(instrument_id)
+        if position < 0:
+            raise ValueError("La accion no existe en el portafolio")
+        self._check_shares(shares)
+        if self._set_position_shares(position, shares):
+            self._resync_total()
+        if self._subscribers:
+            self._notify((self._universe.name_of(instrument_id),))
+
+    def get_stock(self, stock_name: str) -> Stock:
+        """ Retorna la accion con ese nombre, sin copiar el diccionario completo"""
+        if self._positions is not None:
+            position = self._positions.position_of(stock_name)
+            if position < 0:
+                raise ValueError("La accion no existe en el portafolio")
+            return self._universe.stock(self._positions.instrument_id(position))
+        if stock_name not in self._stocks:
+            raise ValueError("La accion no existe en el portafolio")
+        return self._stocks[stock_name]
+
+    def holds(self, stock_name: str) -> bool:
+        """ True si el portafolio tiene acciones o una distribucion objetivo distinta de 0 en esa accion"""
+        if self._positions is not None:
+            position = self._positions.position_of(stock_name)
+            return position >= 0 and (self._positions.shares(position) != 0 or self._positions.target(position) != 0)
+        return self._holdings.get(stock_name, 0.0) != 0 or self._target_allocation.get(stock_name, 0.0) != 0
+
+    def subscribe(self, subscriber) -> None:
+        """ Suscribe un objeto a los cambios del portafolio, debe implementar on_portfolio_change(portfolio, stock_names).
+        Los cambios de precio no se avisan aca, para eso hay que suscribirse a cada Stock."""
+        if self._subscribers is None:
+            self._subscribers = weakref.WeakSet()
+        self._subscribers.add(subscriber)
+
+    def unsubscribe(self, subscriber) -> None:
+        if self._subscribers is not None:
+            self._subscribers.discard(subscriber)
+
+    def _notify(self, stock_names) -> None:
+        if self._subscribers:
+            for subscriber in list(self._subscribers):
+                subscriber.on_portfolio_change(self, stock_names)
+
     def add_stock(self, stock: Stock):
         """ Agrega una accion al portafolio
         """
+        self.add_stocks((stock,))
+
+    def add_stocks(self, stocks: Iterable[Stock]) -> None:
+        """ Agrega muchas acciones de una vez, avisando a los suscriptores una sola vez"""
+        stocks = list(stocks)
+        if self._positions is not None:
+            self.add_instruments([self._instrument_id(stock) for stock in stocks])
+            return
+        for stock in stocks:
+            self._check_currency(stock.name, stock.currency)
+        resync = False
+        for stock in stocks:
+            resync |= self._add_stock(stock)
+        if resync:
+            self._resync_total()
+        self._notify(tuple(dict.fromkeys(stock.name for stock in stocks)))
+
+    def _check_currency(self, stock_name: str, currency: str) -> None:
+        if self._fx is None:
+            if currency != self._currency:
+                raise ValueError(f"La accion {stock_name} esta en {currency}, "
+                                 f"se necesita un FxRates para convertir a {self._currency}")
+        elif currency not in self._fx:
+            raise ValueError(f"No hay tipo de cambio para la moneda {currency}")
+
+    def _register_currency(self, currency: str) -> None:
+        if currency not in self._rates:
+            self._rates[currency] = self._fx.rate(currency, self._currency)
+            if self._arrays is not None:
+                self._arrays.set_rate(currency, self._rates[currency])
+
+    def _add_stock(self, stock: Stock) -> bool:
+        """ Agrega o reemplaza una accion, retorna True si hay que recalcular el total"""
+        self._register_currency(stock.currency)
+        previous = self._stocks.get(stock.name)
         self._stocks[stock.name] = stock
+        stock.subscribe(self)
         ## Al agregar al stock se incializa en 0
-        if stock.name not in self._holdings:
-            self._holdings[stock.name] = 0.0
-        
+        shares = self._holdings.setdefault(stock.name, 0.0)
+        if self._arrays is not None:
+            self._arrays.add_stock(stock)
+            self._arrays.set_shares(stock.name, shares)
+        if previous is None or previous is stock:
+            return False
+        # Se reemplazo por otro Stock con el mismo nombre: el valor anterior sale (en su moneda) y entra el nuevo
+        previous.unsubscribe(self)
+        if not shares:
+            return False
+        resync = self._apply_delta(previous.currency, shares * previous.price, 0.0)
+        return self._apply_delta(stock.currency, 0.0, shares * stock.price) or resync
     
     def set_holdings(self, stock_name: str, shares: float) -> None:
         ## Primero validacioes para evitar errores, como que la accion no exista o que la cantidad de acciones sea negativa
-        if stock_name not in self._stocks:
+        if self._positions is not None:
+            position = self._positions.position_of(stock_name)
+            if position < 0:
+                raise ValueError("La accion no existe en el portafolio")
+        elif stock_name not in self._stocks:
             raise ValueError("La accion no existe en el portafolio")
+        self._check_shares(shares)
+        
+        if self._positions is not None:
+            resync = self._set_position_shares(position, shares)
+        else:
+            resync = self._set_shares(stock_name, shares)
+        if resync:
+            self._resync_total()
+        self._notify((stock_name,))
+
+    @staticmethod
+    def _check_shares(shares: float) -> None:
         if shares < 0:
             raise ValueError("La cantidad de acciones no puede ser negativa")
-        
+        # Igual que con los precios: inf o nan dejarian el valor total en nan y el rebalanceo vacio
+        if not math.isfinite(shares):
+            raise ValueError("La cantidad de acciones debe ser un numero finito")
+
+    def _set_shares(self, stock_name: str, shares: float) -> bool:
+        stock = self._stocks[stock_name]
+        old_value = self._holdings[stock_name] * stock.price
         self._holdings[stock_name] = shares
+        if self._arrays is not None:
+            self._arrays.set_shares(stock_name, shares)
+        return self._apply_delta(stock.currency, old_value, shares * stock.price)
+
+    def _set_position_shares(self, position: int, shares: float) -> bool:
+        positions = self._positions
+        price = positions.price(position)
+        old_value = positions.shares(position) * price
+        positions.set_shares(position, shares)
+        return self._apply_delta(positions.currency, old_value, shares * price)
+
+    def set_holdings_many(self, holdings: Mapping[str, float]) -> None:
+        """ Cambia la cantidad de muchas acciones de una vez.
+        Se valida todo antes de modificar: si algun valor es invalido no se cambia nada."""
+        current = self.holdings
+        for stock_name, shares in holdings.items():
+            if stock_name not in current:
+                raise ValueError(f"La accion {stock_name} no existe en el portafolio")
+            self._check_shares(shares)
+        self._commit_holdings(holdings)
+
+    def apply_fills(self, fills: Iterable[Rebalance]) -> None:
+        """ Aplica operaciones ejecutadas (ej: las que retorna rebalance): BUY suma acciones y SELL las resta.
+        Se valida todo antes de modificar: si alguna accion no existe o quedaria negativa no se cambia nada."""
+        holdings = self.holdings
+        new_holdings : dict[str, float] = {}
+        for fill in fills:
+            if fill.name not in holdings:
+                raise ValueError(f"La accion {fill.name} no existe en el portafolio")
+            self._check_shares(fill.shares)
+            current = new_holdings.get(fill.name, holdings[fill.name])
+            new_holdings[fill.name] = current + fill.shares if fill.action == Action.BUY else current - fill.shares
+        for stock_name, shares in new_holdings.items():
+            if not math.isfinite(shares):
+                raise ValueError("La cantidad de acciones debe ser un numero finito")
+            if shares < 0:
+                # Vender todo con las cantidades de rebalance puede dejar un negativo minimo por redondeo
+                if shares >= -1e-9 * max(1.0, holdings[stock_name]):
+                    new_holdings[stock_name] = 0.0
+                else:
+                    raise ValueError(f"No hay suficientes acciones de {stock_name} para vender")
+        self._commit_holdings(new_holdings)
+
+    def _commit_holdings(self, holdings: Mapping[str, float]) -> None:
+        if not holdings:
+            return
+        # Si son pocas respecto al portafolio se aplica un delta por cada una, si no es mas barato recalcular
+        if self._positions is not None:
+            positions = self._positions
+            few = 4 * len(holdings) < len(positions)
+            resync = not few
+            for stock_name, shares in holdings.items():
+                position = positions.position_of(stock_name)
+                if few:
+                    resync |= self._set_position_shares(position, shares)
+                else:
+                    positions.set_shares(position, shares)
+            if resync:
+                self._resync_total()
+        elif 4 * len(holdings) < len(self._holdings):
+            resync = False
+            for stock_name, shares in holdings.items():
+                resync |= self._set_shares(stock_name, shares)
+            if resync:
+                self._resync_total()
+        else:
+            self._holdings.update(holdings)
+            if self._arrays is not None:
+                self._arrays.set_shares_many(holdings)
+            self._resync_total()
+        self._notify(tuple(holdings))
+
+    def on_price_update(self, stock: Stock, old_price: float) -> None:
+        """ Llamado por Stock.update_price, actualiza el total con el delta de la posicion"""
+        # Puede ser un Stock que ya fue reemplazado por otro con el mismo nombre
+        if self._stocks.get(stock.name) is not stock:
+            return
+        if self._arrays is not None:
+            self._arrays.set_price(stock.name, stock.price)
+        shares = self._holdings[stock.name]
+        if self._apply_delta(stock.currency, shares * old_price, shares * stock.price):
+            self._resync_total()
+
+    def on_instrument_update(self, universe, instrument_id: int, old_price: float) -> None:
+        """ Llamado por el universo cuando cambia el precio de un id que el portafolio tiene"""
+        positions = self._positions
+        if positions is None or universe is not self._universe:
+            return
+        position = positions.find(instrument_id)
+        if position < 0:
+            return
+        shares = positions.shares(position)
+        if self._apply_delta(positions.currency, shares * old_price, shares * positions.price(position)):
+            self._resync_total()
+
+    def on_fx_update(self, fx, currency: str, old_rate: float) -> None:
+        """ Llamado por FxRates cuando cambia un tipo de cambio: solo se recalcula el total desde los subtotales por moneda"""
+        if fx is not self._fx or currency not in self._rates:
+            return
+        for rate_currency in self._rates:
+            self._rates[rate_currency] = fx.rate(rate_currency, self._currency)
+        if self._arrays is not None:
+            for rate_currency, rate in self._rates.items():
+                self._arrays.set_rate(rate_currency, rate)
+        self._total_value = self._convert_subtotals()
+        self._magnitude = max(self._magnitude, abs(self._total_value))
+        # Cambian el valor y la distribucion de las posiciones en esa moneda (o de todas, si es la del portafolio)
+        if self._subscribers:
+            if self._positions is not None:
+                changed = tuple(self._positions.names())
+            elif currency == self._currency:
+                changed = tuple(self._stocks)
+            else:
+                changed = tuple(name for name, stock in self._stocks.items() if stock.currency == currency)
+            if changed:
+                self._notify(changed)
+
+    def _apply_delta(self, currency: str, old_value: float, new_value: float) -> bool:
+        """ Aplica al total el cambio de valor de una posicion. Retorna True si hay que recalcular el total;
+        quien llama recalcula despues de actualizar todas las posiciones, asi no se cuenta un cambio dos veces."""
+        self._updates_since_resync += 1
+        if self._updates_since_resync >= self._RESYNC_INTERVAL:
+            return True
+        rate = self._rates[currency]
+        self._subtotals[currency] = self._subtotals.get(currency, 0.0) + (new_value - old_value)
+        total = self._total_value + (new_value - old_value) * rate
+        magnitude = max(self._magnitude, abs(old_value) * rate, abs(new_value) * rate)
+        self._magnitude = magnitude
+        self._total_value = total
+        # Un inf o nan no se puede corregir con deltas (inf - inf = nan), y una cancelacion grande
+        # deja sobre todo error de redondeo: en ambos casos se recalcula desde cero
+        return not math.isfinite(total) or abs(total) < magnitude * self._CANCELLATION
+
+    def _resync_total(self) -> None:
+        if self._arrays is not None:
+            self._subtotals = self._arrays.subtotals()
+        elif self._positions is not None:
+            self._subtotals = {self._positions.currency: self._positions.total_value()} if len(self._positions) else {}
+        elif self._fx is None:
+            # Una sola moneda
+            total = 0.0
+            stocks = self._stocks
+            for stock_name, shares in self._holdings.items():
+                total += shares * stocks[stock_name].price
+            self._subtotals = {self._currency: total}
+        else:
+            subtotals = {}
+            stocks = self._stocks
+            for stock_name, shares in self._holdings.items():
+                stock = stocks[stock_name]
+                subtotals[stock.currency] = subtotals.get(stock.currency, 0.0) + shares * stock.price
+            self._subtotals = subtotals
+        self._total_value = self._convert_subtotals()
+        self._updates_since_resync = 0
+        self._magnitude = abs(self._total_value)
+
+    def _convert_subtotals(self) -> float:
+        # Se recorre en el orden de _rates (igual en modo diccionario y vectorizado) para obtener el mismo total
+        total = 0.0
+        subtotals = self._subtotals
+        for currency, rate in self._rates.items():
+            total += subtotals.get(currency, 0.0) * rate
+        return total
     
     def set_target_allocation(self, allocations: dict[str, float]) -> None:
         # Primero validar que todas las acciones existan
+        stocks = self.stocks
         for stock_name in allocations:
-            if stock_name not in self._stocks:
+            if stock_name not in stocks:
                 raise ValueError(f"La accion {stock_name} no existe en el portafolio")
 
         # Validar que no haya valores negativos
@@ -63,49 +464,96 @@ class Portfolio:
             raise ValueError("La suma de las distribuciones debe ser igual a 1")
 
         # Finalmente se cambia el estado si todo es valido
-        self._target_allocation = allocations.copy()
+        changed = self.target_allocation.keys() | allocations.keys()
+        if self._positions is not None:
+            positions = [self._positions.position_of(stock_name) for stock_name in allocations]
+            self._positions.set_targets(positions, allocations.values())
+        else:
+            self._target_allocation = allocations.copy()
+        if self._arrays is not None:
+            self._arrays.set_targets(self._target_allocation)
+        self._notify(tuple(changed))
     
     def get_total_value(self) -> float: 
-        """ Calcula el valor total del portafolio, multiplicando la cantidad de acciones por el precio actual de cada accion."""
-        total = 0.0
-        for stock_name, shares in self._holdings.items():
-            if stock_name in self._stocks:
-                total += shares * self._stocks[stock_name].price
-        return total
+        """ Valor total del portafolio (suma de cantidad de acciones por precio actual de cada accion),
+        en la moneda del portafolio. Se mantiene incrementalmente, por lo que leerlo es O(1)."""
+        return self._total_value
+
+    def _is_zero(self, total_value: float) -> bool:
+        return abs(total_value) <= self._ZERO_TOTAL
     
+    def _universe_rate(self) -> float | None:
+        # Tipo de cambio de las posiciones del universo, None si no hay que convertir
+        return self._rates[self._positions.currency] if self._fx is not None else None
+
     def get_current_allocation(self) -> dict[str, float]:
         """ Calcula la distribucion actual del portafolio"""
         total_value = self.get_total_value()
-        if total_value == 0:
-            return {stock_name: 0.0 for stock_name in self._holdings}
+        if self._is_zero(total_value):
+            return {stock_name: 0.0 for stock_name in self.holdings}
+        if self._arrays is not None:
+            return self._arrays.current_allocation(total_value)
+        if self._positions is not None:
+            return self._positions.current_allocation(total_value, self._universe_rate())
         
-        current_allocation = {} 
-        for stock_name in self._stocks:
-            shares = self._holdings.get(stock_name, 0.0)
-            value = shares * self._stocks[stock_name].price
-            current_allocation[stock_name] = value / total_value
-        return current_allocation
+        stocks = self._stocks
+        if self._fx is None:
+            return {stock_name: shares * stocks[stock_name].price / total_value
+                    for stock_name, shares in self._holdings.items()}
+        rates = self._rates
+        return {stock_name: shares * stocks[stock_name].price * rates[stocks[stock_name].currency] / total_value
+                for stock_name, shares in self._holdings.items()}
+    
+    def get_max_drift(self) -> float:
+        """ Mayor desviacion absoluta (como fraccion del total) entre la distribucion actual y la objetivo.
+        Es la misma medida que usa rebalance para comparar con la tolerancia. Es 0 si no hay objetivo o valor."""
+        total_value = self.get_total_value()
+        if not self.target_allocation or self._is_zero(total_value):
+            return 0.0
+        if self._arrays is not None:
+            return self._arrays.max_drift(total_value)
+        if self._positions is not None:
+            return self._positions.max_drift(total_value, self._universe_rate())
+        holdings, stocks = self._holdings, self._stocks
+        if self._fx is None:
+            return max(abs(target_pct * total_value - holdings[stock_name] * stocks[stock_name].price) / total_value
+                       for stock_name, target_pct in self._target_allocation.items())
+        rates = self._rates
+        return max(abs(target_pct * total_value - holdings[stock_name] * stocks[stock_name].price
+                       * rates[stocks[stock_name].currency]) / total_value
+                   for stock_name, target_pct in self._target_allocation.items())
     
-    def rebalance(self, tolerance: float = 0.01) -> list[Rebalance]:
+    def rebalance(self, tolerance: float = 0.01) -> RebalancePlan:
         """ Calcula las operaciones necesarias para rebalancear el portafolio"""
         """ Priemro se debe calcular el valor total del portafolio.
         Luego para cada accion se debe determinar el valor objetivo, valor actual y la diferencia"""
         
-        if not self._target_allocation:
+        if not self.target_allocation:
             raise ValueError("No se ha establecido una distribucion objetivo para el portafolio")
 
         total_value = self.get_total_value()
-        if total_value == 0:
+        if self._is_zero(total_value):
             raise ValueError("El valor total del portafolio es 0, no se puede rebalancear")
-        
-        actions = []
+
+        if self._arrays is not None:
+            return self._arrays.rebalance(total_value, tolerance)
+        if self._positions is not None:
+            return self._positions.rebalance(total_value, tolerance, self._universe_rate())
+
+        # Con varias monedas los precios y valores se convierten a la moneda del portafolio
+        rates = self._rates if self._fx is not None else None
+        actions = RebalancePlan()
         for stock_name, target_pct in self._target_allocation.items():
             # Valor objetivo para esta accion
             target_value = target_pct * total_value
             # valor actual para esta accion
-            current_shares = self._holdings.get(stock_name, 0.0)
-            current_price =  self._stocks[stock_name].price
-            current_value =  current_shares * current_price
+            stock = self._stocks[stock_name]
+            current_price =  stock.price
+            current_value =  self._holdings[stock_name] * current_price
+            if rates is not None:
+                rate = rates[stock.currency]
+                current_price *= rate
+                current_value *= rate
             # Calcula diferencia en valor
             value_diff = target_value - current_value
             
@@ -118,9 +566,9 @@ class Portfolio:
                 if value_diff > 0:
                     # Se necesita comprar
                     shares_to_buy = value_diff / current_price
-                    actions.append(Rebalance(name=stock_name, action=Action.BUY, shares=shares_to_buy, value=value_diff))
+                    actions.append(stock_name, Action.BUY, shares_to_buy, value_diff)
                 else:
                     # Se necesita vender
                     shares_to_sell = -value_diff / current_price
-                    actions.append(Rebalance(name=stock_name, action=Action.SELL, shares=shares_to_sell, value=-value_diff))
+                    actions.append(stock_name, Action.SELL, shares_to_sell, -value_diff)
         return actions
@@ -0,0 +1,164 @@
+import numpy as np
+
+from rebalance_plan import RebalancePlan
+from stock import Stock
+
+
+def sequential_sum(values: np.ndarray) -> np.ndarray:
+    """ Suma el ultimo eje de izquierda a derecha, igual que el ciclo `total += ...` de Portfolio.
+    np.sum usa suma por pares y puede diferir en el ultimo bit, cumsum en cambio es secuencial."""
+    if values.shape[-1] == 0:
+        return np.zeros(values.shape[:-1])
+    return np.cumsum(values, axis=-1)[..., -1]
+
+
+def rebalance_arrays(prices: np.ndarray, shares: np.ndarray, targets: np.ndarray,
+                     total: np.ndarray | float, tolerance: float) -> tuple[np.ndarray, np.ndarray]:
+    """ Version vectorizada del ciclo de Portfolio.rebalance.
+    Recibe arreglos alineados por ticker (pueden tener ejes extra al inicio, ej: clientes o escenarios)
+    y retorna la diferencia de valor (positiva = comprar) y la mascara de acciones que superan la tolerancia."""
+    value_diff = targets * total - shares * prices
+    trade = np.abs(value_diff) / total > tolerance
+    return value_diff, trade
+
+
+class PortfolioArrays:
+    """ Almacenamiento alineado en arreglos NumPy de precios, cantidades y distribucion objetivo de un portafolio.
+    Cada ticker tiene un indice fijo (orden en que se agrego), asi el valor total, la distribucion
+    y el rebalanceo se calculan en una sola pasada vectorizada.
+
+    Los precios quedan en la moneda de cada accion; cada ticker guarda el indice de su moneda y los tipos de cambio
+    son un arreglo chico por moneda, asi un cambio de tipo de cambio es una sola escritura y la conversion
+    se aplica al calcular, junto con el resto de las operaciones vectorizadas."""
+
+    _INITIAL_CAPACITY = 16
+
+    def __init__(self):
+        self._index : dict[str, int] = {} #Indice de cada ticker en los arreglos
+        self._names : list[str] = []
+        self._size = 0
+        self._prices = np.zeros(self._INITIAL_CAPACITY)
+        self._shares = np.zeros(self._INITIAL_CAPACITY)
+        self._targets = np.zeros(self._INITIAL_CAPACITY)
+        # Indices de los tickers con objetivo, en el mismo orden del diccionario de target_allocation
+        self._target_order = np.zeros(0, dtype=np.intp)
+        self._currency_index : dict[str, int] = {}
+        self._currency_ids = np.zeros(self._INITIAL_CAPACITY, dtype=np.intp)
+        self._rates = np.ones(0) #Tipo de cambio de cada moneda a la moneda del portafolio
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self) -> None:
+        capacity = 2 * len(self._prices)
+        for attr in ("_prices", "_shares", "_targets", "_currency_ids"):
+            old = getattr(self, attr)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, attr, new)
+
+    def _currency_id(self, currency: str) -> int:
+        currency_id = self._currency_index.get(currency)
+        if currency_id is None:
+            currency_id = self._currency_index[currency] = len(self._rates)
+            self._rates = np.append(self._rates, 1.0)
+        return currency_id
+
+    def set_rate(self, currency: str, rate: float) -> None:
+        """ Tipo de cambio de una moneda a la moneda del portafolio"""
+        currency_id = self._currency_id(currency) # Puede agrandar _rates, se calcula antes de indexar
+        self._rates[currency_id] = rate
+
+    def add_stock(self, stock: Stock) -> int:
+        """ Agrega (o reemplaza) una accion y retorna su indice"""
+        idx = self._index.get(stock.name)
+        if idx is not None:
+            self._prices[idx] = stock.price
+            self._currency_ids[idx] = self._currency_id(stock.currency)
+            return idx
+
+        if self._size == len(self._prices):
+            self._grow()
+        idx = self._size
+        self._index[stock.name] = idx
+        self._names.append(stock.name)
+        self._prices[idx] = stock.price
+        self._shares[idx] = 0.0
+        self._targets[idx] = 0.0
+        self._currency_ids[idx] = self._currency_id(stock.currency)
+        self._size += 1
+        return idx
+
+    def set_shares(self, stock_name: str, shares: float) -> None:
+        self._shares[self._index[stock_name]] = shares
+
+    def set_shares_many(self, holdings: dict[str, float]) -> None:
+        index = self._index
+        positions = np.fromiter((index[name] for name in holdings), dtype=np.intp, count=len(holdings))
+        self._shares[positions] = np.fromiter(holdings.values(), dtype=float, count=len(holdings))
+
+    def set_targets(self, allocations: dict[str, float]) -> None:
+        """ Reemplaza la distribucion objetivo. Se asume que ya fue validada por Portfolio."""
+        self._targets[:self._size] = 0.0
+        order = np.fromiter((self._index[name] for name in allocations), dtype=np.intp, count=len(allocations))
+        self._targets[order] = np.fromiter(allocations.values(), dtype=float, count=len(allocations))
+        self._target_order = order
+
+    def set_price(self, stock_name: str, price: float) -> None:
+        """ Portfolio lo llama cuando un Stock avisa un cambio de precio, asi no hay que consultar cada Stock al calcular"""
+        self._prices[self._index[stock_name]] = price
+
+    def _converted_prices(self, positions: slice | np.ndarray) -> np.ndarray:
+        """ Precios en la moneda del portafolio. Con una sola moneda el tipo de cambio es 1 y no se multiplica."""
+        if len(self._rates) == 1 and self._rates[0] == 1.0:
+            return self._prices[positions]
+        return self._prices[positions] * self._rates[self._currency_ids[positions]]
+
+    def total_value(self) -> float:
+        """ Valor total en la moneda del portafolio"""
+        n = self._size
+        return float(sequential_sum(self._shares[:n] * self._converted_prices(slice(0, n))))
+
+    def subtotals(self) -> dict[str, float]:
+        """ Valor de las posiciones por moneda, cada uno en su moneda (sumado en el orden de los tickers)"""
+        n = self._size
+        # Igual que en Python un valor que desborda queda en inf, sin advertencia
+        with np.errstate(over="ignore"):
+            values = self._shares[:n] * self._prices[:n]
+        if len(self._currency_index) == 1:
+            [currency] = self._currency_index
+            return {currency: float(sequential_sum(values))} if n else {}
+        ids = self._currency_ids[:n]
+        present = set(ids.tolist())
+        return {currency: float(sequential_sum(values[ids == currency_id]))
+                for currency, currency_id in self._currency_index.items() if currency_id in present}
+
+    def current_allocation(self, total_value: float) -> dict[str, float]:
+        n = self._size
+        allocation = self._shares[:n] * self._converted_prices(slice(0, n)) / total_value
+        return dict(zip(self._names, allocation.tolist()))
+
+    def max_drift(self, total_value: float) -> float:
+        order = self._target_order
+        value_diff = self._targets[order] * total_value - self._shares[order] * self._converted_prices(order)
+        return float(np.abs(value_diff).max() / total_value)
+
+    def rebalance(self, total_value: float, tolerance: float) -> RebalancePlan:
+        """ Calcula las operaciones de rebalanceo. Asume total_value distinto de 0,
+        Portfolio.rebalance hace esas validaciones antes de llamar."""
+        order = self._target_order
+        prices = self._converted_prices(order)
+        value_diff, trade = rebalance_arrays(prices, self._shares[order], self._targets[order], total_value, tolerance)
+
+        selected = order[trade]
+        diff = value_diff[trade]
+        selected_prices = prices[trade]
+        # Igual que la version con diccionarios: comprar/vender una accion con precio 0 es una division por cero
+        if (selected_prices == 0).any():
+            raise ZeroDivisionError("float division by zero")
+        values = np.abs(diff)
+        shares = values / selected_prices
+
+        # Las columnas del plan se copian directo desde los bytes de los arreglos
+        names = self._names
+        return RebalancePlan.from_arrays([names[idx] for idx in selected.tolist()], diff > 0, shares, values)
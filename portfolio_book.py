@@ -0,0 +1,158 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from portfolio import Portfolio
+from portfolio_arrays import rebalance_arrays, sequential_sum
+from rebalance_plan import RebalancePlan
+from stock import Stock
+
+
+def _rebalance_block(prices: np.ndarray, holdings: np.ndarray, targets: np.ndarray,
+                     has_target: np.ndarray, tolerance: float) -> tuple[np.ndarray, ...]:
+    """ Rebalancea un bloque de clientes (filas) de una vez.
+    Retorna arreglos compactos (fila, columna, compra?, acciones, valor) en vez de objetos Rebalance,
+    asi se pueden devolver baratos desde otro proceso."""
+    total = sequential_sum(holdings * prices)
+    # Clientes sin objetivo o sin valor no se pueden rebalancear, igual que en Portfolio.rebalance
+    valid = (total != 0) & has_target.any(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value_diff, trade = rebalance_arrays(prices, holdings, targets, total[:, None], tolerance)
+    trade &= has_target
+    trade &= valid[:, None]
+
+    rows, cols = np.nonzero(trade)
+    diff = value_diff[rows, cols]
+    trade_prices = prices[cols]
+    if (trade_prices == 0).any():
+        raise ZeroDivisionError("float division by zero")
+    values = np.abs(diff)
+    return rows, cols, diff > 0, values / trade_prices, values
+
+
+class PortfolioBook:
+    """ Libro de portafolios: muchos clientes que comparten el mismo universo de acciones.
+    Guarda las cantidades y la distribucion objetivo como matrices (clientes x tickers) contra
+    un unico vector de precios, asi el rebalanceo de todo el libro se hace con operaciones matriciales."""
+
+    _INITIAL_CAPACITY = 16
+
+    def __init__(self, stocks: list[Stock] | None = None):
+        self._index : dict[str, int] = {} #Columna de cada ticker
+        self._stocks : list[Stock] = []
+        self._names : list[str] = [] #Nombre de cada cliente (fila)
+        self._rows = 0
+        self._holdings = np.zeros((self._INITIAL_CAPACITY, 0))
+        self._targets = np.zeros((self._INITIAL_CAPACITY, 0))
+        self._has_target = np.zeros((self._INITIAL_CAPACITY, 0), dtype=bool)
+        for stock in stocks or []:
+            self.add_stock(stock)
+
+    @classmethod
+    def from_portfolios(cls, portfolios: list[Portfolio]) -> "PortfolioBook":
+        book = cls()
+        for portfolio in portfolios:
+            book.add_portfolio(portfolio)
+        return book
+
+    def __len__(self) -> int:
+        return self._rows
+
+    @property
+    def names(self) -> list[str]:
+        return list(self._names)
+
+    @property
+    def tickers(self) -> list[str]:
+        return [stock.name for stock in self._stocks]
+
+    def _resize(self, rows: int, cols: int) -> None:
+        for attr in ("_holdings", "_targets", "_has_target"):
+            old = getattr(self, attr)
+            new = np.zeros((rows, cols), dtype=old.dtype)
+            new[:self._rows, :old.shape[1]] = old[:self._rows]
+            setattr(self, attr, new)
+
+    def add_stock(self, stock: Stock) -> int:
+        """ Agrega una accion al universo del libro y retorna su columna"""
+        if stock.currency != "USD":
+            raise ValueError(f"La accion {stock.name} esta en {stock.currency}, el libro solo soporta USD")
+        col = self._index.get(stock.name)
+        if col is not None:
+            if self._stocks[col] is not stock:
+                raise ValueError(f"Ya existe otra accion con el nombre {stock.name} en el libro")
+            return col
+        col = len(self._stocks)
+        self._index[stock.name] = col
+        self._stocks.append(stock)
+        if col == self._holdings.shape[1]:
+            self._resize(self._holdings.shape[0], max(self._INITIAL_CAPACITY, 2 * col))
+        return col
+
+    def add_portfolio(self, portfolio: Portfolio) -> int:
+        """ Copia las cantidades y la distribucion objetivo de un portafolio como una nueva fila del libro.
+        El portafolio no queda enlazado: cambios posteriores en el no se reflejan en el libro."""
+        portfolio.check_single_currency()
+        cols = [self.add_stock(stock) for stock in portfolio.stocks.values()]
+        if self._rows == self._holdings.shape[0]:
+            self._resize(2 * self._rows, self._holdings.shape[1])
+
+        row = self._rows
+        holdings = portfolio.holdings
+        self._holdings[row, cols] = [holdings[name] for name in portfolio.stocks]
+        targets = portfolio.target_allocation
+        target_cols = [self._index[name] for name in targets]
+        self._targets[row, target_cols] = list(targets.values())
+        self._has_target[row, target_cols] = True
+        self._names.append(portfolio.name)
+        self._rows += 1
+        return row
+
+    def set_holdings(self, row: int, stock_name: str, shares: float) -> None:
+        if not 0 <= row < self._rows:
+            raise IndexError("El cliente no existe en el libro")
+        if stock_name not in self._index:
+            raise ValueError("La accion no existe en el libro")
+        if shares < 0:
+            raise ValueError("La cantidad de acciones no puede ser negativa")
+        self._holdings[row, self._index[stock_name]] = shares
+
+    def prices(self) -> np.ndarray:
+        """ Vector de precios actual, se lee una sola vez por Stock para todo el libro"""
+        return np.fromiter((stock.price for stock in self._stocks), dtype=float, count=len(self._stocks))
+
+    def get_total_values(self) -> np.ndarray:
+        """ Valor total de cada cliente"""
+        cols = len(self._stocks)
+        return sequential_sum(self._holdings[:self._rows, :cols] * self.prices())
+
+    def rebalance(self, tolerance: float = 0.01, workers: int | None = None,
+                  chunk_size: int = 4096) -> list[RebalancePlan]:
+        """ Calcula las operaciones de rebalanceo de todos los clientes.
+        Retorna un RebalancePlan por cliente (mismo orden que `names`), con las acciones en el orden de columnas del libro.
+        Los clientes sin distribucion objetivo o con valor 0 no generan acciones.
+        Con `workers` > 1 los bloques de `chunk_size` clientes se reparten en un pool de procesos."""
+        prices = self.prices()
+        cols = len(self._stocks)
+        blocks = [
+            (prices, self._holdings[start:stop, :cols], self._targets[start:stop, :cols],
+             self._has_target[start:stop, :cols], tolerance)
+            for start, stop in ((s, min(s + chunk_size, self._rows)) for s in range(0, self._rows, chunk_size))
+        ]
+
+        if workers is not None and workers > 1 and len(blocks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_rebalance_block, *zip(*blocks)))
+        else:
+            results = [_rebalance_block(*block) for block in blocks]
+
+        # Las filas vienen ordenadas por cliente: cada plan toma su tramo de los arreglos del bloque
+        plans : list[RebalancePlan] = []
+        names = self.tickers
+        for block, (rows, cols_, buys, shares, values) in enumerate(results):
+            block_rows = min(chunk_size, self._rows - block * chunk_size)
+            bounds = np.searchsorted(rows, np.arange(block_rows + 1)).tolist()
+            for start, stop in zip(bounds, bounds[1:]):
+                plans.append(RebalancePlan.from_arrays([names[col] for col in cols_[start:stop].tolist()],
+                                                       buys[start:stop], shares[start:stop], values[start:stop]))
+        return plans
@@ -0,0 +1,260 @@
+""" Persistencia de portafolios: snapshots binarios columnares y journals de cambios.
+
+El snapshot guarda el universo de acciones (tickers y precios), y de cada portafolio sus cantidades y su
+distribucion objetivo en columnas tipo CSR (offsets por portafolio + columnas de posiciones).
+Al restaurar el archivo se mapea en memoria y los portafolios se construyen solo cuando se piden.
+
+El journal es un archivo de solo append con los cambios de set_holdings y update_price ocurridos despues
+del ultimo snapshot, para no tener que escribir un snapshot completo en cada cambio.
+"""
+import json
+import mmap
+import struct
+from array import array
+from collections.abc import Callable, Iterable
+
+from portfolio import Portfolio
+from stock import Stock
+from stock_universe import StockUniverse
+
+_MAGIC = b"PFSNAP1\0"
+_ITEMSIZE = {"B": 1, "I": 4, "Q": 8, "d": 8}
+
+
+def _pack_strings(strings: Iterable[str]) -> tuple[bytes, array]:
+    blob = bytearray()
+    offsets = array("Q", [0])
+    for string in strings:
+        blob += string.encode()
+        offsets.append(len(blob))
+    return bytes(blob), offsets
+
+
+def save_snapshot(path: str, portfolios: Iterable[Portfolio]) -> None:
+    """ Guarda uno o muchos portafolios (y todas sus acciones) en un archivo binario columnar"""
+    portfolios = list(portfolios)
+    stocks : dict[str, Stock] = {}
+    for portfolio in portfolios:
+        # El formato no guarda monedas ni tipos de cambio
+        portfolio.check_single_currency()
+        for name, stock in portfolio.stocks.items():
+            if stocks.setdefault(name, stock) is not stock and stocks[name].price != stock.price:
+                raise ValueError(f"Hay dos acciones distintas llamadas {name} con precios diferentes")
+    ticker_ids = {name: i for i, name in enumerate(stocks)}
+    ticker_blob, ticker_offsets = _pack_strings(stocks)
+    name_blob, name_offsets = _pack_strings(p.name for p in portfolios)
+
+    columns = {
+        "prices": array("d", (stock.price for stock in stocks.values())),
+        "vectorized": array("B", (p.vectorized for p in portfolios)),
+        "position_offsets": array("Q", [0]), "position_ids": array("I"), "shares": array("d"),
+        "target_offsets": array("Q", [0]), "target_ids": array("I"), "targets": array("d"),
+    }
+    for portfolio in portfolios:
+        holdings = portfolio.holdings
+        columns["position_ids"].extend(ticker_ids[name] for name in holdings)
+        columns["shares"].extend(holdings.values())
+        columns["position_offsets"].append(len(columns["shares"]))
+        targets = portfolio.target_allocation
+        columns["target_ids"].extend(ticker_ids[name] for name in targets)
+        columns["targets"].extend(targets.values())
+        columns["target_offsets"].append(len(columns["targets"]))
+    columns["ticker_blob"] = array("B", ticker_blob)
+    columns["ticker_offsets"] = ticker_offsets
+    columns["name_blob"] = array("B", name_blob)
+    columns["name_offsets"] = name_offsets
+
+    # Formato: magic, offset del header, columnas alineadas a 8 bytes y al final el header JSON
+    sections = {}
+    with open(path, "wb") as f:
+        f.write(_MAGIC + struct.pack("<Q", 0))
+        for name, column in columns.items():
+            f.write(b"\0" * (-f.tell() % 8))
+            sections[name] = [column.typecode, f.tell(), len(column)]
+            column.tofile(f)
+        header_offset = f.tell()
+        f.write(json.dumps({"version": 1, "sections": sections}).encode())
+        f.seek(len(_MAGIC))
+        f.write(struct.pack("<Q", header_offset))
+
+
+class Snapshot:
+    """ Snapshot abierto con memoria mapeada. Las columnas no se leen hasta que se usan,
+    y cada portafolio se construye (y se guarda) solo la primera vez que se pide."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Archivo vacio
+            self._file.close()
+            raise ValueError("El archivo no es un snapshot de portafolios")
+        if self._mmap[:len(_MAGIC)] != _MAGIC:
+            self.close()
+            raise ValueError("El archivo no es un snapshot de portafolios")
+        header_offset = struct.unpack_from("<Q", self._mmap, len(_MAGIC))[0]
+        header = json.loads(self._mmap[header_offset:])
+
+        self._view = memoryview(self._mmap)
+        self._columns = {}
+        for name, (typecode, offset, count) in header["sections"].items():
+            self._columns[name] = self._view[offset:offset + count * _ITEMSIZE[typecode]].cast(typecode)
+
+        self._universe = None
+        self._portfolios : dict[int, Portfolio] = {}
+        self._index : dict[str, int] | None = None
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for column in getattr(self, "_columns", {}).values():
+            column.release()
+        if hasattr(self, "_view"):
+            self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return len(self._columns["vectorized"])
+
+    def name(self, index: int) -> str:
+        offsets = self._columns["name_offsets"]
+        return bytes(self._columns["name_blob"][offsets[index]:offsets[index + 1]]).decode()
+
+    @property
+    def universe(self) -> StockUniverse:
+        """ Universo de acciones del snapshot (con los precios guardados), se crea la primera vez que se usa"""
+        if self._universe is None:
+            c = self._columns
+            self._universe = StockUniverse.from_columns(c["ticker_blob"], c["ticker_offsets"], c["prices"])
+        return self._universe
+
+    def stock(self, name: str) -> Stock | None:
+        return self.universe.stock(name) if name in self.universe else None
+
+    def portfolio(self, index: int) -> Portfolio:
+        """ Construye (una sola vez) el portafolio en la posicion index"""
+        if not 0 <= index < len(self):
+            raise IndexError("El portafolio no existe en el snapshot")
+        portfolio = self._portfolios.get(index)
+        if portfolio is not None:
+            return portfolio
+
+        c = self._columns
+        universe = self.universe
+        portfolio = Portfolio(self.name(index), vectorized=bool(c["vectorized"][index]), universe=universe)
+        start, end = c["position_offsets"][index], c["position_offsets"][index + 1]
+        ids = c["position_ids"][start:end]
+        portfolio.add_instruments(ids)
+        portfolio.set_holdings_many(dict(zip((universe.name_of(i) for i in ids), c["shares"][start:end])))
+        start, end = c["target_offsets"][index], c["target_offsets"][index + 1]
+        if end > start:
+            names = (universe.name_of(i) for i in c["target_ids"][start:end])
+            portfolio.set_target_allocation(dict(zip(names, c["targets"][start:end])))
+        self._portfolios[index] = portfolio
+        return portfolio
+
+    def get(self, name: str) -> Portfolio | None:
+        """ Busca un portafolio por nombre (si hay nombres repetidos retorna el primero)"""
+        if self._index is None:
+            self._index = {}
+            for i in range(len(self)):
+                self._index.setdefault(self.name(i), i)
+        index = self._index.get(name)
+        return None if index is None else self.portfolio(index)
+
+    def portfolios(self):
+        for index in range(len(self)):
+            yield self.portfolio(index)
+
+
+_RECORD = struct.Struct("<cHHd") #Tipo, largo del portafolio, largo del ticker, valor
+_HOLDINGS = b"H"
+_PRICE = b"P"
+
+
+class Journal:
+    """ Journal de solo append con los cambios de cantidades (set_holdings) y precios (update_price).
+    Se puede escribir a mano o enganchar a portafolios con attach para que registre los cambios solo."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "ab")
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def record_holdings(self, portfolio_name: str, stock_name: str, shares: float) -> None:
+        portfolio_key, stock_key = portfolio_name.encode(), stock_name.encode()
+        self._file.write(_RECORD.pack(_HOLDINGS, len(portfolio_key), len(stock_key), shares) + portfolio_key + stock_key)
+
+    def record_price(self, stock_name: str, price: float) -> None:
+        stock_key = stock_name.encode()
+        self._file.write(_RECORD.pack(_PRICE, 0, len(stock_key), price) + stock_key)
+
+    def attach(self, portfolio: Portfolio) -> None:
+        """ Registra automaticamente los cambios de cantidades del portafolio y de precios de sus acciones"""
+        portfolio.subscribe(self)
+        for stock in portfolio.stocks.values():
+            stock.subscribe(self)
+
+    def detach(self, portfolio: Portfolio) -> None:
+        portfolio.unsubscribe(self)
+        for stock in portfolio.stocks.values():
+            stock.unsubscribe(self)
+
+    def on_portfolio_change(self, portfolio: Portfolio, stock_names) -> None:
+        holdings = portfolio.holdings
+        for stock_name in stock_names:
+            # Tambien se registran las acciones agregadas despues de attach
+            portfolio.get_stock(stock_name).subscribe(self)
+            self.record_holdings(portfolio.name, stock_name, holdings[stock_name])
+
+    def on_price_update(self, stock: Stock, old_price: float) -> None:
+        self.record_price(stock.name, stock.price)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    @staticmethod
+    def replay(path: str, get_portfolio: Callable[[str], Portfolio | None],
+               get_stock: Callable[[str], Stock | None]) -> int:
+        """ Aplica los cambios del journal en orden. Retorna cuantos se aplicaron.
+        Los cambios de portafolios o acciones que no existen se ignoran, y un ultimo registro
+        incompleto (ej: el proceso se cayo mientras escribia) se descarta."""
+        with open(path, "rb") as f:
+            data = f.read()
+        applied = 0
+        position = 0
+        while position + _RECORD.size <= len(data):
+            kind, portfolio_len, stock_len, value = _RECORD.unpack_from(data, position)
+            position += _RECORD.size
+            if position + portfolio_len + stock_len > len(data):
+                break
+            portfolio_name = data[position:position + portfolio_len].decode()
+            position += portfolio_len
+            stock_name = data[position:position + stock_len].decode()
+            position += stock_len
+
+            if kind == _PRICE:
+                stock = get_stock(stock_name)
+                if stock is not None:
+                    stock.update_price(value)
+                    applied += 1
+            elif kind == _HOLDINGS:
+                portfolio = get_portfolio(portfolio_name)
+                if portfolio is not None and stock_name in portfolio.stocks:
+                    portfolio.set_holdings(stock_name, value)
+                    applied += 1
+            else:
+                raise ValueError("El journal esta corrupto")
+        return applied
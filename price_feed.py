@@ -0,0 +1,186 @@
+import asyncio
+import csv
+import json
+import time
+from collections.abc import AsyncIterator, Iterable
+from dataclasses import dataclass, field
+
+from portfolio import Portfolio
+from rebalance_plan import RebalancePlan
+from stock import Stock
+from stock_registry import StockRegistry
+
+_END = object() #Marca de fin del flujo de precios en la cola
+
+
+@dataclass
+class StageStats:
+    """ Contador de una etapa del pipeline: cantidad de elementos procesados y tiempo ocupado en la etapa"""
+
+    count: int = 0
+    seconds: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """ Elementos por segundo"""
+        return self.count / self.seconds if self.seconds > 0 else 0.0
+
+
+@dataclass
+class FeedStats:
+    """ Contadores del pipeline de precios"""
+
+    received: StageStats = field(default_factory=StageStats) #Ticks leidos de la fuente
+    applied: StageStats = field(default_factory=StageStats) #Precios aplicados a los Stock (ya agrupados)
+    rebalanced: StageStats = field(default_factory=StageStats) #Portafolios pendientes que se revisaron
+    batches: int = 0 #Ventanas procesadas
+    coalesced: int = 0 #Ticks descartados por llegar otro del mismo ticker en la misma ventana
+    rejected: int = 0 #Ticks de tickers desconocidos o con precio invalido
+    signals: int = 0 #Portafolios que superaron la tolerancia
+
+
+class PriceFeed:
+    """ Pipeline asyncio que consume ticks de precio (ticker, precio) y emite senales de rebalanceo.
+    Los ticks se agrupan por ticker dentro de una ventana de tiempo (solo se aplica el ultimo precio),
+    se aplican en bloque y luego se rebalancean solo los portafolios afectados usando el StockRegistry.
+    La cola entre la lectura y la aplicacion es acotada: si el consumidor o la aplicacion se atrasan,
+    la lectura se detiene en vez de acumular memoria."""
+
+    def __init__(self, stocks: Iterable[Stock], registry: StockRegistry, tolerance: float = 0.01,
+                 window: float = 0.05, max_queue: int = 10_000):
+        if window < 0:
+            raise ValueError("La ventana de tiempo no puede ser negativa")
+        if max_queue <= 0:
+            raise ValueError("El tamaño de la cola debe ser positivo")
+        self._stocks = {stock.name: stock for stock in stocks}
+        self._registry = registry
+        self._tolerance = tolerance
+        self._window = window
+        self._max_queue = max_queue
+        self.stats = FeedStats()
+
+    async def _read(self, ticks: AsyncIterator[tuple[str, float]], queue: asyncio.Queue) -> None:
+        try:
+            async for tick in ticks:
+                await queue.put(tick) # Se bloquea si la cola esta llena (back-pressure)
+                self.stats.received.count += 1
+        finally:
+            # Si la fuente falla igual se avisa el fin, salvo que la tarea haya sido cancelada
+            if not asyncio.current_task().cancelling():
+                await queue.put(_END)
+
+    async def _collect(self, queue: asyncio.Queue) -> tuple[dict[str, float], bool]:
+        """ Espera el primer tick y junta los que lleguen dentro de la ventana. Retorna (precios, termino)"""
+        tick = await queue.get()
+        if tick is _END:
+            return {}, True
+
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._window
+        prices = {}
+        finished = False
+        while True:
+            ticker, price = tick
+            if ticker in prices:
+                self.stats.coalesced += 1
+            prices[ticker] = price
+
+            # Se vacia lo que ya esta en la cola sin esperar, y luego se espera hasta el fin de la ventana
+            if not queue.empty():
+                tick = queue.get_nowait()
+            else:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    tick = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if tick is _END:
+                finished = True
+                break
+        self.stats.received.seconds += time.perf_counter() - start
+        return prices, finished
+
+    def _apply(self, prices: dict[str, float]) -> None:
+        start = time.perf_counter()
+        for ticker, price in prices.items():
+            stock = self._stocks.get(ticker)
+            if stock is None:
+                self.stats.rejected += 1
+                continue
+            try:
+                stock.update_price(price)
+            except ValueError:
+                self.stats.rejected += 1
+                continue
+            self.stats.applied.count += 1
+        self.stats.applied.seconds += time.perf_counter() - start
+
+    def _signals(self) -> list[tuple[Portfolio, RebalancePlan]]:
+        start = time.perf_counter()
+        pending = len(self._registry.dirty)
+        results = self._registry.rebalance_dirty(self._tolerance)
+        signals = [(portfolio, actions) for portfolio, actions in results.items() if actions]
+        self.stats.rebalanced.count += pending
+        self.stats.rebalanced.seconds += time.perf_counter() - start
+        self.stats.signals += len(signals)
+        return signals
+
+    async def run(self, ticks: AsyncIterator[tuple[str, float]]) -> AsyncIterator[list[tuple[Portfolio, RebalancePlan]]]:
+        """ Consume los ticks y entrega, por cada ventana, la lista de (portafolio, acciones) que superaron la tolerancia.
+        Las ventanas sin senales no entregan nada."""
+        queue = asyncio.Queue(maxsize=self._max_queue)
+        reader = asyncio.create_task(self._read(ticks, queue))
+        try:
+            finished = False
+            while not finished:
+                prices, finished = await self._collect(queue)
+                if not prices:
+                    continue
+                self.stats.batches += 1
+                self._apply(prices)
+                signals = self._signals()
+                if signals:
+                    yield signals
+            await reader # Propaga errores de la fuente
+        finally:
+            if not reader.done():
+                reader.cancel()
+                try:
+                    await reader
+                except asyncio.CancelledError:
+                    pass
+
+
+# Fuentes de ticks para pruebas y replays
+
+async def replay_jsonl(path: str) -> AsyncIterator[tuple[str, float]]:
+    """ Lee ticks de un archivo JSONL con lineas {"ticker": "META", "price": 520.5}"""
+    with open(path, encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield record["ticker"], float(record["price"])
+            if i % 1000 == 0:
+                await asyncio.sleep(0) # Deja correr a las otras etapas
+
+
+async def replay_csv(path: str) -> AsyncIterator[tuple[str, float]]:
+    """ Lee ticks de un archivo CSV con columnas ticker,price"""
+    with open(path, newline="", encoding="utf-8") as f:
+        for i, row in enumerate(csv.DictReader(f)):
+            yield row["ticker"], float(row["price"])
+            if i % 1000 == 0:
+                await asyncio.sleep(0)
+
+
+async def read_stream(reader: asyncio.StreamReader) -> AsyncIterator[tuple[str, float]]:
+    """ Lee ticks con formato 'TICKER,PRECIO' (uno por linea) desde un socket local"""
+    while line := await reader.readline():
+        line = line.strip()
+        if line:
+            ticker, price = line.decode().split(",")
+            yield ticker, float(price)
@@ -7,7 +7,7 @@ class Action(str, Enum):
     BUY = 'BUY'
     SELL = 'SELL'
 
-@dataclass
+@dataclass(slots=True)
 class Rebalance:
     """ La clase rebalance, almacena la informacion de un rebalance, tiene un nombre, accion, cantidad de acciones y valor"""
 
@@ -0,0 +1,179 @@
+import csv
+import json
+from array import array
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from typing import TextIO
+
+from rebalance import Action, Rebalance
+
+_FIELDS = ("name", "action", "shares", "value")
+
+
+class RebalancePlan:
+    """ Resultado de un rebalanceo guardado por columnas: nombres, tipo de accion (compra/venta),
+    cantidad de acciones y valor en arreglos paralelos, en vez de un objeto Rebalance por operacion.
+
+    Se comporta como la lista de Rebalance que se retornaba antes (len, iterar, indexar, comparar con listas):
+    los objetos Rebalance se crean solo cuando se piden. Filtrar, ordenar y exportar trabajan sobre las columnas.
+
+    El plan no se modifica despues de armarlo (salvo append): indexar o iterar entrega copias nuevas de cada fila,
+    y las columnas (names, shares, values) tambien son copias, cambiarlas no altera el plan."""
+
+    __slots__ = ("_names", "_buy", "_shares", "_values")
+
+    def __init__(self, names: Iterable[str] = (), buy: Iterable[bool] = (),
+                 shares: Iterable[float] = (), values: Iterable[float] = ()):
+        self._names : list[str] = list(names)
+        self._buy = array("b", buy) #1 = BUY, 0 = SELL
+        self._shares = array("d", shares)
+        self._values = array("d", values) #Siempre positivo, como en Rebalance
+        if not len(self._names) == len(self._buy) == len(self._shares) == len(self._values):
+            raise ValueError("Las columnas del plan deben tener el mismo largo")
+
+    @classmethod
+    def from_actions(cls, actions: Iterable[Rebalance]) -> "RebalancePlan":
+        plan = cls()
+        for action in actions:
+            plan.append(action.name, action.action, action.shares, action.value)
+        return plan
+
+    @classmethod
+    def from_arrays(cls, names: Iterable[str], buy, shares, values) -> "RebalancePlan":
+        """ Arma el plan desde arreglos de NumPy (buy booleano, shares y values float64), copiando directo sus bytes"""
+        return cls(names, buy.astype("i1").tobytes(), shares.astype("f8").tobytes(), values.astype("f8").tobytes())
+
+    def append(self, name: str, action: Action, shares: float, value: float) -> None:
+        self._names.append(name)
+        self._buy.append(action == Action.BUY)
+        self._shares.append(shares)
+        self._values.append(value)
+
+    # Compatibilidad con list[Rebalance]
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _row(self, i: int) -> Rebalance:
+        return Rebalance(self._names[i], Action.BUY if self._buy[i] else Action.SELL, self._shares[i], self._values[i])
+
+    def __getitem__(self, index: int | slice) -> "Rebalance | RebalancePlan":
+        """ Un Rebalance nuevo con los datos de la fila (copia), o un plan nuevo con las filas del slice"""
+        if isinstance(index, slice):
+            return self._take(range(len(self))[index])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Indice fuera del plan")
+        return self._row(index)
+
+    def __iter__(self) -> Iterator[Rebalance]:
+        for i in range(len(self)):
+            yield self._row(i)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, RebalancePlan):
+            return (self._names == other._names and self._buy == other._buy
+                    and self._shares == other._shares and self._values == other._values)
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"RebalancePlan({list(self)!r})"
+
+    # Columnas y resumenes
+
+    @property
+    def names(self) -> list[str]:
+        return list(self._names)
+
+    @property
+    def shares(self) -> array:
+        return array("d", self._shares)
+
+    @property
+    def values(self) -> array:
+        return array("d", self._values)
+
+    @property
+    def buy_mask(self) -> array:
+        """ 1 si la operacion es compra, 0 si es venta"""
+        return array("b", self._buy)
+
+    def is_buy(self, i: int) -> bool:
+        return bool(self._buy[i])
+
+    def buy_value(self) -> float:
+        """ Valor total a comprar"""
+        return sum(v for b, v in zip(self._buy, self._values) if b)
+
+    def sell_value(self) -> float:
+        """ Valor total a vender"""
+        return sum(v for b, v in zip(self._buy, self._values) if not b)
+
+    # Filtros y orden, retornan un plan nuevo
+
+    def _take(self, rows: Iterable[int]) -> "RebalancePlan":
+        rows = list(rows)
+        plan = RebalancePlan()
+        plan._names = [self._names[i] for i in rows]
+        plan._buy = array("b", (self._buy[i] for i in rows))
+        plan._shares = array("d", (self._shares[i] for i in rows))
+        plan._values = array("d", (self._values[i] for i in rows))
+        return plan
+
+    def buys(self) -> "RebalancePlan":
+        return self._take(i for i, b in enumerate(self._buy) if b)
+
+    def sells(self) -> "RebalancePlan":
+        return self._take(i for i, b in enumerate(self._buy) if not b)
+
+    def filter(self, action: Action | None = None, min_value: float = 0.0,
+               names: Iterable[str] | None = None) -> "RebalancePlan":
+        """ Operaciones de un tipo, con valor mayor o igual a min_value y/o de ciertos tickers"""
+        wanted = None if names is None else set(names)
+        buy = None if action is None else action == Action.BUY
+        return self._take(
+            i for i in range(len(self))
+            if (buy is None or self._buy[i] == buy) and self._values[i] >= min_value
+            and (wanted is None or self._names[i] in wanted)
+        )
+
+    def sort_by(self, field: str = "value", reverse: bool = False) -> "RebalancePlan":
+        """ Ordena por "name", "action", "shares" o "value" """
+        columns : dict[str, Callable[[int], object]] = {
+            "name": self._names.__getitem__, "action": self._buy.__getitem__,
+            "shares": self._shares.__getitem__, "value": self._values.__getitem__,
+        }
+        if field not in columns:
+            raise ValueError(f"No se puede ordenar por {field}")
+        return self._take(sorted(range(len(self)), key=columns[field], reverse=reverse))
+
+    # Exportacion
+
+    def to_numpy(self):
+        """ Arreglo estructurado de NumPy con columnas name, action, shares y value (requiere NumPy)"""
+        import numpy as np
+
+        width = max((len(name) for name in self._names), default=1)
+        result = np.zeros(len(self), dtype=[("name", f"U{width}"), ("action", "U4"), ("shares", "f8"), ("value", "f8")])
+        result["name"] = self._names
+        result["action"] = np.where(np.frombuffer(self._buy, dtype=np.int8).astype(bool), "BUY", "SELL")
+        result["shares"] = np.frombuffer(self._shares, dtype=np.float64)
+        result["value"] = np.frombuffer(self._values, dtype=np.float64)
+        return result
+
+    def records(self) -> Iterator[tuple[str, str, float, float]]:
+        """ Filas (name, action, shares, value) como tuplas, sin crear objetos Rebalance"""
+        for name, buy, shares, value in zip(self._names, self._buy, self._shares, self._values):
+            yield name, "BUY" if buy else "SELL", shares, value
+
+    def to_csv(self, f: TextIO) -> None:
+        writer = csv.writer(f)
+        writer.writerow(_FIELDS)
+        writer.writerows(self.records())
+
+    def to_json(self) -> str:
+        return json.dumps([dict(zip(_FIELDS, record)) for record in self.records()])
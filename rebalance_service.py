@@ -0,0 +1,217 @@
+""" Servicio residente de rebalanceo sobre un socket TCP o Unix.
+
+Mantiene los portafolios y las acciones en memoria, asi cada consulta no tiene que reconstruirlos.
+Protocolo de texto, una linea por pedido y una linea por respuesta (en el mismo orden, se pueden enviar
+varios pedidos sin esperar las respuestas). Los nombres de portafolios y tickers no pueden tener espacios.
+
+    PING                                  -> OK PONG
+    PRICE <ticker> <precio>               -> OK
+    HOLD <portafolio> <ticker> <cantidad> -> OK
+    TARGET <portafolio> <ticker>=<peso>...-> OK
+    REBAL <portafolio> [tolerancia]       -> OK BUY,META,<acciones>,<valor> SELL,AAPL,...
+    REPORT <portafolio>                   -> OK <valor total> META=<actual> AAPL=<actual> ...
+    (errores)                             -> ERR <mensaje>
+
+Uso:
+    python rebalance_service.py --snapshot portafolios.snap --port 8765
+    python rebalance_service.py --snapshot portafolios.snap --unix /tmp/rebalance.sock
+"""
+import argparse
+import asyncio
+from collections.abc import Iterable
+
+from portfolio import Portfolio
+from rebalance import Action
+from rebalance_plan import RebalancePlan
+from stock import Stock
+
+
+class RebalanceService:
+    """ Atiende pedidos del protocolo sobre portafolios residentes. Cada conexion se atiende en su propia tarea;
+    como los pedidos se procesan completos sin ceder el control, no se mezclan cambios entre clientes."""
+
+    def __init__(self, portfolios: Iterable[Portfolio], stocks: Iterable[Stock] = ()):
+        self._portfolios : dict[str, Portfolio] = {}
+        self._stocks : dict[str, Stock] = {stock.name: stock for stock in stocks}
+        for portfolio in portfolios:
+            self.add_portfolio(portfolio)
+        self.requests = 0 #Pedidos atendidos
+        self._commands = {"PING": self._ping, "PRICE": self._price, "HOLD": self._hold,
+                          "TARGET": self._target, "REBAL": self._rebalance, "REPORT": self._report}
+
+    def add_portfolio(self, portfolio: Portfolio) -> None:
+        """ Agrega un portafolio y sus acciones. Como en PortfolioBook, un ticker corresponde a un unico Stock:
+        si el portafolio usa otro objeto con un ticker ya registrado, PRICE no le llegaria y se rechaza."""
+        for name, stock in portfolio.stocks.items():
+            existing = self._stocks.get(name)
+            if existing is not None and existing is not stock:
+                raise ValueError(f"Ya existe otra accion con el nombre {name} en el servicio")
+        self._portfolios[portfolio.name] = portfolio
+        for name, stock in portfolio.stocks.items():
+            self._stocks.setdefault(name, stock)
+
+    def _portfolio(self, name: str) -> Portfolio:
+        portfolio = self._portfolios.get(name)
+        if portfolio is None:
+            raise ValueError(f"El portafolio {name} no existe")
+        return portfolio
+
+    def handle(self, line: str | bytes) -> str:
+        """ Procesa un pedido (texto, o bytes en UTF-8 como llegan del socket) y retorna la respuesta (sin salto de linea)"""
+        self.requests += 1
+        if isinstance(line, bytes):
+            try:
+                line = line.decode()
+            except UnicodeDecodeError:
+                return "ERR El pedido no es texto UTF-8 valido"
+        parts = line.split()
+        if not parts:
+            return "ERR Pedido vacio"
+        command = self._commands.get(parts[0].upper())
+        if command is None:
+            return f"ERR Comando desconocido {parts[0]}"
+        try:
+            return command(*parts[1:])
+        except TypeError:
+            return f"ERR Argumentos invalidos para {parts[0].upper()}"
+        except (ValueError, ZeroDivisionError) as e:
+            return f"ERR {e}"
+
+    def _ping(self) -> str:
+        return "OK PONG"
+
+    def _price(self, ticker: str, price: str) -> str:
+        stock = self._stocks.get(ticker)
+        if stock is None:
+            raise ValueError(f"La accion {ticker} no existe")
+        stock.update_price(float(price))
+        return "OK"
+
+    def _hold(self, name: str, ticker: str, shares: str) -> str:
+        self._portfolio(name).set_holdings(ticker, float(shares))
+        return "OK"
+
+    def _target(self, name: str, *weights: str) -> str:
+        allocations = {}
+        for weight in weights:
+            ticker, _, value = weight.partition("=")
+            allocations[ticker] = float(value)
+        self._portfolio(name).set_target_allocation(allocations)
+        return "OK"
+
+    def _rebalance(self, name: str, tolerance: str = "0.01") -> str:
+        actions = self._portfolio(name).rebalance(float(tolerance))
+        # repr de un float se puede leer de vuelta sin perder precision
+        return " ".join(["OK", *(f"{action},{ticker},{shares!r},{value!r}" for ticker, action, shares, value in actions.records())])
+
+    def _report(self, name: str) -> str:
+        portfolio = self._portfolio(name)
+        allocation = portfolio.get_current_allocation()
+        return " ".join(["OK", repr(portfolio.get_total_value()), *(f"{t}={v!r}" for t, v in allocation.items())])
+
+    async def _on_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                writer.write((self.handle(line) + "\n").encode())
+                # drain solo espera si el cliente no esta leyendo y el buffer de salida se lleno
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start_tcp(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        """ Empieza a escuchar en TCP (port=0 elige un puerto libre, ver server.sockets)"""
+        return await asyncio.start_server(self._on_client, host, port)
+
+    async def start_unix(self, path: str) -> asyncio.Server:
+        return await asyncio.start_unix_server(self._on_client, path)
+
+
+class RebalanceClient:
+    """ Cliente del servicio de rebalanceo"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect_tcp(cls, host: str, port: int) -> "RebalanceClient":
+        return cls(*await asyncio.open_connection(host, port))
+
+    @classmethod
+    async def connect_unix(cls, path: str) -> "RebalanceClient":
+        return cls(*await asyncio.open_unix_connection(path))
+
+    async def close(self) -> None:
+        self._writer.close()
+        await self._writer.wait_closed()
+
+    async def __aenter__(self) -> "RebalanceClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def pipeline(self, lines: list[str]) -> list[str]:
+        """ Envia varios pedidos de una vez y retorna las respuestas en el mismo orden"""
+        self._writer.write("".join(line + "\n" for line in lines).encode())
+        await self._writer.drain()
+        return [(await self._reader.readline()).decode().rstrip("\n") for _ in lines]
+
+    async def request(self, line: str) -> str:
+        return (await self.pipeline([line]))[0]
+
+    async def _ok(self, line: str) -> list[str]:
+        response = await self.request(line)
+        if not response.startswith("OK"):
+            raise ValueError(response[4:])
+        return response.split()[1:]
+
+    async def price(self, ticker: str, price: float) -> None:
+        await self._ok(f"PRICE {ticker} {price!r}")
+
+    async def hold(self, portfolio: str, ticker: str, shares: float) -> None:
+        await self._ok(f"HOLD {portfolio} {ticker} {shares!r}")
+
+    async def target(self, portfolio: str, allocations: dict[str, float]) -> None:
+        await self._ok(" ".join([f"TARGET {portfolio}", *(f"{t}={w!r}" for t, w in allocations.items())]))
+
+    async def rebalance(self, portfolio: str, tolerance: float = 0.01) -> RebalancePlan:
+        actions = RebalancePlan()
+        for item in await self._ok(f"REBAL {portfolio} {tolerance!r}"):
+            action, name, shares, value = item.split(",")
+            actions.append(name, Action(action), float(shares), float(value))
+        return actions
+
+    async def report(self, portfolio: str) -> tuple[float, dict[str, float]]:
+        """ Retorna (valor total, distribucion actual)"""
+        total, *allocation = await self._ok(f"REPORT {portfolio}")
+        return float(total), {t: float(v) for t, _, v in (item.partition("=") for item in allocation)}
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    from portfolio_snapshot import Snapshot
+
+    with Snapshot(args.snapshot) as snapshot:
+        service = RebalanceService(snapshot.portfolios())
+        if args.unix:
+            server = await service.start_unix(args.unix)
+        else:
+            server = await service.start_tcp(args.host, args.port)
+        async with server:
+            print(f"Escuchando en {', '.join(str(s.getsockname()) for s in server.sockets)}")
+            await server.serve_forever()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Servicio residente de rebalanceo")
+    parser.add_argument("--snapshot", required=True, help="Snapshot con los portafolios a cargar")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="Ruta de un socket Unix (en vez de TCP)")
+    asyncio.run(_serve(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+import numpy as np
+
+from portfolio import Portfolio
+from portfolio_arrays import rebalance_arrays, sequential_sum
+from rebalance_plan import RebalancePlan
+
+
+@dataclass
+class ScenarioResult:
+    """ Resultado de evaluar un portafolio bajo varios vectores de precios (una fila por escenario)"""
+
+    tickers: list[str] #Orden de las columnas
+    total_values: np.ndarray #(escenarios,)
+    allocations: np.ndarray #(escenarios, tickers) distribucion actual en cada escenario
+    value_diff: np.ndarray #(escenarios, tickers) valor a operar, positivo = comprar, 0 si no supera la tolerancia
+    buy_shares: np.ndarray #(escenarios, tickers) acciones a comprar
+    sell_shares: np.ndarray #(escenarios, tickers) acciones a vender
+
+    def __len__(self) -> int:
+        return len(self.total_values)
+
+    def actions(self, scenario: int) -> RebalancePlan:
+        """ Operaciones de un escenario como RebalancePlan, en el orden de las columnas"""
+        cols = np.flatnonzero(self.value_diff[scenario])
+        diff = self.value_diff[scenario, cols]
+        buy = diff > 0
+        shares = np.where(buy, self.buy_shares[scenario, cols], self.sell_shares[scenario, cols])
+        return RebalancePlan.from_arrays([self.tickers[col] for col in cols.tolist()], buy, shares, np.abs(diff))
+
+
+class ScenarioEngine:
+    """ Calcula que recomendaria Portfolio.rebalance bajo muchos precios hipoteticos (shocks, Monte Carlo)
+    en una sola pasada vectorizada. Copia las cantidades y el objetivo al crearse, nunca modifica
+    el portafolio ni sus Stock."""
+
+    def __init__(self, portfolio: Portfolio):
+        portfolio.check_single_currency()
+        if not portfolio.target_allocation:
+            raise ValueError("No se ha establecido una distribucion objetivo para el portafolio")
+        stocks = portfolio.stocks
+        holdings = portfolio.holdings
+        targets = portfolio.target_allocation
+        self.tickers = list(stocks)
+        self._shares = np.array([holdings[name] for name in self.tickers], dtype=float)
+        self._targets = np.array([targets.get(name, 0.0) for name in self.tickers], dtype=float)
+        self._has_target = np.array([name in targets for name in self.tickers])
+        self._prices = np.array([stock.price for stock in stocks.values()], dtype=float)
+
+    @property
+    def prices(self) -> np.ndarray:
+        """ Precios al momento de crear el motor, en el orden de `tickers`"""
+        return self._prices.copy()
+
+    def shocked_prices(self, shocks: np.ndarray) -> np.ndarray:
+        """ Matriz de precios aplicando retornos relativos (ej: -0.2 = caida de 20%) a los precios actuales"""
+        return self._prices * (1 + np.asarray(shocks, dtype=float))
+
+    def iter_run(self, prices: np.ndarray, tolerance: float = 0.01,
+                 chunk_size: int = 10_000) -> Iterator[ScenarioResult]:
+        """ Evalua los escenarios en bloques de chunk_size filas, entregando un resultado por bloque.
+        Util para procesar millones de escenarios sin tener todos los resultados en memoria."""
+        prices = np.asarray(prices, dtype=float)
+        if prices.ndim != 2 or prices.shape[1] != len(self.tickers):
+            raise ValueError("La matriz de precios debe tener una columna por accion del portafolio")
+        if (prices < 0).any():
+            raise ValueError("El precio de un stock no puede ser negativo")
+
+        for start in range(0, len(prices), chunk_size):
+            block = prices[start:start + chunk_size]
+            values = block * self._shares
+            total = sequential_sum(values)
+            valid = total != 0 # Sin valor no se puede rebalancear
+            safe_total = np.where(valid, total, 1.0)[:, None]
+
+            value_diff, trade = rebalance_arrays(block, self._shares, self._targets, safe_total, tolerance)
+            trade &= self._has_target
+            trade &= valid[:, None]
+            if (block[trade] == 0).any():
+                raise ZeroDivisionError("float division by zero")
+            value_diff = np.where(trade, value_diff, 0.0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                amounts = np.where(trade, np.abs(value_diff) / block, 0.0)
+            yield ScenarioResult(
+                tickers=self.tickers,
+                total_values=total,
+                allocations=np.where(valid[:, None], values / safe_total, 0.0),
+                value_diff=value_diff,
+                buy_shares=np.where(value_diff > 0, amounts, 0.0),
+                sell_shares=np.where(value_diff < 0, amounts, 0.0),
+            )
+
+    def run(self, prices: np.ndarray, tolerance: float = 0.01, chunk_size: int = 10_000) -> ScenarioResult:
+        """ Evalua todos los escenarios. Los calculos intermedios se hacen por bloques de chunk_size filas."""
+        chunks = list(self.iter_run(prices, tolerance, chunk_size))
+        if not chunks:
+            empty = np.zeros((0, len(self.tickers)))
+            return ScenarioResult(self.tickers, np.zeros(0), empty, empty, empty, empty)
+        return ScenarioResult(
+            tickers=self.tickers,
+            total_values=np.concatenate([c.total_values for c in chunks]),
+            allocations=np.concatenate([c.allocations for c in chunks]),
+            value_diff=np.concatenate([c.value_diff for c in chunks]),
+            buy_shares=np.concatenate([c.buy_shares for c in chunks]),
+            sell_shares=np.concatenate([c.sell_shares for c in chunks]),
+        )
@@ -1,14 +1,69 @@
+import math
+import weakref
+
+
+# Suscriptores guardados con referencias debiles, para que un portafolio descartado no quede vivo por sus acciones.
+# weakref.ref sin callback reutiliza la misma referencia para cada objeto, entonces con un solo suscriptor
+# se guarda esa referencia directamente (sin memoria extra por accion). Desde el segundo se usa un WeakSet:
+# agregar y sacar es O(1) y los suscriptores descartados se sacan solos, asi miles de portafolios
+# (o portafolios temporales) pueden compartir un mismo Stock.
+
+def add_subscriber(subscribers, subscriber):
+    """ Retorna los suscriptores (None, una referencia o un WeakSet) con subscriber agregado"""
+    if subscribers is None:
+        return weakref.ref(subscriber)
+    if type(subscribers) is weakref.ref:
+        current = subscribers()
+        if current is None:
+            return weakref.ref(subscriber) #La referencia anterior estaba muerta, se reemplaza
+        if current is subscriber:
+            return subscribers
+        subscribers = weakref.WeakSet((current,))
+    subscribers.add(subscriber)
+    return subscribers
+
+
+def remove_subscriber(subscribers, subscriber):
+    """ Retorna los suscriptores sin subscriber (ni referencias muertas)"""
+    if subscribers is None:
+        return None
+    if type(subscribers) is weakref.ref:
+        current = subscribers()
+        return None if current is None or current is subscriber else subscribers
+    subscribers.discard(subscriber)
+    return subscribers or None
+
+
+def live_subscribers(subscribers) -> list:
+    """ Objetos suscritos que siguen vivos (copia, se puede suscribir o desuscribir mientras se recorre)"""
+    if subscribers is None:
+        return []
+    if type(subscribers) is weakref.ref:
+        current = subscribers()
+        return [] if current is None else [current]
+    return list(subscribers)
+
+
 class Stock:
-    """ Clase stock, almacena la informacion de un activo, tiene un nombre y precio"""
-    def __init__(self, name: str, price: float):
+    """ Clase stock, almacena la informacion de un activo, tiene un nombre, precio y la moneda del precio"""
+
+    # Con __slots__ cada instancia no tiene su propio __dict__, ocupa bastante menos memoria
+    __slots__ = ("_name", "_price", "_currency", "_subscribers")
+
+    def __init__(self, name: str, price: float, currency: str = "USD"):
         # El precio de un stock no puede ser negativo, podria generar errores, por lo tanto hay que validarlo.
 
         if price < 0:
             raise ValueError("El precio de un stock no puede ser negativo")
+        if not math.isfinite(price):
+            raise ValueError("El precio de un stock debe ser un numero finito")
         self._price = price
         self._name = name
+        self._currency = currency
+        # Objetos suscritos a los cambios de precio (ej: portafolios), ver add_subscriber
+        self._subscribers = None
 
-    # Se crean propiedades para acceder al nombre y precio del stock  
+    # Se crean propiedades para acceder al nombre y precio del stock
     @property
     def name(self) -> str:
         return self._name
@@ -17,13 +72,37 @@ class Stock:
     def price(self) -> float:
         return self._price
 
+    @property
+    def currency(self) -> str:
+        return self._currency
+
+    def subscribe(self, subscriber) -> None:
+        """ Suscribe un objeto a los cambios de precio, debe implementar on_price_update(stock, old_price)"""
+        self._subscribers = add_subscriber(self._subscribers, subscriber)
+
+    def unsubscribe(self, subscriber) -> None:
+        self._subscribers = remove_subscriber(self._subscribers, subscriber)
+
     #Se crea un metodo para actualizar el precio, ya que si se usara la variable directamente,
     # podria no validar el nuevo precio, lo que podria generar errores en el futuro.
     def update_price(self, new_price: float) -> None:
         if new_price < 0:
             raise ValueError("El precio de un stock no puede ser negativo")
+        # inf o nan dejarian el valor total del portafolio en nan
+        if not math.isfinite(new_price):
+            raise ValueError("El precio de un stock debe ser un numero finito")
+        old_price = self._price
         self._price = new_price
+        # Solo se avisa si el precio realmente cambio
+        if self._subscribers is not None and new_price != old_price:
+            self._notify_price(old_price)
+
+    def _notify_price(self, old_price: float) -> None:
+        for subscriber in live_subscribers(self._subscribers):
+            subscriber.on_price_update(self, old_price)
 
 
     def __repr__(self) -> str:
-        return f"Stock(name='{self._name}', price={self._price:.2f})"
\ No newline at end of file
+        if self._currency != "USD":
+            return f"Stock(name='{self._name}', price={self.price:.2f}, currency='{self._currency}')"
+        return f"Stock(name='{self._name}', price={self.price:.2f})"
@@ -0,0 +1,97 @@
+from portfolio import Portfolio
+from rebalance_plan import RebalancePlan
+from stock import Stock
+
+
+class StockRegistry:
+    """ Indice inverso de cada Stock a los portafolios que lo tienen (con acciones o distribucion objetivo distinta de 0).
+    Cuando cambia el precio de un Stock solo se marcan como pendientes (dirty) los portafolios que lo tienen,
+    y rebalance_dirty recalcula solo esos, asi el costo de un tick depende de cuantos portafolios afecta."""
+
+    def __init__(self):
+        self._holders : dict[Stock, set[Portfolio]] = {} #Portafolios que tienen cada accion
+        self._positions : dict[Portfolio, dict[str, Stock]] = {} #Acciones indexadas de cada portafolio, por nombre
+        self._dirty : dict[Portfolio, None] = {} #Portafolios pendientes de rebalanceo (dict para mantener el orden)
+
+    def __contains__(self, portfolio: Portfolio) -> bool:
+        return portfolio in self._positions
+
+    def register(self, portfolio: Portfolio) -> None:
+        """ Agrega un portafolio al indice, queda marcado como pendiente"""
+        if portfolio in self._positions:
+            return
+        self._positions[portfolio] = {}
+        portfolio.subscribe(self)
+        self._reindex(portfolio, portfolio.stocks)
+        self._dirty[portfolio] = None
+
+    def unregister(self, portfolio: Portfolio) -> None:
+        stocks = self._positions.pop(portfolio, None)
+        if stocks is None:
+            return
+        portfolio.unsubscribe(self)
+        for stock in stocks.values():
+            self._remove_holder(stock, portfolio)
+        self._dirty.pop(portfolio, None)
+
+    def holders(self, stock: Stock) -> frozenset[Portfolio]:
+        """ Portafolios registrados que tienen la accion"""
+        return frozenset(self._holders.get(stock, ()))
+
+    @property
+    def dirty(self) -> list[Portfolio]:
+        return list(self._dirty)
+
+    def mark_dirty(self, portfolio: Portfolio) -> None:
+        if portfolio in self._positions:
+            self._dirty[portfolio] = None
+
+    def _reindex(self, portfolio: Portfolio, stock_names) -> None:
+        positions = self._positions[portfolio]
+        for stock_name in stock_names:
+            stock = portfolio.get_stock(stock_name)
+            holds = portfolio.holds(stock_name)
+            indexed = positions.get(stock_name)
+            # Se saca del indice si ya no la tiene, o si se reemplazo el Stock por otro con el mismo nombre
+            if indexed is not None and (indexed is not stock or not holds):
+                del positions[stock_name]
+                self._remove_holder(indexed, portfolio)
+                indexed = None
+
+            if holds and indexed is None:
+                positions[stock_name] = stock
+                holders = self._holders.setdefault(stock, set())
+                if not holders:
+                    stock.subscribe(self)
+                holders.add(portfolio)
+
+    def _remove_holder(self, stock: Stock, portfolio: Portfolio) -> None:
+        holders = self._holders.get(stock)
+        if holders is None:
+            return
+        holders.discard(portfolio)
+        if not holders:
+            del self._holders[stock]
+            stock.unsubscribe(self)
+
+    def on_portfolio_change(self, portfolio: Portfolio, stock_names) -> None:
+        """ Llamado por Portfolio al cambiar holdings, acciones o distribucion objetivo"""
+        self._reindex(portfolio, stock_names)
+        self._dirty[portfolio] = None
+
+    def on_price_update(self, stock: Stock, old_price: float) -> None:
+        """ Llamado por Stock.update_price, marca como pendientes solo los portafolios que tienen la accion"""
+        for portfolio in self._holders.get(stock, ()):
+            self._dirty[portfolio] = None
+
+    def rebalance_dirty(self, tolerance: float = 0.01) -> dict[Portfolio, RebalancePlan]:
+        """ Rebalancea solo los portafolios pendientes y limpia el conjunto.
+        Los portafolios que no se pueden rebalancear (sin objetivo o con valor 0) no aparecen en el resultado."""
+        dirty, self._dirty = self._dirty, {}
+        results = {}
+        for portfolio in dirty:
+            try:
+                results[portfolio] = portfolio.rebalance(tolerance)
+            except ValueError:
+                continue
+        return results
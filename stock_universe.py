@@ -0,0 +1,213 @@
+import math
+import sys
+from array import array
+
+from stock import Stock, add_subscriber, live_subscribers, remove_subscriber
+
+
+class UniverseStock(Stock):
+    """ Stock liviano que apunta a una posicion del StockUniverse, el precio vive en el arreglo del universo.
+    Se comporta igual que un Stock (mismas propiedades, validaciones y suscripciones)."""
+
+    __slots__ = ("_universe", "_id")
+
+    def __init__(self, universe: "StockUniverse", instrument_id: int):
+        # No se llama a Stock.__init__: el nombre y el precio ya estan validados en el universo
+        self._universe = universe
+        self._id = instrument_id
+        self._name = universe.name_of(instrument_id)
+        self._currency = "USD" #El universo guarda solo precios en la moneda base
+        self._subscribers = None
+
+    @property
+    def id(self) -> int:
+        return self._id
+
+    @property
+    def universe(self) -> "StockUniverse":
+        return self._universe
+
+    @property
+    def price(self) -> float:
+        return self._universe._prices[self._id]
+
+    def update_price(self, new_price: float) -> None:
+        if new_price < 0:
+            raise ValueError("El precio de un stock no puede ser negativo")
+        if not math.isfinite(new_price):
+            raise ValueError("El precio de un stock debe ser un numero finito")
+        self._universe._set_price(self._id, new_price)
+
+
+class StockUniverse:
+    """ Maestro de instrumentos indexados por un id entero, guardados en arreglos contiguos:
+    los tickers concatenados en un solo bloque de bytes, los precios en un arreglo de float64 y un indice
+    hash (direccionamiento abierto) de ticker a id. No hay un objeto Python por instrumento: los Stock
+    (UniverseStock) se crean solo cuando se piden y se reutilizan, asi cada instrumento ocupa unas decenas de bytes.
+
+    Ademas del aviso de cada Stock, el universo tiene un indice inverso por id (watch) para los portafolios que
+    guardan sus posiciones por id sin crear un Stock: avisa on_instrument_update(universe, instrument_id, old_price)."""
+
+    _EMPTY = -1
+
+    def __init__(self):
+        self._blob = bytearray() #Tickers concatenados en UTF-8
+        self._offsets = array("Q", [0]) #El ticker del id i esta en _blob[_offsets[i]:_offsets[i + 1]]
+        self._prices = array("d") #Precio de cada id, contiguo en memoria
+        self._table = array("q", [self._EMPTY] * 8) #Indice hash ticker -> id, tamaño potencia de 2
+        self._handles : dict[int, UniverseStock] = {} #Stocks ya creados, para que cada id tenga un unico objeto
+        # Suscriptores por id (referencias debiles como en Stock), alineado con _prices. Se crea al primer watch
+        self._watchers : list | None = None
+
+    @classmethod
+    def from_columns(cls, blob: bytes, offsets, prices) -> "StockUniverse":
+        """ Crea un universo directamente desde sus columnas (tickers concatenados, offsets y precios),
+        por ejemplo las de un snapshot, sin pasar ticker por ticker por add."""
+        if len(offsets) != len(prices) + 1:
+            raise ValueError("Debe haber un precio por ticker")
+        if any(price < 0 for price in prices):
+            raise ValueError("El precio de un stock no puede ser negativo")
+        if not all(math.isfinite(price) for price in prices):
+            raise ValueError("El precio de un stock debe ser un numero finito")
+        universe = cls()
+        universe._blob = bytearray(blob)
+        universe._offsets = array("Q", offsets)
+        universe._prices = array("d", prices)
+        size = 8
+        while size < 2 * len(universe._prices):
+            size *= 2
+        universe._table = array("q", [cls._EMPTY]) * (size // 2)
+        universe._grow_table()
+        return universe
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    def __contains__(self, name: str) -> bool:
+        return self._find(name.encode())[0] != self._EMPTY
+
+    def _find(self, key: bytes) -> tuple[int, int]:
+        """ Busca un ticker en el indice, retorna (id o _EMPTY, posicion en la tabla)"""
+        mask = len(self._table) - 1
+        slot = hash(key) & mask
+        blob, offsets, table = self._blob, self._offsets, self._table
+        while True:
+            instrument_id = table[slot]
+            if instrument_id == self._EMPTY or blob[offsets[instrument_id]:offsets[instrument_id + 1]] == key:
+                return instrument_id, slot
+            slot = (slot + 1) & mask
+
+    def _grow_table(self) -> None:
+        self._table = array("q", [self._EMPTY]) * (2 * len(self._table))
+        mask = len(self._table) - 1
+        blob, offsets, table = self._blob, self._offsets, self._table
+        for instrument_id in range(len(self._prices)):
+            slot = hash(bytes(blob[offsets[instrument_id]:offsets[instrument_id + 1]])) & mask
+            while table[slot] != self._EMPTY:
+                slot = (slot + 1) & mask
+            table[slot] = instrument_id
+
+    def add(self, name: str, price: float) -> int:
+        """ Agrega un instrumento y retorna su id. Si el ticker ya existe retorna el id existente sin cambiar el precio."""
+        key = name.encode()
+        instrument_id, slot = self._find(key)
+        if instrument_id != self._EMPTY:
+            return instrument_id
+        if price < 0:
+            raise ValueError("El precio de un stock no puede ser negativo")
+        if not math.isfinite(price):
+            raise ValueError("El precio de un stock debe ser un numero finito")
+
+        instrument_id = len(self._prices)
+        self._blob += key
+        self._offsets.append(len(self._blob))
+        self._prices.append(price)
+        if self._watchers is not None:
+            self._watchers.append(None)
+        self._table[slot] = instrument_id
+        # Se mantiene la tabla a lo mas medio llena para que las busquedas sean cortas
+        if 2 * len(self._prices) > len(self._table):
+            self._grow_table()
+        return instrument_id
+
+    def add_many(self, names: list[str], prices: list[float]) -> list[int]:
+        """ Agrega muchos instrumentos validando todo antes de modificar el universo"""
+        if len(names) != len(prices):
+            raise ValueError("Debe haber un precio por ticker")
+        if any(price < 0 for price in prices):
+            raise ValueError("El precio de un stock no puede ser negativo")
+        if not all(math.isfinite(price) for price in prices):
+            raise ValueError("El precio de un stock debe ser un numero finito")
+        return [self.add(name, price) for name, price in zip(names, prices)]
+
+    def id_of(self, name: str) -> int:
+        instrument_id = self._find(name.encode())[0]
+        if instrument_id == self._EMPTY:
+            raise ValueError(f"La accion {name} no existe en el universo")
+        return instrument_id
+
+    def name_of(self, instrument_id: int) -> str:
+        if not 0 <= instrument_id < len(self._prices):
+            raise ValueError("El instrumento no existe en el universo")
+        # Se interna para que todos los diccionarios que lo usen como llave compartan el mismo string
+        return sys.intern(self._blob[self._offsets[instrument_id]:self._offsets[instrument_id + 1]].decode())
+
+    def price(self, instrument_id: int) -> float:
+        return self._prices[instrument_id]
+
+    @property
+    def prices(self) -> memoryview:
+        """ Vista de solo lectura de los precios (sin copia), se puede pasar a np.frombuffer.
+        Mientras la vista exista no se pueden agregar instrumentos (el arreglo no puede crecer)."""
+        return memoryview(self._prices).toreadonly()
+
+    def stock(self, key: int | str) -> UniverseStock:
+        """ Retorna el Stock de un instrumento por id o ticker, siempre el mismo objeto para el mismo id"""
+        instrument_id = self.id_of(key) if isinstance(key, str) else key
+        if not 0 <= instrument_id < len(self._prices):
+            raise ValueError("El instrumento no existe en el universo")
+        handle = self._handles.get(instrument_id)
+        if handle is None:
+            handle = self._handles[instrument_id] = UniverseStock(self, instrument_id)
+        return handle
+
+    def update_prices(self, instrument_ids: list[int], prices: list[float]) -> None:
+        """ Actualiza muchos precios a la vez, valida todo antes de cambiar nada.
+        Solo se avisa a los suscriptores de los Stock que ya fueron creados."""
+        if len(instrument_ids) != len(prices):
+            raise ValueError("Debe haber un precio por instrumento")
+        if any(not 0 <= instrument_id < len(self._prices) for instrument_id in instrument_ids):
+            raise ValueError("El instrumento no existe en el universo")
+        if any(price < 0 for price in prices):
+            raise ValueError("El precio de un stock no puede ser negativo")
+        if not all(math.isfinite(price) for price in prices):
+            raise ValueError("El precio de un stock debe ser un numero finito")
+        for instrument_id, price in zip(instrument_ids, prices):
+            self._set_price(instrument_id, price)
+
+    def watch(self, instrument_id: int, subscriber) -> None:
+        """ Suscribe un objeto a los cambios de precio de un id, debe implementar
+        on_instrument_update(universe, instrument_id, old_price). No crea el Stock del instrumento."""
+        if not 0 <= instrument_id < len(self._prices):
+            raise ValueError("El instrumento no existe en el universo")
+        if self._watchers is None:
+            self._watchers = [None] * len(self._prices)
+        self._watchers[instrument_id] = add_subscriber(self._watchers[instrument_id], subscriber)
+
+    def unwatch(self, instrument_id: int, subscriber) -> None:
+        if self._watchers is not None and 0 <= instrument_id < len(self._watchers):
+            self._watchers[instrument_id] = remove_subscriber(self._watchers[instrument_id], subscriber)
+
+    def _set_price(self, instrument_id: int, price: float) -> None:
+        """ Cambia un precio ya validado y avisa al Stock del id (si fue creado) y a los suscritos por id"""
+        prices = self._prices
+        old_price = prices[instrument_id]
+        prices[instrument_id] = price
+        if price == old_price:
+            return
+        handle = self._handles.get(instrument_id)
+        if handle is not None and handle._subscribers is not None:
+            handle._notify_price(old_price)
+        if self._watchers is not None and self._watchers[instrument_id] is not None:
+            for subscriber in live_subscribers(self._watchers[instrument_id]):
+                subscriber.on_instrument_update(self, instrument_id, old_price)
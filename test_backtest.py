@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+
+from portfolio import Portfolio
+from rebalance import Action
+from rebalance_plan import RebalancePlan
+from stock import Stock
+
+try:
+    import numpy as np
+    from backtest import Backtest, load_prices
+except ImportError:  # NumPy es opcional
+    np = None
+
+
+@unittest.skipIf(np is None, "NumPy no esta instalado")
+class TestBacktest(unittest.TestCase):
+    """Test cases para el backtest de rebalanceo por tolerancia"""
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.tickers = ["META", "AAPL", "GOOG", "TSLA"]
+        steps = 400
+        returns = rng.normal(0, 0.02, size=(steps, len(self.tickers)))
+        self.prices = 100 * np.cumprod(1 + returns, axis=0)
+
+        self.stocks = [Stock(name, price) for name, price in zip(self.tickers, self.prices[0])]
+        self.p = Portfolio("Backtest")
+        for s in self.stocks:
+            self.p.add_stock(s)
+            self.p.set_holdings(s.name, 10)
+        # TSLA sin objetivo: nunca se opera
+        self.p.set_target_allocation({"META": 0.4, "AAPL": 0.3, "GOOG": 0.3})
+
+    def replay_with_portfolio(self, tolerance):
+        """Repite el historial paso a paso con Portfolio.rebalance, aplicando las operaciones"""
+        trades = []
+        for step, row in enumerate(self.prices):
+            for stock, price in zip(self.stocks, row):
+                stock.update_price(float(price))
+            for action in self.p.rebalance(tolerance):
+                trades.append((step, action))
+                delta = action.shares if action.action == Action.BUY else -action.shares
+                self.p.set_holdings(action.name, self.p.holdings[action.name] + delta)
+        return trades
+
+    def test_trades_match_portfolio_rebalance(self):
+        result = Backtest(self.p, self.prices, self.tickers).run(tolerance=0.03, chunk_size=64)
+        expected = self.replay_with_portfolio(0.03)
+
+        self.assertGreater(result.n_trades, 0)
+        self.assertEqual(len(result.trades), len(expected))
+        key = lambda item: (item[0], item[1].name)
+        for (step, got), (exp_step, exp) in zip(sorted(result.trades, key=key), sorted(expected, key=key)):
+            self.assertEqual((step, got.name, got.action), (exp_step, exp.name, exp.action))
+            self.assertAlmostEqual(got.shares, exp.shares)
+            self.assertAlmostEqual(got.value, exp.value)
+        self.assertNotIn("TSLA", {t.name for _, t in result.trades})
+        for name, shares in result.holdings.items():
+            self.assertAlmostEqual(shares, self.p.holdings[name])
+
+    def test_metrics(self):
+        loose = Backtest(self.p, self.prices, self.tickers).run(tolerance=0.2)
+        tight = Backtest(self.p, self.prices, self.tickers).run(tolerance=0.01)
+        self.assertGreater(tight.n_trades, loose.n_trades)
+        self.assertGreater(tight.turnover, loose.turnover)
+        self.assertGreaterEqual(tight.tracking_error, 0.0)
+        self.assertEqual(len(tight.values), len(self.prices))
+
+    def test_chunk_size_does_not_change_result(self):
+        a = Backtest(self.p, self.prices, self.tickers).run(tolerance=0.02, chunk_size=7)
+        b = Backtest(self.p, self.prices, self.tickers).run(tolerance=0.02, chunk_size=1000)
+        self.assertEqual(a.trades, b.trades)
+        self.assertEqual(a.plan, b.plan)
+        self.assertEqual(list(a.steps), [step for step, _ in b.trades])
+        self.assertIsInstance(a.plan, RebalancePlan)
+
+    def test_load_prices_memory_mapped(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            npy = os.path.join(tmp, "prices.npy")
+            np.save(npy, self.prices)
+            raw = os.path.join(tmp, "prices.bin")
+            self.prices.tofile(raw)
+
+            for prices in (load_prices(npy), load_prices(raw, n_tickers=len(self.tickers))):
+                self.assertIsInstance(prices, np.memmap)
+                np.testing.assert_array_equal(prices, self.prices)
+                result = Backtest(self.p, prices, self.tickers).run(tolerance=0.03)
+                self.assertGreater(result.n_trades, 0)
+                del prices
+
+    def test_missing_ticker_history(self):
+        """Caso de Borde: el portafolio tiene una accion sin historial"""
+        with self.assertRaises(ValueError):
+            Backtest(self.p, self.prices[:, :3], self.tickers[:3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+import weakref
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import batch_rebalance
+from portfolio import Portfolio
+from stock import Stock, live_subscribers
+
+
+class TestBatchRebalance(unittest.TestCase):
+    """Test cases para el rebalanceo por lotes"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.prices = os.path.join(self.tmp.name, "precios.csv")
+        with open(self.prices, "w", encoding="utf-8") as f:
+            f.write("ticker,price\nMETA,520.5\nAAPL,185.25\nTSLA,100\n")
+        self.records = [
+            {"name": "Jhano", "holdings": {"META": 10, "AAPL": 30}, "target": {"META": 0.4, "AAPL": 0.6}},
+            {"name": "Balanceado", "holdings": {"TSLA": 5}, "target": {"TSLA": 1.0}},
+            {"name": "Sin precio", "holdings": {"NVDA": 1}, "target": {"NVDA": 1.0}},
+            {"name": "Nuevo", "holdings": {"META": 2}, "target": {"AAPL": 0.5, "TSLA": 0.5}},
+        ]
+        self.portfolios = os.path.join(self.tmp.name, "portafolios.jsonl")
+        with open(self.portfolios, "w", encoding="utf-8") as f:
+            for record in self.records:
+                f.write(json.dumps(record) + "\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def expected(self, record):
+        stocks = {"META": Stock("META", 520.5), "AAPL": Stock("AAPL", 185.25), "TSLA": Stock("TSLA", 100.0)}
+        p = Portfolio(record["name"])
+        p.add_stocks(stocks[t] for t in dict.fromkeys([*record["holdings"], *record["target"]]))
+        p.set_holdings_many(record["holdings"])
+        p.set_target_allocation(record["target"])
+        return [(record["name"], a.name, a.action.value, a.shares, a.value) for a in p.rebalance()]
+
+    def test_jsonl_matches_portfolio_rebalance(self):
+        output = io.StringIO()
+        stats = batch_rebalance.run(self.portfolios, self.prices, output)
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        expected = self.expected(self.records[0]) + self.expected(self.records[3])
+        self.assertEqual([tuple(r.values()) for r in rows], expected)
+        self.assertEqual(stats.portfolios, 4)
+        self.assertEqual(stats.actions, len(expected))
+        self.assertEqual(stats.errors, [(3, "Sin precio", "La accion NVDA no tiene precio")])
+
+    def test_csv_input_and_output(self):
+        path = os.path.join(self.tmp.name, "portafolios.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("name,ticker,shares,target\nJhano,META,10,0.4\nJhano,AAPL,30,0.6\nNuevo,META,2,\n"
+                    "Nuevo,AAPL,,0.5\nNuevo,TSLA,0,0.5\n")
+        output = io.StringIO()
+        stats = batch_rebalance.run(path, self.prices, output, fmt="csv")
+        rows = list(csv.reader(io.StringIO(output.getvalue())))
+        self.assertEqual(rows[0], list(batch_rebalance.OUTPUT_COLUMNS))
+        expected = self.expected(self.records[0]) + self.expected(self.records[3])
+        self.assertEqual([(r[0], r[1], r[2], float(r[3]), float(r[4])) for r in rows[1:]], expected)
+        self.assertEqual(stats.portfolios, 2)
+
+    def test_workers_keep_order(self):
+        records = [{"name": f"Cliente {i}", "holdings": {"META": i, "AAPL": 100 - i},
+                    "target": {"META": 0.5, "AAPL": 0.5}} for i in range(200)]
+        with open(self.portfolios, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        serial, parallel = io.StringIO(), io.StringIO()
+        batch_rebalance.run(self.portfolios, self.prices, serial, chunk_size=7)
+        stats = batch_rebalance.run(self.portfolios, self.prices, parallel, workers=2, chunk_size=7)
+        self.assertEqual(parallel.getvalue(), serial.getvalue())
+        self.assertEqual(stats.portfolios, 200)
+
+    def test_cli(self):
+        output = os.path.join(self.tmp.name, "acciones.csv")
+        code = batch_rebalance.main([self.portfolios, self.prices, "--output", output])
+        self.assertEqual(code, 1)  # Hay un portafolio con error
+        with open(output, encoding="utf-8") as f:
+            self.assertEqual(f.readline().strip(), ",".join(batch_rebalance.OUTPUT_COLUMNS))
+
+    def write_lines(self, lines):
+        with open(self.portfolios, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def test_bad_records_are_reported(self):
+        """Casos de Borde: JSON mal formado, sin nombre, cantidades no numericas y precio 0 no detienen la corrida"""
+        with open(self.prices, "a", encoding="utf-8") as f:
+            f.write("ZERO,0\n")
+        self.write_lines([
+            json.dumps(self.records[0]),
+            '{"name": "Roto", "holdings": {',
+            json.dumps({"holdings": {"META": 1}, "target": {"META": 1.0}}),
+            json.dumps({"name": "Texto", "holdings": {"META": "diez"}, "target": {"META": 1.0}}),
+            json.dumps({"name": "Cero", "holdings": {"META": 1}, "target": {"ZERO": 1.0}}),
+            json.dumps({"name": "Lista", "holdings": [1, 2], "target": {}}),
+            "[1, 2]",
+            json.dumps(self.records[3]),
+        ])
+        for workers in (None, 2):
+            output = io.StringIO()
+            stats = batch_rebalance.run(self.portfolios, self.prices, output, workers=workers, chunk_size=3)
+            rows = [json.loads(line) for line in output.getvalue().splitlines()]
+            expected = self.expected(self.records[0]) + self.expected(self.records[3])
+            self.assertEqual([tuple(r.values()) for r in rows], expected)
+            self.assertEqual(stats.portfolios, 8)
+            self.assertEqual([(line, name) for line, name, _ in stats.errors],
+                             [(2, ""), (3, ""), (4, "Texto"), (5, "Cero"), (6, "Lista"), (7, "")])
+            self.assertIn("KeyError: 'name'", stats.errors[1][2])
+            self.assertIn("ZeroDivisionError", stats.errors[3][2])
+
+    def test_numbers_as_text_are_coerced(self):
+        record = {"name": "Texto", "holdings": {"META": "10", "AAPL": "30"}, "target": {"META": "0.4", "AAPL": "0.6"}}
+        self.write_lines([json.dumps(record)])
+        output = io.StringIO()
+        stats = batch_rebalance.run(self.portfolios, self.prices, output)
+        self.assertEqual(stats.errors, [])
+        rows = [tuple(json.loads(line).values()) for line in output.getvalue().splitlines()]
+        self.assertEqual(rows, [("Texto", *row[1:]) for row in self.expected(self.records[0])])
+
+    def test_bad_csv_rows(self):
+        """Caso de Borde: una fila invalida solo invalida su portafolio"""
+        path = os.path.join(self.tmp.name, "portafolios.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("name,ticker,shares,target\nMalo,META,x,0.5\nMalo,AAPL,1,0.5\nCorto,META\n"
+                    "Jhano,META,10,0.4\nJhano,AAPL,30,0.6\n")
+        output = io.StringIO()
+        stats = batch_rebalance.run(path, self.prices, output)
+        self.assertEqual([(line, name) for line, name, _ in stats.errors], [(2, "Malo"), (4, "Corto")])
+        self.assertEqual(len(output.getvalue().splitlines()), len(self.expected(self.records[0])))
+
+    def test_failed_worker_chunk(self):
+        """Caso de Borde: si falla el proceso de un bloque, solo sus registros quedan con error"""
+        future = Future()
+        future.set_exception(BrokenProcessPool("proceso terminado"))
+        chunk = [batch_rebalance.PortfolioRecord("A", {}, {}, 1), batch_rebalance.PortfolioRecord("B", {}, {}, 2)]
+        results = batch_rebalance._chunk_result(chunk, future, None, 0.01)
+        self.assertEqual([(name, line, actions) for name, line, actions, _ in results], [("A", 1, []), ("B", 2, [])])
+        self.assertTrue(all("BrokenProcessPool" in error for *_, error in results))
+
+    def test_shared_stocks_do_not_accumulate_subscribers(self):
+        """Los portafolios temporales de cada registro no quedan suscritos a las acciones compartidas"""
+        stocks = {"META": Stock("META", 520.5), "AAPL": Stock("AAPL", 185.25)}
+        records = [batch_rebalance.PortfolioRecord(f"Cliente {i}", {"META": i, "AAPL": 10}, {"META": 0.5, "AAPL": 0.5}, i)
+                   for i in range(3000)]
+        results = batch_rebalance._rebalance_chunk(records, stocks, 0.01)
+        self.assertEqual(len(results), 3000)
+        for stock in stocks.values():
+            subscribers = stock._subscribers
+            self.assertEqual(live_subscribers(subscribers), [])
+            # Una sola referencia, o un contenedor sin referencias muertas acumuladas
+            if subscribers is not None and not isinstance(subscribers, weakref.ref):
+                self.assertLessEqual(len(getattr(subscribers, "data", subscribers)), 1)
+
+    def test_invalid_chunk_size(self):
+        """Caso de Borde: bloque de tamaño 0"""
+        with self.assertRaises(ValueError):
+            batch_rebalance.run(self.portfolios, self.prices, io.StringIO(), chunk_size=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+import unittest
+
+from batch_reporter import generate_reports
+from fx_rates import FxRates
+from portafolio_reporter import PortfolioReporter
+from portfolio import Portfolio
+from stock import Stock
+
+
+class TestBatchReporter(unittest.TestCase):
+    """Test cases para la generacion de reportes en paralelo"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.stocks = [Stock(f"T{i}", 10.0 + i) for i in range(8)]
+        self.portfolios = []
+        for c in range(25):
+            p = Portfolio(f"Cliente {c}")
+            chosen = self.stocks[c % 4:c % 4 + 4]
+            p.add_stocks(chosen)
+            p.set_holdings_many({s.name: float(c + i) for i, s in enumerate(chosen)})
+            if c % 5:
+                p.set_target_allocation({s.name: 0.25 for s in chosen})
+            self.portfolios.append(p)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, manifest, i):
+        with open(os.path.join(manifest.output_dir, manifest.files[i]), encoding="utf-8") as f:
+            return f.read()
+
+    def test_serial_reports_match_reporter(self):
+        manifest = generate_reports(self.portfolios, self.tmp.name, shard_size=10)
+        self.assertEqual(manifest.portfolios, 25)
+        self.assertEqual([s.portfolios for s in manifest.shards], [10, 10, 5])
+        self.assertEqual(manifest.files[3], "00000003_Cliente_3.txt")
+        for i in (0, 3, 24):
+            expected = PortfolioReporter(self.portfolios[i]).generate_report() + "\n"
+            self.assertEqual(self.read(manifest, i), expected)
+
+        with open(os.path.join(self.tmp.name, "manifest.json"), encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertEqual(len(data["shards"]), 3)
+        self.assertGreater(data["shards"][0]["bytes"], 0)
+
+    def test_workers_write_same_files(self):
+        serial = generate_reports(self.portfolios, os.path.join(self.tmp.name, "serial"), "json", shard_size=4)
+        parallel = generate_reports(self.portfolios, os.path.join(self.tmp.name, "parallel"), "json",
+                                    workers=2, shard_size=4)
+        self.assertEqual(parallel.files, serial.files)
+        for i in range(25):
+            self.assertEqual(self.read(parallel, i), self.read(serial, i))
+        self.assertEqual(json.loads(self.read(parallel, 0))["name"], "Cliente 0")
+
+    def test_multi_currency(self):
+        fx = FxRates("USD", {"EUR": 1.25})
+        p = Portfolio("Global", fx=fx)
+        p.add_stocks([self.stocks[0], Stock("SAP", 200.0, "EUR")])
+        p.set_holdings_many({"T0": 100, "SAP": 10})
+        p.set_target_allocation({"T0": 0.5, "SAP": 0.5})
+        portfolios = [self.portfolios[0], p]
+        serial = generate_reports(portfolios, os.path.join(self.tmp.name, "serial"), "csv", shard_size=1)
+        parallel = generate_reports(portfolios, os.path.join(self.tmp.name, "parallel"), "csv",
+                                    workers=2, shard_size=1)
+        expected = PortfolioReporter(p).generate_report("csv") + "\n"
+        self.assertEqual(self.read(serial, 1), expected)
+        self.assertEqual(self.read(parallel, 1), expected)
+
+    def test_invalid_arguments(self):
+        """Caso de Borde: formato desconocido, bloque vacio y acciones en conflicto"""
+        with self.assertRaises(ValueError):
+            generate_reports(self.portfolios, self.tmp.name, "xml")
+        with self.assertRaises(ValueError):
+            generate_reports(self.portfolios, self.tmp.name, shard_size=0)
+        other = Portfolio("Otro")
+        other.add_stock(Stock("T0", 1.0))
+        with self.assertRaises(ValueError):
+            generate_reports(self.portfolios + [other], self.tmp.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
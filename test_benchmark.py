@@ -0,0 +1,41 @@
+import json
+import os
+import tempfile
+import unittest
+
+import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    """Test cases para el harness de benchmark"""
+
+    def test_run_produces_all_measurements(self):
+        results = benchmark.run([5, 20], [0, 3], list(benchmark.OPERATIONS), repeat=3, min_time=0)
+        self.assertEqual(len(results["results"]), 2 * 2 * len(benchmark.OPERATIONS))
+        for r in results["results"]:
+            self.assertGreaterEqual(r["runs"], 3)
+            self.assertLessEqual(r["p50_ms"], r["p99_ms"])
+            self.assertGreaterEqual(r["peak_memory_bytes"], 0)
+        json.dumps(results)
+
+    def test_compare_flags_regressions(self):
+        baseline = {"results": [{"operation": "rebalance", "size": 10, "rate": 0, "p50_ms": 1.0},
+                                {"operation": "get_total_value", "size": 10, "rate": 0, "p50_ms": 1.0}]}
+        current = {"results": [{"operation": "rebalance", "size": 10, "rate": 0, "p50_ms": 1.5},
+                               {"operation": "get_total_value", "size": 10, "rate": 0, "p50_ms": 1.1},
+                               {"operation": "generate_report", "size": 10, "rate": 0, "p50_ms": 9.0}]}
+        regressions = benchmark.compare(baseline, current, threshold=0.2)
+        self.assertEqual([r["operation"] for r in regressions], ["rebalance"])
+        self.assertAlmostEqual(regressions[0]["change"], 0.5)
+
+    def test_cli_run_and_compare(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "results.json")
+            args = ["run", "--sizes", "5", "--rates", "0", "--repeat", "2", "--min-time", "0", "--output", output]
+            self.assertEqual(benchmark.main(args), 0)
+            # Comparar contra si mismo no tiene regresiones
+            self.assertEqual(benchmark.main(["compare", output, output]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
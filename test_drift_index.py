@@ -0,0 +1,141 @@
+import random
+import unittest
+
+from drift_index import DriftIndex
+from portfolio import Portfolio
+from stock import Stock, live_subscribers
+from stock_registry import StockRegistry
+
+
+class TestDriftIndex(unittest.TestCase):
+    """Test cases para el indice de portafolios por desviacion"""
+
+    def setUp(self):
+        rng = random.Random(5)
+        self.stocks = [Stock(f"T{i}", 100.0) for i in range(10)]
+        self.registry = StockRegistry()
+        self.index = DriftIndex(self.registry)
+        self.portfolios = []
+        for c in range(40):
+            p = Portfolio(f"Cliente {c}")
+            chosen = rng.sample(self.stocks, 4)
+            p.add_stocks(chosen)
+            p.set_holdings_many({s.name: rng.uniform(1, 20) for s in chosen})
+            p.set_target_allocation({s.name: 0.25 for s in chosen})
+            self.portfolios.append(p)
+            self.index.track(p)
+
+    def expected_order(self):
+        return sorted(((p, p.get_max_drift()) for p in self.portfolios), key=lambda item: -item[1])
+
+    def test_max_drift_matches_rebalance(self):
+        """Un portafolio genera acciones solo si su desviacion supera la tolerancia"""
+        for p in self.portfolios:
+            drift = p.get_max_drift()
+            self.assertEqual(bool(p.rebalance(drift)), False)
+            self.assertEqual(bool(p.rebalance(drift * 0.999)), drift > 0)
+
+    def test_top_k(self):
+        expected = self.expected_order()
+        self.assertEqual(self.index.top(5), expected[:5])
+        self.assertEqual(len(self.index.top(100)), 40)
+
+    def test_above_threshold(self):
+        threshold = self.expected_order()[10][1]
+        above = self.index.above(threshold)
+        self.assertEqual(len(above), 10)
+        self.assertTrue(all(drift > threshold for _, drift in above))
+
+    def test_updates_on_price_and_holdings(self):
+        self.stocks[0].update_price(1000.0)
+        self.assertEqual(self.index.top(40), self.expected_order())
+        p = self.portfolios[7]
+        p.set_holdings(next(iter(p.stocks)), 500.0)
+        self.assertEqual(self.index.top(1)[0][0], p)
+        self.assertEqual(self.index.drift(p), p.get_max_drift())
+
+    def test_stock_added_after_track(self):
+        p = self.portfolios[0]
+        new = Stock("NEW", 10.0)
+        p.add_stock(new)
+        p.set_holdings("NEW", 1000)
+        new.update_price(1.0)
+        self.assertEqual(self.index.drift(p), p.get_max_drift())
+
+    def test_untrack(self):
+        p = self.portfolios[3]
+        self.index.untrack(p)
+        self.assertNotIn(p, self.index)
+        self.assertNotIn(p, [q for q, _ in self.index.top(100)])
+        with self.assertRaises(ValueError):
+            self.index.drift(p)
+
+    def test_untrack_undoes_track(self):
+        """untrack saca del registro los portafolios que agrego track y se desuscribe de las acciones sin otro portafolio"""
+        registry = StockRegistry()
+        index = DriftIndex(registry)
+        shared, own = Stock("SHARED", 10.0), Stock("OWN", 10.0)
+        a, b = Portfolio("A"), Portfolio("B")
+        a.add_stocks([shared, own])
+        b.add_stock(shared)
+        for p in (a, b):
+            p.set_holdings_many({name: 1 for name in p.stocks})
+            p.set_target_allocation({name: 1 / len(p.stocks) for name in p.stocks})
+        registry.register(b)  # Registrado por quien llama, no por el indice
+        index.track(a)
+        index.track(b)
+        registry.rebalance_dirty()
+
+        index.untrack(a)
+        self.assertNotIn(a, registry)
+        self.assertIn(b, registry)
+        self.assertNotIn(index, live_subscribers(own._subscribers))
+        self.assertIn(index, live_subscribers(shared._subscribers))
+        shared.update_price(20.0)
+        own.update_price(20.0)
+        self.assertEqual(registry.dirty, [b])
+        self.assertEqual(index.drift(b), b.get_max_drift())
+
+        index.untrack(b)
+        self.assertIn(b, registry)
+        self.assertNotIn(index, live_subscribers(shared._subscribers))
+
+    def test_replaced_stock_is_unsubscribed(self):
+        p = self.portfolios[0]
+        name = next(iter(p.stocks))
+        old = p.stocks[name]
+        p.add_stock(Stock(name, 50.0))
+        holders = [q for q in self.portfolios if q is not p and name in q.stocks]
+        self.assertEqual(self.index in live_subscribers(old._subscribers), bool(holders))
+        self.assertEqual(self.index.drift(p), p.get_max_drift())
+
+    def test_portfolio_without_target(self):
+        """Caso de Borde: sin objetivo la desviacion es 0"""
+        p = Portfolio("Sin objetivo")
+        p.add_stock(self.stocks[0])
+        self.index.track(p)
+        self.assertEqual(self.index.drift(p), 0.0)
+
+    def test_many_updates_match_full_sort(self):
+        """Despues de muchos cambios y untracks el indice coincide con ordenar todo, y el heap no crece sin limite"""
+        rng = random.Random(11)
+        tracked = list(self.portfolios)
+        for step in range(300):
+            stock = rng.choice(self.stocks)
+            stock.update_price(rng.uniform(50, 150))
+            if step % 50 == 49:
+                p = tracked.pop(rng.randrange(len(tracked)))
+                self.index.untrack(p)
+            if step % 10 == 0:
+                expected = sorted(((p, p.get_max_drift()) for p in tracked), key=lambda item: -item[1])
+                self.assertEqual([d for _, d in self.index.top(len(tracked))], [d for _, d in expected])
+                self.assertEqual([d for _, d in self.index.top(3)], [d for _, d in expected[:3]])
+                threshold = expected[len(expected) // 2][1]
+                self.assertEqual(sorted(id(p) for p, _ in self.index.above(threshold)),
+                                 sorted(id(p) for p, d in expected if d > threshold))
+        self.assertEqual(len(self.index), len(tracked))
+        self.assertLessEqual(len(self.index._heap), max(2 * len(tracked), DriftIndex._COMPACT_MIN))
+
+
+if __name__ == "__main__":
+    unittest.main()
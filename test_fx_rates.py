@@ -0,0 +1,184 @@
+import os
+import tempfile
+import unittest
+
+from drift_index import DriftIndex
+from fx_rates import FxRates
+from portafolio_reporter import PortfolioReporter
+from portfolio import Portfolio
+from portfolio_snapshot import save_snapshot
+from stock import Stock
+from stock_registry import StockRegistry
+from trade_netting import TradeNetter
+
+try:
+    import numpy
+    from backtest import Backtest
+    from portfolio_book import PortfolioBook
+    from scenario_engine import ScenarioEngine
+except ImportError:  # NumPy es opcional
+    numpy = None
+
+
+class Listener:
+    def __init__(self):
+        self.updates = []
+
+    def on_fx_update(self, fx, currency, old_rate):
+        self.updates.append((currency, old_rate, fx.to_base(currency)))
+
+
+class TestFxRates(unittest.TestCase):
+    """Test cases para los tipos de cambio"""
+
+    def setUp(self):
+        self.fx = FxRates("USD", {"EUR": 1.25, "CLP": 0.001})
+
+    def test_matrix_has_all_crosses(self):
+        self.assertEqual(self.fx.currencies, ["USD", "EUR", "CLP"])
+        self.assertEqual(self.fx.rate("EUR", "USD"), 1.25)
+        self.assertEqual(self.fx.rate("USD", "EUR"), 0.8)
+        self.assertAlmostEqual(self.fx.rate("EUR", "CLP"), 1250.0)
+        self.assertEqual(self.fx.rate("CLP", "CLP"), 1.0)
+        self.assertEqual(self.fx.convert(100.0, "EUR", "USD"), 125.0)
+
+    def test_update_recalculates_crosses_and_notifies(self):
+        listener = Listener()
+        self.fx.subscribe(listener)
+        self.fx.set_rate("EUR", 1.0)
+        self.fx.set_rate("EUR", 1.0) #Sin cambio no avisa
+        self.fx.set_rate("GBP", 2.0) #Moneda nueva tampoco
+        self.assertEqual(listener.updates, [("EUR", 1.25, 1.0)])
+        self.assertAlmostEqual(self.fx.rate("EUR", "CLP"), 1000.0)
+        self.assertEqual(self.fx.rate("GBP", "EUR"), 2.0)
+        self.assertEqual(self.fx.rate("EUR", "GBP"), 0.5)
+
+    def test_invalid_rates(self):
+        """Caso de Borde: moneda base, tipo de cambio no positivo y moneda desconocida"""
+        with self.assertRaises(ValueError):
+            self.fx.set_rate("USD", 2.0)
+        with self.assertRaises(ValueError):
+            self.fx.set_rate("EUR", 0.0)
+        with self.assertRaises(ValueError):
+            self.fx.rate("JPY", "USD")
+        self.assertNotIn("JPY", self.fx)
+
+
+class TestMultiCurrencyPortfolio(unittest.TestCase):
+    """Test cases para portafolios con acciones en distintas monedas"""
+
+    def setUp(self):
+        self.fx = FxRates("USD", {"EUR": 1.25, "CLP": 0.001})
+        self.meta = Stock("META", 500.0)
+        self.sap = Stock("SAP", 200.0, "EUR")
+        self.sqm = Stock("SQM", 50000.0, "CLP")
+
+    def make(self, vectorized=False):
+        p = Portfolio("Global", vectorized=vectorized, fx=self.fx)
+        p.add_stocks([self.meta, self.sap, self.sqm])
+        p.set_holdings_many({"META": 10, "SAP": 20, "SQM": 100})
+        p.set_target_allocation({"META": 0.5, "SAP": 0.25, "SQM": 0.25})
+        return p
+
+    def test_stock_currency(self):
+        self.assertEqual(self.meta.currency, "USD")
+        self.assertEqual(self.sap.currency, "EUR")
+        self.assertIn("EUR", repr(self.sap))
+
+    def test_total_and_subtotals(self):
+        p = self.make()
+        self.assertEqual(p.currency, "USD")
+        self.assertEqual(p.get_subtotals(), {"USD": 5000.0, "EUR": 4000.0, "CLP": 5000000.0})
+        self.assertEqual(p.get_total_value(), 15000.0)
+        self.assertEqual(p.get_current_allocation()["SAP"], 5000.0 / 15000.0)
+
+    def test_fx_tick_updates_total(self):
+        p = self.make()
+        self.fx.set_rate("EUR", 1.5)
+        self.assertEqual(p.get_total_value(), 16000.0)
+        self.sap.update_price(100.0)
+        self.assertEqual(p.get_total_value(), 13000.0)
+
+    def test_rebalance_in_stock_currency(self):
+        actions = self.make().rebalance()
+        # Objetivo de SAP: 3750 USD = 3000 EUR, hay 5000 USD = 4000 EUR
+        self.assertEqual(actions.names, ["META", "SAP", "SQM"])
+        self.assertEqual(actions[1].action, "SELL")
+        self.assertAlmostEqual(actions[1].shares, 5.0)
+        self.assertAlmostEqual(actions[1].value, 1250.0) #En la moneda del portafolio
+        self.assertAlmostEqual(actions[2].shares, 25.0)
+
+    def test_vectorized_matches(self):
+        p, v = self.make(), self.make(vectorized=True)
+        self.fx.set_rate("CLP", 0.0011)
+        self.sqm.update_price(48000.0)
+        self.assertEqual(v.get_total_value(), p.get_total_value())
+        self.assertEqual(v.get_subtotals(), p.get_subtotals())
+        self.assertEqual(v.rebalance(), p.rebalance())
+
+    def test_portfolio_currency(self):
+        p = Portfolio("Euro", fx=self.fx, currency="EUR")
+        p.add_stocks([self.meta, self.sap])
+        p.set_holdings_many({"META": 10, "SAP": 10})
+        self.assertEqual(p.get_total_value(), 6000.0)
+        self.fx.set_rate("EUR", 1.0)
+        self.assertEqual(p.get_total_value(), 7000.0)
+
+    def test_reporter_follows_fx(self):
+        reporter = PortfolioReporter(self.make())
+        first = reporter.snapshot()
+        self.assertEqual(first.rows[1].value, 5000.0)
+        self.fx.set_rate("EUR", 1.5)
+        second = reporter.snapshot()
+        self.assertIs(second.rows[0], first.rows[0])
+        self.assertEqual(second.rows[1].value, 6000.0)
+        self.assertEqual(second.total_value, 16000.0)
+        self.assertIn("SAP,EUR,200.0,20.0,6000.0", reporter.generate_report("csv"))
+
+    def test_fx_tick_notifies_subscribers(self):
+        p = self.make()
+        registry = StockRegistry()
+        index = DriftIndex(registry)
+        index.track(p)
+        registry.rebalance_dirty()
+        before = index.drift(p)
+        self.fx.set_rate("EUR", 1.0)
+        self.assertEqual(registry.dirty, [p])
+        self.assertEqual(index.drift(p), p.get_max_drift())
+        self.assertNotEqual(index.drift(p), before)
+        self.fx.set_rate("GBP", 2.0) #Moneda que el portafolio no usa
+        registry.rebalance_dirty()
+        self.fx.set_rate("GBP", 3.0)
+        self.assertEqual(registry.dirty, [])
+
+    def test_single_currency_modules_reject_fx(self):
+        """Caso de Borde: los modulos que solo trabajan en USD no aceptan portafolios con tipos de cambio"""
+        p = self.make()
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaises(ValueError):
+                save_snapshot(os.path.join(tmp, "p.snap"), [p])
+        with self.assertRaises(ValueError):
+            TradeNetter().add(p, p.rebalance())
+        if numpy is None:
+            return
+        with self.assertRaises(ValueError):
+            PortfolioBook.from_portfolios([p])
+        with self.assertRaises(ValueError):
+            PortfolioBook([self.sap])
+        with self.assertRaises(ValueError):
+            ScenarioEngine(p)
+        with self.assertRaises(ValueError):
+            Backtest(p, numpy.ones((3, 3)), ["META", "SAP", "SQM"])
+
+    def test_foreign_stock_without_fx(self):
+        """Caso de Borde: accion en otra moneda sin tipos de cambio, o en una moneda desconocida"""
+        p = Portfolio("Local")
+        with self.assertRaises(ValueError):
+            p.add_stocks([self.meta, self.sap])
+        self.assertEqual(p.stocks, {})
+        with self.assertRaises(ValueError):
+            self.make().add_stock(Stock("SONY", 2000.0, "JPY"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+import instrumentation
+from portafolio_reporter import PortfolioReporter
+from portfolio import Portfolio
+from stock import Stock
+from stock_universe import StockUniverse
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Test cases para la instrumentacion de Portfolio y PortfolioReporter"""
+
+    def setUp(self):
+        self.p = Portfolio("Instrumentado")
+        for name, price in (("META", 500.0), ("AAPL", 200.0), ("GOOG", 100.0)):
+            self.p.add_stock(Stock(name, price))
+            self.p.set_holdings(name, 10)
+        self.p.set_target_allocation({"META": 0.5, "AAPL": 0.5})
+
+    def tearDown(self):
+        instrumentation.disable()
+
+    def test_disabled_by_default_has_original_methods(self):
+        original = Portfolio.__dict__["rebalance"]
+        with instrumentation.instrumented():
+            self.assertIsNot(Portfolio.__dict__["rebalance"], original)
+        self.assertIs(Portfolio.__dict__["rebalance"], original)
+        self.assertFalse(instrumentation.is_enabled())
+
+    def test_counts_calls_and_positions(self):
+        with instrumentation.instrumented() as sink:
+            self.p.rebalance()
+            self.p.rebalance()
+            PortfolioReporter(self.p).generate_report()
+
+        rebalance = sink.metrics["Portfolio.rebalance"]
+        self.assertEqual(rebalance.calls, 3)  # 2 directas + 1 del reporte
+        self.assertEqual(rebalance.positions, 3 * 2)
+        self.assertEqual(sum(rebalance.buckets), 3)
+        self.assertEqual(sink.metrics["PortfolioReporter.generate_report"].calls, 1)
+        self.assertGreater(sink.metrics["Portfolio.get_total_value"].calls, 1)
+        self.assertIn("Portfolio.holdings", sink.metrics)
+
+    def test_counts_positions_with_universe(self):
+        """Con universo las posiciones se guardan por id, se deben contar igual"""
+        universe = StockUniverse()
+        p = Portfolio("Universo", universe=universe)
+        p.add_instruments(universe.add_many(["META", "AAPL", "GOOG"], [500.0, 200.0, 100.0]))
+        p.set_holdings_many({"META": 10, "AAPL": 10, "GOOG": 10})
+        p.set_target_allocation({"META": 0.5, "AAPL": 0.5})
+        with instrumentation.instrumented() as sink:
+            p.rebalance()
+            p.get_current_allocation()
+            PortfolioReporter(p).generate_report()
+        self.assertEqual(sink.metrics["Portfolio.rebalance"].positions, 2 * 2)
+        self.assertEqual(sink.metrics["Portfolio.get_current_allocation"].positions,
+                         3 * sink.metrics["Portfolio.get_current_allocation"].calls)
+        self.assertEqual(sink.metrics["PortfolioReporter.generate_report"].positions, 3)
+
+    def test_results_unchanged(self):
+        expected = self.p.rebalance()
+        with instrumentation.instrumented():
+            self.assertEqual(self.p.rebalance(), expected)
+            self.assertEqual(self.p.holdings["META"], 10)
+
+    def test_prometheus_format(self):
+        with instrumentation.instrumented() as sink:
+            self.p.get_total_value()
+        text = sink.to_prometheus()
+        self.assertIn('portfolio_calls_total{method="Portfolio.get_total_value"} 1', text)
+        self.assertIn('portfolio_duration_seconds_bucket{method="Portfolio.get_total_value",le="+Inf"} 1', text)
+        self.assertIn('portfolio_duration_seconds_count{method="Portfolio.get_total_value"} 1', text)
+
+    def test_profile_rebalance(self):
+        other = Portfolio("Otro")
+        with instrumentation.profile_rebalance(self.p) as capture:
+            self.p.rebalance()
+        self.assertNotIn("rebalance", vars(self.p))
+        self.assertIn("rebalance", capture.report())
+        self.assertNotIn("rebalance", vars(other))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import io
+import json
+import unittest
+
+from portafolio_reporter import PortfolioReporter
+from portfolio import Portfolio
+from stock import Stock
+
+
+class TestPortfolioReporter(unittest.TestCase):
+    """Test cases para el reporte incremental del portafolio"""
+
+    def setUp(self):
+        self.meta = Stock("META", 500.0)
+        self.aapl = Stock("AAPL", 200.0)
+        self.p = Portfolio("Jhano")
+        self.p.add_stocks([self.meta, self.aapl])
+        self.p.set_holdings_many({"META": 10, "AAPL": 25})
+        self.p.set_target_allocation({"META": 0.4, "AAPL": 0.6})
+        self.reporter = PortfolioReporter(self.p)
+
+    def test_text_report(self):
+        lines = self.reporter.generate_report().splitlines()
+        self.assertEqual(lines[0], "REPORTE DE PORTAFOLIO: JHANO")
+        self.assertEqual(lines[2], "Valor Total: $10,000.00")
+        self.assertEqual(lines[6], "META       | $   500.00 |    10.00 | $    5000.00 |   50.0% |   40.0%")
+        self.assertEqual(lines[-2], " >> VENDER 2.00 acciones de META (Valor: $1000.00)")
+        self.assertEqual(lines[-1], " >> COMPRAR 5.00 acciones de AAPL (Valor: $1000.00)")
+
+    def test_reuses_report_until_something_changes(self):
+        first = self.reporter.snapshot()
+        self.assertIs(self.reporter.snapshot(), first)
+        self.assertIs(self.reporter.generate_report(), self.reporter.generate_report())
+
+        self.aapl.update_price(300.0)
+        second = self.reporter.snapshot()
+        self.assertIsNot(second, first)
+        # Solo se recalcula la posicion que cambio
+        self.assertIs(second.rows[0], first.rows[0])
+        self.assertIsNot(second.rows[1], first.rows[1])
+        self.assertEqual(second.total_value, 12500.0)
+        self.assertIn("AAPL       | $   300.00 |    25.00 | $    7500.00 |   60.0% |   60.0%",
+                      self.reporter.generate_report())
+
+    def test_follows_holdings_and_new_stocks(self):
+        self.reporter.generate_report()
+        tsla = Stock("TSLA", 100.0)
+        self.p.add_stock(tsla)
+        self.p.set_holdings("TSLA", 10)
+        self.assertEqual([row.ticker for row in self.reporter.snapshot().rows], ["META", "AAPL", "TSLA"])
+        tsla.update_price(50.0)
+        self.assertEqual(self.reporter.snapshot().rows[2].value, 500.0)
+
+    def test_csv_and_json_share_snapshot(self):
+        csv_lines = self.reporter.generate_report("csv").splitlines()
+        self.assertEqual(csv_lines[0], "ticker,currency,price,shares,value,current,target")
+        self.assertEqual(csv_lines[1], "META,USD,500.0,10.0,5000.0,0.5,0.4")
+
+        data = json.loads(self.reporter.generate_report("json"))
+        self.assertEqual(data["total_value"], 10000.0)
+        self.assertEqual(data["positions"][1]["ticker"], "AAPL")
+        self.assertEqual([a["action"] for a in data["rebalance"]], ["SELL", "BUY"])
+        with self.assertRaises(ValueError):
+            self.reporter.generate_report("xml")
+
+    def test_write_streams_lines(self):
+        output = io.StringIO()
+        self.reporter.write(output, "csv")
+        self.assertEqual(output.getvalue(), self.reporter.generate_report("csv") + "\n")
+
+    def test_without_target(self):
+        """Caso de Borde: portafolio sin objetivo ni valor"""
+        reporter = PortfolioReporter(Portfolio("Vacio"))
+        self.assertIn(" >> No se puede calcular rebalanceo:", reporter.generate_report())
+        data = json.loads(reporter.generate_report("json"))
+        self.assertEqual(data["positions"], [])
+        self.assertIsNone(data["rebalance"])
+
+    def test_close_stops_updates(self):
+        first = self.reporter.snapshot()
+        self.reporter.close()
+        self.meta.update_price(1.0)
+        self.assertIs(self.reporter.snapshot(), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
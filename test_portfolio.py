@@ -1,7 +1,15 @@
+import random
+import tracemalloc
 import unittest
 from rebalance import Action, Rebalance 
 from stock import Stock
 from portfolio import Portfolio 
+from stock_universe import StockUniverse
+
+try:
+    import numpy
+except ImportError:  # El modo vectorizado es opcional
+    numpy = None
 
 class TestStock(unittest.TestCase):
     """Test cases para la clase Stock"""
@@ -31,6 +39,80 @@ class TestStock(unittest.TestCase):
         # Aseguramos que el precio no cambió tras el error
         self.assertEqual(s.price, 150.0)
 
+    def test_update_price_not_finite(self):
+        """Caso de Borde: inf o nan no son precios validos"""
+        s = Stock("AAPL", 150.0)
+        for price in (float("inf"), float("nan")):
+            with self.assertRaises(ValueError):
+                s.update_price(price)
+        with self.assertRaises(ValueError):
+            Stock("BAD", float("inf"))
+        self.assertEqual(s.price, 150.0)
+
+    def test_subscribers_notified(self):
+        """Los suscriptores reciben el precio anterior, y no se avisa si el precio no cambia"""
+        calls = []
+
+        class Listener:
+            def on_price_update(self, stock, old_price):
+                calls.append((stock.name, old_price, stock.price))
+
+        s = Stock("AAPL", 150.0)
+        listener = Listener()
+        s.subscribe(listener)
+        s.update_price(155.0)
+        s.update_price(155.0)
+        s.unsubscribe(listener)
+        s.update_price(160.0)
+        self.assertEqual(calls, [("AAPL", 150.0, 155.0)])
+
+    def test_many_subscribers(self):
+        """Varios suscriptores, sin duplicados, y los que se descartan dejan de recibir avisos"""
+        calls = []
+
+        class Listener:
+            def __init__(self, label):
+                self.label = label
+
+            def on_price_update(self, stock, old_price):
+                calls.append(self.label)
+
+        s = Stock("AAPL", 150.0)
+        a, b, c = Listener("a"), Listener("b"), Listener("c")
+        s.subscribe(a)
+        s.subscribe(b)
+        s.subscribe(b)
+        s.subscribe(c)
+        s.update_price(151.0)
+        self.assertEqual(sorted(calls), ["a", "b", "c"])
+
+        calls.clear()
+        s.unsubscribe(b)
+        del c
+        s.update_price(152.0)
+        self.assertEqual(calls, ["a"])
+
+    def test_shared_stock_subscribers_stay_bounded(self):
+        """Muchos portafolios en un mismo Stock: los descartados no dejan referencias y los vivos se cuentan una vez"""
+        s = Stock("AAPL", 150.0)
+        alive = []
+        for i in range(5000):
+            p = Portfolio(f"Cliente {i}")
+            p.add_stock(s)
+            p.add_stock(s)
+            if i % 10 == 0:
+                alive.append(p)
+        del p
+        self.assertEqual(len(s._subscribers), len(alive))
+        self.assertEqual(len(s._subscribers.data), len(alive))  # Sin referencias muertas
+        for portfolio in alive:
+            portfolio.set_holdings("AAPL", 1)
+        s.update_price(151.0)
+        self.assertEqual({portfolio.get_total_value() for portfolio in alive}, {151.0})
+        del portfolio
+        alive.clear()
+        self.assertIsNone(s._subscribers or None)
+
 
 class TestPortfolio(unittest.TestCase):
     """Test cases para la clase Portfolio"""
@@ -67,6 +149,23 @@ class TestPortfolio(unittest.TestCase):
 
     # --- Tests de Target Allocation (Distribución Objetivo) ---
 
+    def test_set_holdings_not_finite(self):
+        """Caso de Borde: inf o nan no son cantidades validas y no cambian nada"""
+        self.p.set_holdings("AAPL", 10)
+        self.p.set_target_allocation({"AAPL": 0.5, "GOOG": 0.5})
+        for shares in (float("inf"), float("nan")):
+            with self.assertRaises(ValueError):
+                self.p.set_holdings("GOOG", shares)
+            with self.assertRaises(ValueError):
+                self.p.set_holdings_many({"AAPL": 5, "GOOG": shares})
+            with self.assertRaises(ValueError):
+                self.p.apply_fills([Rebalance("GOOG", Action.BUY, shares, 0.0)])
+        with self.assertRaises(ValueError):
+            self.p.apply_fills([Rebalance("GOOG", Action.BUY, 1e308, 0.0), Rebalance("GOOG", Action.BUY, 1e308, 0.0)])
+        self.assertEqual(dict(self.p.holdings), {"AAPL": 10, "GOOG": 0})
+        self.assertEqual(self.p.get_total_value(), 1000.0)
+        self.assertEqual(len(self.p.rebalance()), 2)
+
     def test_set_target_allocation_valid(self):
         target = {"AAPL": 0.6, "GOOG": 0.4}
         self.p.set_target_allocation(target)
@@ -169,6 +268,221 @@ class TestPortfolio(unittest.TestCase):
         actions = self.p.rebalance(tolerance=0.01)
         self.assertEqual(len(actions), 0, "No debería generar acciones si está dentro de la tolerancia")
 
+    # --- Tests de vistas y operaciones en bloque ---
+
+    def test_views_are_read_only_and_live(self):
+        holdings = self.p.holdings
+        with self.assertRaises(TypeError):
+            holdings["AAPL"] = 5
+        self.p.set_holdings("AAPL", 7)
+        self.assertEqual(holdings["AAPL"], 7)
+
+    def test_set_holdings_many(self):
+        self.p.set_holdings_many({"AAPL": 10, "GOOG": 5})
+        self.assertEqual(dict(self.p.holdings), {"AAPL": 10, "GOOG": 5})
+        self.assertEqual(self.p.get_total_value(), 2000.0)
+
+    def test_set_holdings_many_is_atomic(self):
+        """Caso de Borde: un valor invalido no deja cambios a medias"""
+        self.p.set_holdings("AAPL", 1)
+        with self.assertRaises(ValueError):
+            self.p.set_holdings_many({"AAPL": 10, "GOOG": -5})
+        with self.assertRaises(ValueError):
+            self.p.set_holdings_many({"AAPL": 10, "TSLA": 5})
+        self.assertEqual(self.p.holdings["AAPL"], 1)
+        self.assertEqual(self.p.get_total_value(), 100.0)
+
+    def test_add_stocks(self):
+        self.p.add_stocks([Stock("TSLA", 50.0), Stock("META", 300.0)])
+        self.p.set_holdings_many({"TSLA": 2, "META": 1})
+        self.assertEqual(list(self.p.stocks), ["AAPL", "GOOG", "TSLA", "META"])
+        self.assertEqual(self.p.get_total_value(), 400.0)
+
+    def test_apply_fills(self):
+        self.p.set_holdings("AAPL", 10)
+        self.p.set_holdings("GOOG", 15)
+        self.p.set_target_allocation({"AAPL": 0.5, "GOOG": 0.5})
+        self.p.apply_fills(self.p.rebalance())
+        self.assertEqual(dict(self.p.holdings), {"AAPL": 20.0, "GOOG": 10.0})
+        self.assertEqual(self.p.rebalance(), [])
+
+    def test_apply_fills_cannot_oversell(self):
+        """Caso de Borde: vender mas de lo que se tiene no cambia nada"""
+        self.p.set_holdings("AAPL", 10)
+        fills = [Rebalance("GOOG", Action.BUY, 1, 200), Rebalance("AAPL", Action.SELL, 11, 1100)]
+        with self.assertRaises(ValueError):
+            self.p.apply_fills(fills)
+        self.assertEqual(dict(self.p.holdings), {"AAPL": 10, "GOOG": 0.0})
+
+    # --- Tests de valor incremental ---
+
+    def test_total_value_follows_price_updates(self):
+        self.p.set_holdings("AAPL", 10)
+        self.p.set_holdings("GOOG", 5)
+        self.s2.update_price(300.0)  # 10 * 100 + 5 * 300
+        self.assertEqual(self.p.get_total_value(), 2500.0)
+        self.assertEqual(self.p.get_current_allocation(), {"AAPL": 0.4, "GOOG": 0.6})
+
+    def test_incremental_total_matches_full_sum(self):
+        """Muchos ticks seguidos no deben desviar el total respecto a sumar desde cero"""
+        rng = random.Random(3)
+        for _ in range(10000):
+            if rng.random() < 0.5:
+                rng.choice([self.s1, self.s2]).update_price(rng.uniform(1, 1000))
+            else:
+                self.p.set_holdings(rng.choice(["AAPL", "GOOG"]), rng.uniform(0, 100))
+        expected = sum(self.p.holdings[n] * s.price for n, s in self.p.stocks.items())
+        self.assertAlmostEqual(self.p.get_total_value(), expected, places=6)
+
+    def test_total_back_to_zero_after_cancellation(self):
+        """Caso de Borde: sumar y restar valores no debe dejar un residuo de redondeo como total"""
+        self.s1.update_price(1.0)
+        self.s2.update_price(1.0)
+        self.p.set_holdings("AAPL", 0.1)
+        self.p.set_holdings("GOOG", 0.2)
+        self.p.set_target_allocation({"AAPL": 0.5, "GOOG": 0.5})
+        self.p.set_holdings("AAPL", 0)
+        self.p.set_holdings("GOOG", 0)
+        self.assertEqual(self.p.get_total_value(), 0.0)
+        with self.assertRaises(ValueError):
+            self.p.rebalance()
+
+    def test_total_exact_after_removing_large_position(self):
+        """Caso de Borde: al sacar una posicion enorme el total no debe arrastrar su error de redondeo"""
+        self.s1.update_price(1.0)
+        self.s2.update_price(1.0)
+        self.p.set_holdings("AAPL", 1e12)
+        self.p.set_holdings("GOOG", 1.23)
+        self.p.set_holdings("AAPL", 0)
+        self.assertEqual(self.p.get_total_value(), 1.23)
+        self.assertEqual(self.p.get_current_allocation()["GOOG"], 1.0)
+
+    def test_total_recovers_from_huge_value(self):
+        """Caso de Borde: un valor que desborda a inf no debe dejar el total en nan al volver a un valor normal"""
+        self.p.set_holdings("AAPL", 1e308)
+        self.p.set_holdings("GOOG", 1)
+        self.s1.update_price(1000.0)  # 1e308 * 1000 = inf
+        self.assertEqual(self.p.get_total_value(), float("inf"))
+        self.p.set_holdings("AAPL", 1)
+        self.assertEqual(self.p.get_total_value(), 1200.0)
+
+    def test_replaced_stock_is_ignored(self):
+        """Caso de Borde: al reemplazar un Stock, el anterior ya no afecta al portafolio"""
+        self.p.set_holdings("AAPL", 10)
+        self.p.add_stock(Stock("AAPL", 50.0))
+        self.s1.update_price(1000.0)
+        self.assertEqual(self.p.get_total_value(), 500.0)
+
+
+@unittest.skipIf(numpy is None, "NumPy no esta instalado")
+class TestPortfolioVectorized(TestPortfolio):
+    """Repite todos los tests de Portfolio usando el modo vectorizado"""
+
+    def setUp(self):
+        self.p = Portfolio("Retirement Fund", vectorized=True)
+        self.s1 = Stock("AAPL", 100.0)
+        self.s2 = Stock("GOOG", 200.0)
+        self.p.add_stock(self.s1)
+        self.p.add_stock(self.s2)
+
+    def test_same_result_as_dict_mode(self):
+        """El modo vectorizado debe entregar exactamente los mismos resultados que el modo con diccionarios"""
+        rng = random.Random(42)
+        stocks = [Stock(f"T{i}", rng.uniform(1, 500)) for i in range(300)]
+        weights = [rng.random() for _ in stocks]
+        target = {s.name: w / sum(weights) for s, w in zip(stocks, weights)}
+
+        holdings = [rng.uniform(0, 100) for _ in stocks]
+
+        portfolios = [Portfolio("dict"), Portfolio("vec", vectorized=True)]
+        for p in portfolios:
+            for s, shares in zip(stocks, holdings):
+                p.add_stock(s)
+                p.set_holdings(s.name, shares)
+            p.set_target_allocation(target)
+
+        stocks[0].update_price(321.0)
+        dict_p, vec_p = portfolios
+        self.assertEqual(dict_p.get_total_value(), vec_p.get_total_value())
+        self.assertEqual(dict_p.get_current_allocation(), vec_p.get_current_allocation())
+        self.assertEqual(dict_p.rebalance(0.001), vec_p.rebalance(0.001))
+
+class TestPortfolioUniverse(TestPortfolio):
+    """Repite todos los tests de Portfolio con posiciones guardadas por id en un StockUniverse"""
+
+    def setUp(self):
+        self.u = StockUniverse()
+        self.p = Portfolio("Retirement Fund", universe=self.u)
+        self.s1 = self.u.stock(self.u.add("AAPL", 100.0))
+        self.s2 = self.u.stock(self.u.add("GOOG", 200.0))
+        self.p.add_stock(self.s1)
+        self.p.add_stock(self.s2)
+
+    def test_add_stocks(self):
+        self.p.add_stocks([self.u.stock(self.u.add("TSLA", 50.0)), self.u.stock(self.u.add("META", 300.0))])
+        self.p.set_holdings_many({"TSLA": 2, "META": 1})
+        self.assertEqual(list(self.p.stocks), ["AAPL", "GOOG", "TSLA", "META"])
+        self.assertEqual(self.p.get_total_value(), 400.0)
+
+    def test_replaced_stock_is_ignored(self):
+        """Caso de Borde: un Stock que no es del universo no puede reemplazar una posicion"""
+        self.p.set_holdings("AAPL", 10)
+        with self.assertRaises(ValueError):
+            self.p.add_stock(Stock("AAPL", 50.0))
+        self.assertIs(self.p.stocks["AAPL"], self.s1)
+        self.assertEqual(self.p.get_total_value(), 1000.0)
+
+    def test_same_result_as_dict_mode(self):
+        """Con el universo se deben obtener exactamente los mismos resultados que con diccionarios"""
+        rng = random.Random(7)
+        names = [f"T{i}" for i in range(300)]
+        prices = [rng.uniform(1, 500) for _ in names]
+        stocks = [Stock(name, price) for name, price in zip(names, prices)]
+        ids = self.u.add_many(names, prices)
+        weights = [rng.random() for _ in names]
+        target = {name: w / sum(weights) for name, w in zip(names, weights)}
+        holdings = {name: rng.uniform(0, 100) for name in names}
+
+        dict_p, universe_p = Portfolio("dict"), Portfolio("universo", universe=self.u)
+        dict_p.add_stocks(stocks)
+        universe_p.add_instruments(ids)
+        for p in (dict_p, universe_p):
+            p.set_holdings_many(holdings)
+            p.set_target_allocation(target)
+
+        # Cambios de precio por el Stock, en bloque por el universo, y de cantidades
+        stocks[0].update_price(321.0)
+        self.u.stock(ids[0]).update_price(321.0)
+        stocks[5].update_price(12.5)
+        stocks[9].update_price(80.0)
+        self.u.update_prices([ids[5], ids[9]], [12.5, 80.0])
+        for p in (dict_p, universe_p):
+            p.set_holdings("T3", 0)
+            p.apply_fills([Rebalance("T4", Action.BUY, 2.5, 0.0)])
+
+        self.assertEqual(dict_p.get_total_value(), universe_p.get_total_value())
+        self.assertEqual(dict_p.get_current_allocation(), universe_p.get_current_allocation())
+        self.assertEqual(dict_p.get_max_drift(), universe_p.get_max_drift())
+        self.assertEqual(dict_p.rebalance(0.001), universe_p.rebalance(0.001))
+        self.assertEqual(dict(dict_p.holdings), dict(universe_p.holdings))
+        self.assertEqual(dict(dict_p.target_allocation), dict(universe_p.target_allocation))
+
+    def test_memory_per_position(self):
+        """Cada posicion ocupa unas decenas de bytes: sin un Stock, diccionarios ni suscriptores por posicion"""
+        size = 20000
+        ids = self.u.add_many([f"M{i}" for i in range(size)], [10.0] * size)
+        p = Portfolio("Memoria", universe=self.u)
+        p.add_instrument(ids[0]) #El primer aviso crea el indice de suscriptores del universo
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        p.add_instruments(ids[1:])
+        p.set_holdings_many(dict.fromkeys((f"M{i}" for i in range(1, size)), 1.0))
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertEqual(p.get_total_value(), 10.0 * (size - 1))
+        self.assertLess((after - before) / size, 64)
+
+
 def run_tests():
     """Ejecuta todos los tests y muestra resultados"""
     # Crear suite de tests
@@ -177,6 +491,8 @@ def run_tests():
     
     suite.addTests(loader.loadTestsFromTestCase(TestStock))
     suite.addTests(loader.loadTestsFromTestCase(TestPortfolio))
+    suite.addTests(loader.loadTestsFromTestCase(TestPortfolioVectorized))
+    suite.addTests(loader.loadTestsFromTestCase(TestPortfolioUniverse))
     
     # Ejecutar tests
     runner = unittest.TextTestRunner(verbosity=2)
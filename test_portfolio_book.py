@@ -0,0 +1,81 @@
+import random
+import unittest
+
+from portfolio import Portfolio
+from rebalance_plan import RebalancePlan
+from stock import Stock
+
+try:
+    from portfolio_book import PortfolioBook
+except ImportError:  # NumPy es opcional
+    PortfolioBook = None
+
+
+@unittest.skipIf(PortfolioBook is None, "NumPy no esta instalado")
+class TestPortfolioBook(unittest.TestCase):
+    """Test cases para el rebalanceo de muchos portafolios a la vez"""
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.stocks = [Stock(f"T{i}", rng.uniform(10, 300)) for i in range(20)]
+        self.portfolios = []
+        for c in range(50):
+            p = Portfolio(f"Cliente {c}")
+            chosen = rng.sample(self.stocks, 5)
+            for s in chosen:
+                p.add_stock(s)
+                p.set_holdings(s.name, rng.uniform(0, 50))
+            p.set_target_allocation({s.name: 0.2 for s in chosen})
+            self.portfolios.append(p)
+        self.book = PortfolioBook.from_portfolios(self.portfolios)
+
+    def assertSameActions(self, expected, actual):
+        self.assertEqual(len(expected), len(actual))
+        by_name = {a.name: a for a in actual}
+        for e in expected:
+            a = by_name[e.name]
+            self.assertEqual(e.action, a.action)
+            self.assertAlmostEqual(e.shares, a.shares)
+            self.assertAlmostEqual(e.value, a.value)
+
+    def test_total_values(self):
+        totals = self.book.get_total_values()
+        for p, total in zip(self.portfolios, totals):
+            self.assertAlmostEqual(p.get_total_value(), total)
+
+    def test_rebalance_matches_portfolio(self):
+        results = self.book.rebalance(tolerance=0.02)
+        self.assertEqual(len(results), len(self.portfolios))
+        self.assertTrue(all(isinstance(plan, RebalancePlan) for plan in results))
+        for p, actions in zip(self.portfolios, results):
+            self.assertSameActions(p.rebalance(tolerance=0.02), actions)
+
+    def test_rebalance_uses_shared_prices(self):
+        """Un cambio de precio en un Stock compartido se ve en todo el libro"""
+        self.stocks[0].update_price(1.0)
+        for p, actions in zip(self.portfolios, self.book.rebalance()):
+            self.assertSameActions(p.rebalance(), actions)
+
+    def test_rebalance_process_pool(self):
+        sequential = self.book.rebalance(chunk_size=8)
+        parallel = self.book.rebalance(workers=2, chunk_size=8)
+        self.assertEqual(sequential, parallel)
+
+    def test_client_without_target_or_value(self):
+        """Caso de Borde: clientes sin objetivo o sin valor no generan acciones"""
+        empty = Portfolio("Vacio")
+        empty.add_stock(self.stocks[0])
+        no_value = Portfolio("Sin valor")
+        no_value.add_stock(self.stocks[1])
+        no_value.set_target_allocation({self.stocks[1].name: 1.0})
+        book = PortfolioBook.from_portfolios([empty, no_value])
+        self.assertEqual(book.rebalance(), [[], []])
+
+    def test_duplicate_stock_name(self):
+        """Caso de Borde: dos Stock distintos con el mismo ticker"""
+        with self.assertRaises(ValueError):
+            self.book.add_stock(Stock("T0", 1.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
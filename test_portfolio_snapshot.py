@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+
+from portfolio import Portfolio
+from portfolio_snapshot import Journal, Snapshot, save_snapshot
+from stock import Stock
+
+
+class TestPortfolioSnapshot(unittest.TestCase):
+    """Test cases para snapshots y journals de portafolios"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "portafolios.snap")
+        self.meta = Stock("META", 520.5)
+        self.aapl = Stock("AAPL", 185.25)
+
+        self.p1 = Portfolio("Jhano")
+        self.p1.add_stocks([self.meta, self.aapl])
+        self.p1.set_holdings_many({"META": 10, "AAPL": 30})
+        # El orden del objetivo es distinto al de las acciones, debe mantenerse
+        self.p1.set_target_allocation({"AAPL": 0.6, "META": 0.4})
+
+        self.p2 = Portfolio("Sin objetivo")
+        self.p2.add_stock(self.aapl)
+        self.p2.set_holdings("AAPL", 2)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_roundtrip(self):
+        save_snapshot(self.path, [self.p1, self.p2])
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(len(snapshot), 2)
+            self.assertEqual(snapshot.name(1), "Sin objetivo")
+            restored = snapshot.portfolio(0)
+            self.assertEqual(restored.name, "Jhano")
+            self.assertEqual(dict(restored.holdings), dict(self.p1.holdings))
+            self.assertEqual(list(restored.target_allocation.items()), list(self.p1.target_allocation.items()))
+            self.assertEqual(restored.get_total_value(), self.p1.get_total_value())
+            self.assertEqual(restored.rebalance(), self.p1.rebalance())
+            self.assertIs(snapshot.portfolio(0), restored)
+
+            other = snapshot.get("Sin objetivo")
+            self.assertEqual(dict(other.target_allocation), {})
+            # Las acciones se comparten entre portafolios restaurados
+            self.assertIs(other.get_stock("AAPL"), restored.get_stock("AAPL"))
+            self.assertIsNone(snapshot.get("No existe"))
+
+    def test_vectorized_flag(self):
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            self.skipTest("NumPy no esta instalado")
+        p = Portfolio("Vectorizado", vectorized=True)
+        p.add_stock(self.meta)
+        save_snapshot(self.path, [p])
+        with Snapshot(self.path) as snapshot:
+            self.assertTrue(snapshot.portfolio(0).vectorized)
+
+    def test_many_portfolios(self):
+        stocks = [Stock(f"T{i}", 10.0 + i) for i in range(50)]
+        portfolios = []
+        for c in range(500):
+            p = Portfolio(f"Cliente {c}")
+            chosen = stocks[c % 45:c % 45 + 5]
+            p.add_stocks(chosen)
+            p.set_holdings_many({s.name: float(c) for s in chosen})
+            p.set_target_allocation({s.name: 0.2 for s in chosen})
+            portfolios.append(p)
+        save_snapshot(self.path, portfolios)
+        with Snapshot(self.path) as snapshot:
+            restored = snapshot.portfolio(321)
+            self.assertEqual(dict(restored.holdings), dict(portfolios[321].holdings))
+            self.assertEqual(len(snapshot._portfolios), 1)  # Solo se construyo el que se pidio
+
+    def test_conflicting_stocks(self):
+        """Caso de Borde: dos Stock distintos con el mismo ticker y distinto precio"""
+        other = Portfolio("Otro")
+        other.add_stock(Stock("META", 1.0))
+        with self.assertRaises(ValueError):
+            save_snapshot(self.path, [self.p1, other])
+
+    def test_invalid_file(self):
+        with open(self.path, "wb") as f:
+            f.write(b"no es un snapshot")
+        with self.assertRaises(ValueError):
+            Snapshot(self.path)
+
+    def test_journal_replay(self):
+        save_snapshot(self.path, [self.p1, self.p2])
+        journal_path = os.path.join(self.tmp.name, "cambios.journal")
+        with Journal(journal_path) as journal:
+            journal.attach(self.p1)
+            self.p1.set_holdings("META", 12)
+            self.meta.update_price(600.0)
+            journal.record_holdings("No existe", "META", 1)
+
+        with Snapshot(self.path) as snapshot:
+            applied = Journal.replay(journal_path, snapshot.get, snapshot.stock)
+            restored = snapshot.portfolio(0)
+            self.assertEqual(applied, 2)
+            self.assertEqual(restored.holdings["META"], 12)
+            self.assertEqual(restored.get_stock("META").price, 600.0)
+            self.assertEqual(restored.get_total_value(), self.p1.get_total_value())
+
+    def test_journal_truncated_record(self):
+        """Caso de Borde: el ultimo registro quedo a medio escribir"""
+        journal_path = os.path.join(self.tmp.name, "cambios.journal")
+        with Journal(journal_path) as journal:
+            journal.record_price("META", 10.0)
+            journal.record_price("AAPL", 20.0)
+        with open(journal_path, "r+b") as f:
+            f.truncate(os.path.getsize(journal_path) - 2)
+        stocks = {"META": self.meta, "AAPL": self.aapl}
+        self.assertEqual(Journal.replay(journal_path, {}.get, stocks.get), 1)
+        self.assertEqual(self.meta.price, 10.0)
+        self.assertEqual(self.aapl.price, 185.25)
+
+
+if __name__ == "__main__":
+    unittest.main()
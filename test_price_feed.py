@@ -0,0 +1,109 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from portfolio import Portfolio
+from price_feed import PriceFeed, read_stream, replay_csv, replay_jsonl
+from rebalance import Action
+from stock import Stock
+from stock_registry import StockRegistry
+
+
+async def from_list(ticks):
+    for tick in ticks:
+        yield tick
+
+
+async def collect(feed, ticks):
+    return [batch async for batch in feed.run(ticks)]
+
+
+class TestPriceFeed(unittest.TestCase):
+    """Test cases para el pipeline de precios"""
+
+    def setUp(self):
+        self.meta = Stock("META", 100.0)
+        self.aapl = Stock("AAPL", 100.0)
+        self.p = Portfolio("Cliente")
+        self.p.add_stock(self.meta)
+        self.p.add_stock(self.aapl)
+        self.p.set_holdings("META", 10)
+        self.p.set_holdings("AAPL", 10)
+        self.p.set_target_allocation({"META": 0.5, "AAPL": 0.5})
+        self.registry = StockRegistry()
+        self.registry.register(self.p)
+        self.registry.rebalance_dirty()
+        self.feed = PriceFeed([self.meta, self.aapl], self.registry, tolerance=0.01, window=0.01)
+
+    def test_emits_signal_when_drift_crosses_tolerance(self):
+        batches = asyncio.run(collect(self.feed, from_list([("META", 100.5), ("META", 150.0)])))
+        self.assertEqual(len(batches), 1)
+        [(portfolio, actions)] = batches[0]
+        self.assertIs(portfolio, self.p)
+        self.assertEqual({a.name: a.action for a in actions}, {"META": Action.SELL, "AAPL": Action.BUY})
+        # Los dos ticks de META se agrupan en uno
+        self.assertEqual(self.feed.stats.coalesced, 1)
+        self.assertEqual(self.feed.stats.applied.count, 1)
+        self.assertEqual(self.meta.price, 150.0)
+
+    def test_no_signal_within_tolerance(self):
+        batches = asyncio.run(collect(self.feed, from_list([("META", 100.5)])))
+        self.assertEqual(batches, [])
+        self.assertEqual(self.feed.stats.signals, 0)
+
+    def test_rejects_unknown_and_invalid_ticks(self):
+        """Caso de Borde: ticker desconocido y precio negativo no detienen el pipeline"""
+        asyncio.run(collect(self.feed, from_list([("TSLA", 10.0), ("AAPL", -1.0)])))
+        self.assertEqual(self.feed.stats.rejected, 2)
+        self.assertEqual(self.aapl.price, 100.0)
+
+    def test_bounded_queue_with_slow_consumer(self):
+        """Con una cola de 1 elemento y un consumidor lento se procesan todos los ticks"""
+        feed = PriceFeed([self.meta, self.aapl], self.registry, window=0, max_queue=1)
+        ticks = [("META", 100.0 + 20 * (i % 2)) for i in range(50)]
+
+        async def slow():
+            async for _ in feed.run(from_list(ticks)):
+                await asyncio.sleep(0.001)
+
+        asyncio.run(slow())
+        self.assertEqual(feed.stats.received.count, 50)
+        self.assertGreater(feed.stats.signals, 0)
+
+    def test_source_error_propagates(self):
+        async def broken():
+            yield ("META", 101.0)
+            raise RuntimeError("fuente caida")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(collect(self.feed, broken()))
+
+    def test_replay_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            jsonl = os.path.join(tmp, "ticks.jsonl")
+            with open(jsonl, "w") as f:
+                f.write(json.dumps({"ticker": "META", "price": 1.5}) + "\n\n")
+            csv_path = os.path.join(tmp, "ticks.csv")
+            with open(csv_path, "w") as f:
+                f.write("ticker,price\nAAPL,2.5\n")
+
+            async def read_all(source):
+                return [tick async for tick in source]
+
+            self.assertEqual(asyncio.run(read_all(replay_jsonl(jsonl))), [("META", 1.5)])
+            self.assertEqual(asyncio.run(read_all(replay_csv(csv_path))), [("AAPL", 2.5)])
+
+    def test_read_stream(self):
+        async def run():
+            reader = asyncio.StreamReader()
+            reader.feed_data(b"META,120.0\n\nAAPL,90\n")
+            reader.feed_eof()
+            return [tick async for tick in read_stream(reader)]
+
+        self.assertEqual(asyncio.run(run()), [("META", 120.0), ("AAPL", 90.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import io
+import json
+import unittest
+
+from portfolio import Portfolio
+from rebalance import Action, Rebalance
+from rebalance_plan import RebalancePlan
+from stock import Stock
+
+
+class TestRebalancePlan(unittest.TestCase):
+    """Test cases para el plan de rebalanceo por columnas"""
+
+    def setUp(self):
+        self.actions = [
+            Rebalance("META", Action.SELL, 2.0, 1000.0),
+            Rebalance("AAPL", Action.BUY, 5.0, 900.0),
+            Rebalance("TSLA", Action.BUY, 1.0, 100.0),
+        ]
+        self.plan = RebalancePlan.from_actions(self.actions)
+
+    def test_behaves_like_list(self):
+        self.assertEqual(len(self.plan), 3)
+        self.assertTrue(self.plan)
+        self.assertFalse(RebalancePlan())
+        self.assertEqual(self.plan, self.actions)
+        self.assertEqual(self.actions, self.plan)
+        self.assertEqual(list(self.plan), self.actions)
+        self.assertEqual(self.plan[1], self.actions[1])
+        self.assertEqual(self.plan[-1], self.actions[-1])
+        self.assertEqual(self.plan[1:], self.actions[1:])
+        self.assertNotEqual(self.plan, self.actions[:2])
+        with self.assertRaises(IndexError):
+            self.plan[3]
+
+    def test_filter_and_sort(self):
+        self.assertEqual(self.plan.buys(), self.actions[1:])
+        self.assertEqual(self.plan.sells(), self.actions[:1])
+        self.assertEqual(self.plan.filter(action=Action.BUY, min_value=500), [self.actions[1]])
+        self.assertEqual(self.plan.filter(names=["TSLA", "META"]), [self.actions[0], self.actions[2]])
+        self.assertEqual(self.plan.sort_by("value"), [self.actions[2], self.actions[1], self.actions[0]])
+        self.assertEqual(self.plan.sort_by("name").names, ["AAPL", "META", "TSLA"])
+        self.assertEqual(self.plan.buy_value(), 1000.0)
+        self.assertEqual(self.plan.sell_value(), 1000.0)
+        with self.assertRaises(ValueError):
+            self.plan.sort_by("precio")
+
+    def test_export(self):
+        output = io.StringIO()
+        self.plan.to_csv(output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], "name,action,shares,value")
+        self.assertEqual(lines[1], "META,SELL,2.0,1000.0")
+        self.assertEqual(json.loads(self.plan.to_json())[1], {"name": "AAPL", "action": "BUY", "shares": 5.0, "value": 900.0})
+
+    def test_to_numpy(self):
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            self.skipTest("NumPy no esta instalado")
+        result = self.plan.to_numpy()
+        self.assertEqual(list(result["name"]), ["META", "AAPL", "TSLA"])
+        self.assertEqual(list(result["action"]), ["SELL", "BUY", "BUY"])
+        self.assertEqual(result["value"].sum(), 2000.0)
+
+    def test_rows_are_copies(self):
+        """Modificar una fila o una columna entregada no cambia el plan"""
+        row = self.plan[0]
+        row.shares = 99.0
+        self.plan.names.append("NVDA")
+        self.plan.shares[0] = 99.0
+        self.assertEqual(self.plan[0], self.actions[0])
+        self.assertEqual(len(self.plan), 3)
+
+    def test_from_arrays(self):
+        try:
+            import numpy as np
+        except ImportError:
+            self.skipTest("NumPy no esta instalado")
+        plan = RebalancePlan.from_arrays(["META", "AAPL", "TSLA"], np.array([False, True, True]),
+                                         np.array([2, 5, 1]), np.array([1000.0, 900.0, 100.0]))
+        self.assertEqual(plan, self.actions)
+        self.assertEqual(list(plan.buy_mask), [0, 1, 1])
+
+    def test_mismatched_columns(self):
+        """Caso de Borde: columnas de distinto largo"""
+        with self.assertRaises(ValueError):
+            RebalancePlan(["META"], [1], [1.0], [])
+
+    def test_portfolio_returns_plan(self):
+        meta, aapl = Stock("META", 520.5), Stock("AAPL", 185.25)
+        p = Portfolio("Jhano")
+        p.add_stocks([meta, aapl])
+        p.set_holdings_many({"META": 10, "AAPL": 30})
+        p.set_target_allocation({"META": 0.4, "AAPL": 0.6})
+        plan = p.rebalance()
+        self.assertIsInstance(plan, RebalancePlan)
+        self.assertEqual([a.action for a in plan], [Action.SELL, Action.BUY])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from portfolio import Portfolio
+from rebalance import Action
+from rebalance_service import RebalanceClient, RebalanceService
+from stock import Stock
+
+
+class TestRebalanceService(unittest.TestCase):
+    """Test cases para el servicio residente de rebalanceo"""
+
+    def setUp(self):
+        self.meta = Stock("META", 520.5)
+        self.aapl = Stock("AAPL", 185.25)
+        self.p = Portfolio("Jhano")
+        self.p.add_stocks([self.meta, self.aapl])
+        self.p.set_holdings_many({"META": 10, "AAPL": 30})
+        self.p.set_target_allocation({"META": 0.4, "AAPL": 0.6})
+        self.service = RebalanceService([self.p])
+
+    def run_with_client(self, scenario, unix=False):
+        async def main():
+            if unix:
+                with tempfile.TemporaryDirectory() as tmp:
+                    path = os.path.join(tmp, "rebalance.sock")
+                    server = await self.service.start_unix(path)
+                    async with server, await RebalanceClient.connect_unix(path) as client:
+                        return await scenario(client)
+            server = await self.service.start_tcp()
+            host, port = server.sockets[0].getsockname()[:2]
+            async with server, await RebalanceClient.connect_tcp(host, port) as client:
+                return await scenario(client)
+        return asyncio.run(main())
+
+    def test_handle(self):
+        self.assertEqual(self.service.handle("PING"), "OK PONG")
+        self.assertEqual(self.service.handle("PRICE META 600"), "OK")
+        self.assertEqual(self.meta.price, 600.0)
+        self.assertEqual(self.service.handle("HOLD Jhano AAPL 10"), "OK")
+        self.assertEqual(self.p.holdings["AAPL"], 10.0)
+        self.assertEqual(self.service.handle("TARGET Jhano META=0.5 AAPL=0.5"), "OK")
+        self.assertEqual(dict(self.p.target_allocation), {"META": 0.5, "AAPL": 0.5})
+
+    def test_errors(self):
+        """Caso de Borde: pedidos invalidos responden ERR y no cierran la conexion"""
+        self.assertEqual(self.service.handle(""), "ERR Pedido vacio")
+        self.assertTrue(self.service.handle("FOO").startswith("ERR"))
+        self.assertEqual(self.service.handle("REBAL Nadie"), "ERR El portafolio Nadie no existe")
+        self.assertTrue(self.service.handle("PRICE META -1").startswith("ERR"))
+        self.assertTrue(self.service.handle("PRICE META").startswith("ERR"))
+        self.assertTrue(self.service.handle("PRICE META abc").startswith("ERR"))
+        self.assertTrue(self.service.handle("HOLD Jhano META nan").startswith("ERR"))
+        self.assertTrue(self.service.handle("HOLD Jhano META inf").startswith("ERR"))
+        self.assertEqual(self.p.holdings["META"], 10)
+
+    def test_conflicting_stock(self):
+        """Caso de Borde: otro Stock con un ticker ya registrado se rechaza (PRICE no le llegaria)"""
+        other = Portfolio("Otro")
+        other.add_stock(Stock("META", 1.0))
+        with self.assertRaises(ValueError):
+            self.service.add_portfolio(other)
+        self.assertTrue(self.service.handle("REBAL Otro").startswith("ERR"))
+        shared = Portfolio("Compartido")
+        shared.add_stocks([self.meta, Stock("TSLA", 100.0)])
+        self.service.add_portfolio(shared)
+        self.assertEqual(self.service.handle("PRICE TSLA 120"), "OK")
+
+    def test_invalid_utf8(self):
+        """Caso de Borde: bytes que no son UTF-8 responden ERR sin cerrar la conexion"""
+        self.assertTrue(self.service.handle(b"PRICE META \xff\n").startswith("ERR"))
+
+        async def main():
+            server = await self.service.start_tcp()
+            host, port = server.sockets[0].getsockname()[:2]
+            async with server:
+                reader, writer = await asyncio.open_connection(host, port)
+                writer.write(b"\xff\xfe\nPING\n")
+                responses = [await reader.readline(), await reader.readline()]
+                writer.close()
+                await writer.wait_closed()
+                return responses
+        bad, ping = asyncio.run(main())
+        self.assertTrue(bad.startswith(b"ERR"))
+        self.assertEqual(ping, b"OK PONG\n")
+
+    def test_client_rebalance_matches_portfolio(self):
+        async def scenario(client):
+            await client.price("META", 550.0)
+            return await client.rebalance("Jhano"), await client.report("Jhano")
+        actions, (total, allocation) = self.run_with_client(scenario)
+        self.assertEqual(actions, self.p.rebalance())
+        self.assertEqual({a.action for a in actions}, {Action.BUY, Action.SELL})
+        self.assertEqual(total, self.p.get_total_value())
+        self.assertEqual(allocation, self.p.get_current_allocation())
+
+    def test_pipelining_over_unix_socket(self):
+        async def scenario(client):
+            return await client.pipeline(["PING", "HOLD Jhano META 1", "BAD", "REBAL Jhano 0.5", "PING"])
+        responses = self.run_with_client(scenario, unix=True)
+        self.assertEqual(responses[0], "OK PONG")
+        self.assertEqual(responses[1], "OK")
+        self.assertTrue(responses[2].startswith("ERR"))
+        self.assertEqual(responses[4], "OK PONG")
+        self.assertEqual(self.p.holdings["META"], 1.0)
+
+    def test_concurrent_clients(self):
+        async def main():
+            server = await self.service.start_tcp()
+            host, port = server.sockets[0].getsockname()[:2]
+
+            async def client_session(i):
+                async with await RebalanceClient.connect_tcp(host, port) as client:
+                    latencies = []
+                    for _ in range(50):
+                        start = time.perf_counter()
+                        await client.rebalance("Jhano")
+                        latencies.append(time.perf_counter() - start)
+                    return latencies
+
+            async with server:
+                return await asyncio.gather(*(client_session(i) for i in range(10)))
+        latencies = [l for session in asyncio.run(main()) for l in session]
+        self.assertEqual(len(latencies), 500)
+        self.assertEqual(self.service.requests, 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+from portfolio import Portfolio
+from rebalance_plan import RebalancePlan
+from stock import Stock
+
+try:
+    import numpy as np
+    from scenario_engine import ScenarioEngine
+except ImportError:  # NumPy es opcional
+    np = None
+
+
+@unittest.skipIf(np is None, "NumPy no esta instalado")
+class TestScenarioEngine(unittest.TestCase):
+    """Test cases para el motor de escenarios"""
+
+    def setUp(self):
+        self.stocks = [Stock("META", 500.0), Stock("AAPL", 200.0), Stock("TSLA", 100.0)]
+        self.p = Portfolio("Escenarios")
+        self.p.add_stocks(self.stocks)
+        self.p.set_holdings_many({"META": 10, "AAPL": 25, "TSLA": 5})
+        self.p.set_target_allocation({"META": 0.5, "AAPL": 0.5})  # TSLA sin objetivo
+        self.engine = ScenarioEngine(self.p)
+
+    def test_matches_rebalance_without_touching_state(self):
+        rng = np.random.default_rng(1)
+        prices = self.engine.shocked_prices(rng.normal(0, 0.2, size=(200, 3)))
+        result = self.engine.run(prices, tolerance=0.02, chunk_size=17)
+        self.assertEqual(len(result), 200)
+
+        # El portafolio y las acciones no cambian
+        self.assertEqual([s.price for s in self.stocks], [500.0, 200.0, 100.0])
+        self.assertEqual(self.p.get_total_value(), 10500.0)
+
+        # Comparar contra rebalance real, cambiando precios y volviendolos atras
+        for i in (0, 57, 199):
+            for stock, price in zip(self.stocks, prices[i]):
+                stock.update_price(float(price))
+            self.assertAlmostEqual(result.total_values[i], self.p.get_total_value())
+            np.testing.assert_allclose(result.allocations[i], list(self.p.get_current_allocation().values()))
+            expected = self.p.rebalance(0.02)
+            actual = result.actions(i)
+            self.assertIsInstance(actual, RebalancePlan)
+            self.assertEqual([(a.name, a.action) for a in actual], [(e.name, e.action) for e in expected])
+            for a, e in zip(actual, expected):
+                self.assertAlmostEqual(a.shares, e.shares)
+                self.assertAlmostEqual(a.value, e.value)
+            for stock, price in zip(self.stocks, (500.0, 200.0, 100.0)):
+                stock.update_price(price)
+
+    def test_chunked_iteration(self):
+        prices = np.tile(self.engine.prices, (25, 1))
+        chunks = list(self.engine.iter_run(prices, chunk_size=10))
+        self.assertEqual([len(c) for c in chunks], [10, 10, 5])
+
+    def test_zero_value_scenario(self):
+        """Caso de Borde: escenario donde todo vale 0 no genera acciones"""
+        result = self.engine.run(np.zeros((1, 3)))
+        self.assertEqual(result.actions(0), [])
+        self.assertEqual(result.total_values[0], 0.0)
+
+    def test_invalid_prices(self):
+        with self.assertRaises(ValueError):
+            self.engine.run(np.ones((2, 2)))
+        with self.assertRaises(ValueError):
+            self.engine.run(-np.ones((2, 3)))
+
+    def test_requires_target(self):
+        with self.assertRaises(ValueError):
+            ScenarioEngine(Portfolio("Sin objetivo"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+from portfolio import Portfolio
+from stock import Stock
+from stock_registry import StockRegistry
+
+
+class TestStockRegistry(unittest.TestCase):
+    """Test cases para el indice inverso de acciones a portafolios"""
+
+    def setUp(self):
+        self.meta = Stock("META", 500.0)
+        self.aapl = Stock("AAPL", 200.0)
+        self.tsla = Stock("TSLA", 100.0)
+
+        self.p1 = Portfolio("Uno")
+        self.p1.add_stock(self.meta)
+        self.p1.add_stock(self.aapl)
+        self.p1.set_holdings("META", 10)
+        self.p1.set_target_allocation({"META": 0.5, "AAPL": 0.5})
+
+        self.p2 = Portfolio("Dos")
+        self.p2.add_stock(self.aapl)
+        self.p2.add_stock(self.tsla)  # TSLA sin acciones ni objetivo
+        self.p2.set_holdings("AAPL", 5)
+        self.p2.set_target_allocation({"AAPL": 1.0})
+
+        self.registry = StockRegistry()
+        self.registry.register(self.p1)
+        self.registry.register(self.p2)
+        self.registry.rebalance_dirty()
+
+    def test_holders(self):
+        self.assertEqual(self.registry.holders(self.meta), {self.p1})
+        self.assertEqual(self.registry.holders(self.aapl), {self.p1, self.p2})
+        # Sin acciones ni objetivo no cuenta como tenedor
+        self.assertEqual(self.registry.holders(self.tsla), frozenset())
+
+    def test_price_update_marks_only_holders(self):
+        self.meta.update_price(600.0)
+        self.assertEqual(self.registry.dirty, [self.p1])
+        self.tsla.update_price(50.0)
+        self.assertEqual(self.registry.dirty, [self.p1])
+
+    def test_holdings_changes_update_index(self):
+        self.p2.set_holdings("TSLA", 3)
+        self.assertEqual(self.registry.holders(self.tsla), {self.p2})
+        self.p2.set_holdings("TSLA", 0)
+        self.assertEqual(self.registry.holders(self.tsla), frozenset())
+        self.assertEqual(self.registry.dirty, [self.p2])
+
+    def test_target_changes_update_index(self):
+        self.p1.set_target_allocation({"META": 1.0})
+        # AAPL: sin acciones y ya sin objetivo
+        self.assertEqual(self.registry.holders(self.aapl), {self.p2})
+
+    def test_rebalance_dirty(self):
+        self.meta.update_price(600.0)
+        results = self.registry.rebalance_dirty()
+        self.assertEqual(list(results), [self.p1])
+        self.assertEqual(results[self.p1], self.p1.rebalance())
+        self.assertEqual(self.registry.dirty, [])
+
+    def test_rebalance_dirty_skips_invalid(self):
+        """Caso de Borde: portafolio pendiente sin valor no aparece en el resultado"""
+        self.p1.set_holdings("META", 0)
+        self.assertEqual(self.registry.rebalance_dirty(), {})
+
+    def test_still_subscribed_after_resync(self):
+        """Recalcular el total desde cero no debe perder las suscripciones del portafolio"""
+        for i in range(Portfolio._RESYNC_INTERVAL + 1):
+            self.meta.update_price(500.0 + i % 2)
+        self.registry.rebalance_dirty()
+        self.p1.set_holdings("AAPL", 1)
+        self.assertEqual(self.registry.dirty, [self.p1])
+
+    def test_unregister(self):
+        self.registry.unregister(self.p1)
+        self.meta.update_price(600.0)
+        self.assertEqual(self.registry.holders(self.meta), frozenset())
+        self.assertEqual(self.registry.dirty, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+
+from portfolio import Portfolio
+from stock import Stock
+from stock_universe import StockUniverse
+
+
+class TestStockUniverse(unittest.TestCase):
+    """Test cases para el universo de acciones en arreglos"""
+
+    def setUp(self):
+        self.u = StockUniverse()
+        self.ids = self.u.add_many(["META", "AAPL", "GOOG"], [500.0, 200.0, 100.0])
+
+    def test_add_and_lookup(self):
+        self.assertEqual(self.ids, [0, 1, 2])
+        self.assertEqual(len(self.u), 3)
+        self.assertEqual(self.u.id_of("AAPL"), 1)
+        self.assertEqual(self.u.name_of(2), "GOOG")
+        self.assertEqual(self.u.price(0), 500.0)
+        self.assertIn("META", self.u)
+        self.assertNotIn("TSLA", self.u)
+        # Agregar un ticker existente retorna el mismo id
+        self.assertEqual(self.u.add("META", 1.0), 0)
+        self.assertEqual(self.u.price(0), 500.0)
+
+    def test_many_instruments(self):
+        ids = self.u.add_many([f"T{i}" for i in range(5000)], [float(i) for i in range(5000)])
+        self.assertEqual(ids, list(range(3, 5003)))
+        self.assertEqual(self.u.id_of("T4321"), 4324)
+        self.assertEqual(self.u.price(self.u.id_of("T4321")), 4321.0)
+        self.assertEqual(self.u.id_of("META"), 0)
+
+    def test_invalid_values(self):
+        """Casos de Borde: precio negativo, ticker o id inexistente"""
+        with self.assertRaises(ValueError):
+            self.u.add_many(["TSLA", "BAD"], [10.0, -1.0])
+        self.assertNotIn("TSLA", self.u)  # No se agrego nada
+        with self.assertRaises(ValueError):
+            self.u.id_of("TSLA")
+        with self.assertRaises(ValueError):
+            self.u.stock(99)
+
+    def test_stock_handle(self):
+        meta = self.u.stock("META")
+        self.assertIsInstance(meta, Stock)
+        self.assertIs(self.u.stock(0), meta)
+        self.assertEqual((meta.name, meta.price, meta.id), ("META", 500.0, 0))
+        meta.update_price(510.0)
+        self.assertEqual(self.u.price(0), 510.0)
+        with self.assertRaises(ValueError):
+            meta.update_price(-1.0)
+        self.assertFalse(hasattr(meta, "__dict__"))
+
+    def test_bulk_update_notifies_portfolios(self):
+        p = Portfolio("Universo", universe=self.u)
+        p.add_instrument(0)
+        p.add_instrument(1)
+        p.set_holdings_by_id(0, 2)
+        p.set_holdings_by_id(1, 5)
+        self.assertEqual(p.get_total_value(), 2000.0)
+
+        self.u.update_prices([0, 1, 2], [600.0, 100.0, 50.0])
+        self.assertEqual(p.get_total_value(), 1700.0)
+        self.assertEqual(self.u.price(2), 50.0)
+        with self.assertRaises(ValueError):
+            self.u.update_prices([0, 7], [1.0, 1.0])
+        self.assertEqual(self.u.price(0), 600.0)
+
+    def test_watch_by_id(self):
+        """Suscripciones por id: avisan con el precio anterior sin crear el Stock del instrumento"""
+        calls = []
+
+        class Watcher:
+            def on_instrument_update(self, universe, instrument_id, old_price):
+                calls.append((instrument_id, old_price, universe.price(instrument_id)))
+
+        watcher = Watcher()
+        self.u.watch(1, watcher)
+        self.u.update_prices([0, 1], [510.0, 210.0])
+        self.u.update_prices([1], [210.0])  # Mismo precio, no se avisa
+        self.u.stock(1).update_price(220.0)
+        self.u.unwatch(1, watcher)
+        self.u.update_prices([1], [230.0])
+        self.assertEqual(calls, [(1, 200.0, 210.0), (1, 210.0, 220.0)])
+        with self.assertRaises(ValueError):
+            self.u.watch(7, watcher)
+
+    def test_watchers_stay_bounded(self):
+        """Portafolios temporales sobre un mismo id no dejan referencias muertas en el universo"""
+        alive = []
+        for i in range(3000):
+            p = Portfolio(f"Cliente {i}", universe=self.u)
+            p.add_instrument(0)
+            if i % 100 == 0:
+                alive.append(p)
+        del p
+        self.assertEqual(len(self.u._watchers[0].data), len(alive))
+        alive.clear()
+        self.u.update_prices([0], [1.0])
+        self.assertFalse(self.u._watchers[0])
+
+    def test_portfolio_keeps_no_stock_per_position(self):
+        """Los portafolios con universo no crean un Stock por posicion, y solo aceptan acciones del universo"""
+        p = Portfolio("Universo", universe=self.u)
+        p.add_instruments([0, 2])
+        p.set_holdings_many({"META": 1, "GOOG": 3})
+        self.assertIn("GOOG", p.stocks)
+        self.assertNotIn("AAPL", p.stocks)
+        self.assertEqual(p.get_total_value(), 800.0)
+        self.assertEqual(self.u._handles, {})
+        with self.assertRaises(ValueError):
+            p.add_stock(Stock("TSLA", 10.0))
+        other = StockUniverse()
+        with self.assertRaises(ValueError):
+            p.add_stock(other.stock(other.add("META", 1.0)))
+        with self.assertRaises(ValueError):
+            p.add_instrument(9)
+
+    def test_portfolio_without_universe(self):
+        """Caso de Borde: usar ids en un portafolio sin universo"""
+        with self.assertRaises(ValueError):
+            Portfolio("Sin universo").add_instrument(0)
+
+    def test_prices_view(self):
+        view = self.u.prices
+        self.assertEqual(list(view), [500.0, 200.0, 100.0])
+        with self.assertRaises(TypeError):
+            view[0] = 1.0
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+from portfolio import Portfolio
+from rebalance import Action, Rebalance
+from rebalance_plan import RebalancePlan
+from stock import Stock
+from stock_registry import StockRegistry
+from trade_netting import TradeNetter
+
+
+class TestTradeNetting(unittest.TestCase):
+    """Test cases para la compensacion de operaciones entre portafolios"""
+
+    def setUp(self):
+        self.netter = TradeNetter()
+
+    def test_nets_opposite_trades(self):
+        self.netter.add("A", [Rebalance("META", Action.SELL, 3.0, 300.0), Rebalance("AAPL", Action.BUY, 2.0, 40.0)])
+        self.netter.add("B", [Rebalance("META", Action.BUY, 5.0, 500.0)])
+        self.netter.add("C", [Rebalance("AAPL", Action.SELL, 2.0, 40.0)])
+
+        self.assertEqual(len(self.netter), 4)
+        self.assertEqual(self.netter.orders(), [Rebalance("META", Action.BUY, 2.0, 200.0)])
+        self.assertEqual(self.netter.gross("META"), (5.0, 3.0))
+        self.assertEqual(self.netter.crossed_shares("META"), 3.0)
+        self.assertEqual(self.netter.crossed_shares("AAPL"), 2.0)
+
+        allocation = self.netter.allocation_map()
+        self.assertEqual(allocation["META"], [("A", Rebalance("META", Action.SELL, 3.0, 300.0)),
+                                              ("B", Rebalance("META", Action.BUY, 5.0, 500.0))])
+        self.assertEqual([client for client, _ in allocation["AAPL"]], ["A", "C"])
+
+    def test_net_sell(self):
+        self.netter.add_many([[Rebalance("TSLA", Action.SELL, 4.0, 40.0)], [Rebalance("TSLA", Action.BUY, 1.0, 10.0)]])
+        self.assertEqual(self.netter.orders(), [Rebalance("TSLA", Action.SELL, 3.0, 30.0)])
+        # Con una lista de listas el cliente es la posicion
+        self.assertEqual([client for client, _ in self.netter.allocation_map()["TSLA"]], [0, 1])
+
+    def test_rounding_residue_is_netted(self):
+        """Caso de Borde: compras y ventas que se compensan salvo error de redondeo"""
+        self.netter.add("A", [Rebalance("META", Action.BUY, 0.1 + 0.2, 30.0)])
+        self.netter.add("B", [Rebalance("META", Action.SELL, 0.3, 30.0)])
+        self.assertEqual(self.netter.orders(), [])
+
+    def test_from_registry_batch(self):
+        meta, aapl = Stock("META", 100.0), Stock("AAPL", 100.0)
+        registry = StockRegistry()
+        portfolios = []
+        for i, (meta_shares, aapl_shares) in enumerate([(10, 0), (0, 10), (5, 5)]):
+            p = Portfolio(f"Cliente {i}")
+            p.add_stocks([meta, aapl])
+            p.set_holdings_many({"META": meta_shares, "AAPL": aapl_shares})
+            p.set_target_allocation({"META": 0.5, "AAPL": 0.5})
+            registry.register(p)
+            portfolios.append(p)
+        results = registry.rebalance_dirty()
+        self.netter.add_many(results)
+
+        self.assertEqual(len(self.netter), 4)
+        self.assertEqual(self.netter.orders(), [])  # Los dos primeros clientes se compensan por completo
+        allocation = self.netter.allocation_map()
+        self.assertEqual({client for client, _ in allocation["META"]}, {portfolios[0], portfolios[1]})
+
+    def test_add_plan_by_columns(self):
+        """Un RebalancePlan da el mismo resultado que la lista de Rebalance equivalente"""
+        actions = [Rebalance("META", Action.SELL, 3.0, 300.0), Rebalance("AAPL", Action.BUY, 2.0, 40.0)]
+        self.netter.add("A", RebalancePlan.from_actions(actions))
+        self.netter.add("B", [Rebalance("META", Action.BUY, 5.0, 500.0)])
+        expected = TradeNetter()
+        expected.add("A", actions)
+        expected.add("B", [Rebalance("META", Action.BUY, 5.0, 500.0)])
+        self.assertIsInstance(self.netter.orders(), RebalancePlan)
+        self.assertEqual(self.netter.orders(), expected.orders())
+        self.assertEqual(self.netter.allocation_map(), expected.allocation_map())
+
+    def test_clear(self):
+        self.netter.add("A", [Rebalance("META", Action.BUY, 1.0, 1.0)])
+        self.netter.clear()
+        self.assertEqual(len(self.netter), 0)
+        self.assertEqual(self.netter.orders(), [])
+        self.assertEqual(self.netter.tickers, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
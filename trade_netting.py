@@ -0,0 +1,128 @@
+from array import array
+from collections.abc import Hashable, Iterable, Mapping
+
+from portfolio import Portfolio
+from rebalance import Action, Rebalance
+from rebalance_plan import RebalancePlan
+
+
+class TradeNetter:
+    """ Junta las operaciones de rebalanceo de muchos clientes y las compensa por ticker:
+    si un cliente vende META y otro compra META, al mercado solo se envia la diferencia.
+
+    Los tickers y clientes se indexan con diccionarios y las cantidades se guardan en arreglos
+    (array) paralelos, sin crear un objeto por operacion, asi se pueden acumular millones de operaciones.
+    Cada operacion agregada queda registrada (cliente, ticker, acciones, valor) para poder
+    asignar de vuelta la orden neta a cada cliente."""
+
+    def __init__(self):
+        self._index : dict[str, int] = {} #Posicion de cada ticker en los arreglos por ticker
+        self._tickers : list[str] = []
+        self._buy_shares = array("d")
+        self._sell_shares = array("d")
+        self._buy_value = array("d")
+        self._sell_value = array("d")
+
+        self._client_index : dict[Hashable, int] = {}
+        self._clients : list[Hashable] = []
+        # Una fila por operacion, con acciones y valor con signo (positivo = compra)
+        self._action_client = array("I")
+        self._action_ticker = array("I")
+        self._action_shares = array("d")
+        self._action_value = array("d")
+
+    def __len__(self) -> int:
+        """ Cantidad de operaciones agregadas"""
+        return len(self._action_client)
+
+    @property
+    def tickers(self) -> list[str]:
+        return list(self._tickers)
+
+    def _ticker_id(self, name: str) -> int:
+        ticker_id = self._index.get(name)
+        if ticker_id is None:
+            ticker_id = self._index[name] = len(self._tickers)
+            self._tickers.append(name)
+            for column in (self._buy_shares, self._sell_shares, self._buy_value, self._sell_value):
+                column.append(0.0)
+        return ticker_id
+
+    def add(self, client: Hashable, actions: Iterable[Rebalance]) -> None:
+        """ Agrega las operaciones de un cliente (cualquier objeto hashable: Portfolio, nombre, fila del libro).
+        Los valores de todos los clientes se suman por ticker, por eso deben estar en USD.
+        Un RebalancePlan se lee por columnas, sin crear un Rebalance por operacion."""
+        if isinstance(client, Portfolio):
+            client.check_single_currency()
+        client_id = self._client_index.get(client)
+        if client_id is None:
+            client_id = self._client_index[client] = len(self._clients)
+            self._clients.append(client)
+        if isinstance(actions, RebalancePlan):
+            rows = zip(actions.names, actions.buy_mask, actions.shares, actions.values)
+        else:
+            rows = ((action.name, action.action == Action.BUY, action.shares, action.value) for action in actions)
+        for name, buy, shares, value in rows:
+            ticker_id = self._ticker_id(name)
+            if buy:
+                self._buy_shares[ticker_id] += shares
+                self._buy_value[ticker_id] += value
+                self._action_shares.append(shares)
+                self._action_value.append(value)
+            else:
+                self._sell_shares[ticker_id] += shares
+                self._sell_value[ticker_id] += value
+                self._action_shares.append(-shares)
+                self._action_value.append(-value)
+            self._action_client.append(client_id)
+            self._action_ticker.append(ticker_id)
+
+    def add_many(self, results: Mapping[Hashable, Iterable[Rebalance]] | Iterable[Iterable[Rebalance]]) -> None:
+        """ Agrega un lote completo: un diccionario cliente -> operaciones (ej: StockRegistry.rebalance_dirty)
+        o una lista de operaciones por cliente, donde el cliente es la posicion (ej: PortfolioBook.rebalance)"""
+        items = results.items() if isinstance(results, Mapping) else enumerate(results)
+        for client, actions in items:
+            self.add(client, actions)
+
+    def gross(self, name: str) -> tuple[float, float]:
+        """ Acciones compradas y vendidas (sin compensar) de un ticker"""
+        ticker_id = self._index[name]
+        return self._buy_shares[ticker_id], self._sell_shares[ticker_id]
+
+    def crossed_shares(self, name: str) -> float:
+        """ Acciones que se compensan entre clientes (no salen al mercado)"""
+        return min(self.gross(name))
+
+    def orders(self) -> RebalancePlan:
+        """ Ordenes netas por ticker, en el orden en que aparecieron los tickers.
+        Los tickers que se compensan por completo no generan orden."""
+        orders = RebalancePlan()
+        for ticker_id, name in enumerate(self._tickers):
+            buy, sell = self._buy_shares[ticker_id], self._sell_shares[ticker_id]
+            net = buy - sell
+            # Diferencias del orden del error de redondeo se consideran compensadas
+            if abs(net) <= 1e-9 * max(buy, sell):
+                continue
+            value = self._buy_value[ticker_id] - self._sell_value[ticker_id]
+            if net > 0:
+                orders.append(name, Action.BUY, net, value)
+            else:
+                orders.append(name, Action.SELL, -net, -value)
+        return orders
+
+    def allocation_map(self) -> dict[str, list[tuple[Hashable, Rebalance]]]:
+        """ Por ticker, la operacion de cada cliente que compone la orden neta, en el orden en que se agregaron"""
+        tickers, clients = self._tickers, self._clients
+        buy, sell = Action.BUY, Action.SELL
+        lists = [[] for _ in tickers]
+        for client_id, ticker_id, shares, value in zip(self._action_client, self._action_ticker,
+                                                       self._action_shares, self._action_value):
+            if shares >= 0:
+                action = Rebalance(tickers[ticker_id], buy, shares, value)
+            else:
+                action = Rebalance(tickers[ticker_id], sell, -shares, -value)
+            lists[ticker_id].append((clients[client_id], action))
+        return dict(zip(tickers, lists))
+
+    def clear(self) -> None:
+        self.__init__()
@@ -0,0 +1,258 @@
+from abc import abstractmethod
+from array import array
+from collections.abc import ItemsView, Iterable, Iterator, Mapping, ValuesView
+
+from rebalance import Action
+from rebalance_plan import RebalancePlan
+
+
+class UniversePositions:
+    """ Posiciones de un Portfolio con StockUniverse, guardadas por id de instrumento.
+    En vez de diccionarios por ticker y un Stock por posicion se usan arreglos paralelos (id, cantidad, objetivo)
+    y un indice hash de id a posicion (direccionamiento abierto, como el del universo). El precio se lee
+    del arreglo del universo, asi cada posicion ocupa unas decenas de bytes.
+
+    Los calculos recorren las posiciones en el orden en que se agregaron, igual que Portfolio con diccionarios,
+    y entregan exactamente los mismos resultados."""
+
+    currency = "USD" #El universo guarda los precios en la moneda base
+    _EMPTY = -1
+    _MULTIPLIER = 0x9E3779B97F4A7C15 #Hash multiplicativo: ids consecutivos o con saltos quedan repartidos en la tabla
+
+    def __init__(self, universe):
+        self.universe = universe
+        self._ids = array("q") #Id de cada posicion
+        self._shares = array("d")
+        self._targets = array("d") #Vacio hasta que se fija una distribucion objetivo
+        self._has_target = bytearray()
+        self._target_positions = array("q") #Posiciones con objetivo, en el orden de set_target_allocation
+        self._table = array("i", [self._EMPTY]) * 8 #Indice id -> posicion, tamaño potencia de 2
+        self._shift = 64 - 3
+
+        # Vistas de solo lectura por ticker, como las de Portfolio con diccionarios
+        self.stocks = _StocksView(self)
+        self.holdings = _HoldingsView(self)
+        self.target_allocation = _TargetsView(self)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _slot(self, instrument_id: int) -> int:
+        """ Casilla de la tabla donde esta el id, o la casilla vacia donde iria"""
+        mask = len(self._table) - 1
+        slot = ((instrument_id * self._MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> self._shift
+        table, ids = self._table, self._ids
+        while True:
+            position = table[slot]
+            if position == self._EMPTY or ids[position] == instrument_id:
+                return slot
+            slot = (slot + 1) & mask
+
+    def _grow_table(self) -> None:
+        self._table = array("i", [self._EMPTY]) * (2 * len(self._table))
+        self._shift -= 1
+        table = self._table
+        for position, instrument_id in enumerate(self._ids):
+            table[self._slot(instrument_id)] = position
+
+    def find(self, instrument_id: int) -> int:
+        """ Posicion del id, o -1 si el portafolio no lo tiene"""
+        return self._table[self._slot(instrument_id)]
+
+    def position_of(self, name: str) -> int:
+        """ Posicion del ticker, o -1 si el portafolio (o el universo) no lo tiene"""
+        try:
+            return self.find(self.universe.id_of(name))
+        except ValueError:
+            return self._EMPTY
+
+    def add(self, instrument_id: int) -> bool:
+        """ Agrega el id con 0 acciones, retorna False si ya estaba"""
+        slot = self._slot(instrument_id)
+        if self._table[slot] != self._EMPTY:
+            return False
+        self._table[slot] = len(self._ids)
+        self._ids.append(instrument_id)
+        self._shares.append(0.0)
+        if self._targets:
+            self._targets.append(0.0)
+            self._has_target.append(0)
+        # Igual que en el universo, la tabla queda a lo mas medio llena
+        if 2 * len(self._ids) > len(self._table):
+            self._grow_table()
+        return True
+
+    def instrument_id(self, position: int) -> int:
+        return self._ids[position]
+
+    def name(self, position: int) -> str:
+        return self.universe.name_of(self._ids[position])
+
+    def names(self, positions: Iterable[int] | None = None) -> Iterator[str]:
+        name_of, ids = self.universe.name_of, self._ids
+        if positions is None:
+            return (name_of(instrument_id) for instrument_id in ids)
+        return (name_of(ids[position]) for position in positions)
+
+    def price(self, position: int) -> float:
+        return self.universe.price(self._ids[position])
+
+    def shares(self, position: int) -> float:
+        return self._shares[position]
+
+    def set_shares(self, position: int, shares: float) -> None:
+        self._shares[position] = shares
+
+    def target(self, position: int) -> float:
+        return self._targets[position] if self._targets else 0.0
+
+    def has_target(self, position: int) -> bool:
+        return bool(self._has_target[position]) if self._targets else False
+
+    def set_targets(self, positions: list[int], targets: Iterable[float]) -> None:
+        """ Reemplaza la distribucion objetivo. Se asume que ya fue validada por Portfolio."""
+        if not self._targets:
+            self._targets = array("d", bytes(8 * len(self._ids)))
+            self._has_target = bytearray(len(self._ids))
+        for position in self._target_positions:
+            self._targets[position] = 0.0
+            self._has_target[position] = 0
+        for position, target in zip(positions, targets):
+            self._targets[position] = target
+            self._has_target[position] = 1
+        self._target_positions = array("q", positions)
+
+    def target_positions(self) -> array:
+        return self._target_positions
+
+    def total_value(self) -> float:
+        """ Suma de cantidad * precio en el orden de las posiciones, igual que el recalculo de Portfolio"""
+        total = 0.0
+        with self.universe.prices as prices:
+            for instrument_id, shares in zip(self._ids, self._shares):
+                total += shares * prices[instrument_id]
+        return total
+
+    def current_allocation(self, total_value: float, rate: float | None) -> dict[str, float]:
+        name_of = self.universe.name_of
+        with self.universe.prices as prices:
+            if rate is None:
+                return {name_of(instrument_id): shares * prices[instrument_id] / total_value
+                        for instrument_id, shares in zip(self._ids, self._shares)}
+            return {name_of(instrument_id): shares * prices[instrument_id] * rate / total_value
+                    for instrument_id, shares in zip(self._ids, self._shares)}
+
+    def max_drift(self, total_value: float, rate: float | None) -> float:
+        ids, shares, targets = self._ids, self._shares, self._targets
+        drift = 0.0
+        with self.universe.prices as prices:
+            for position in self._target_positions:
+                value = shares[position] * prices[ids[position]]
+                if rate is not None:
+                    value *= rate
+                drift = max(drift, abs(targets[position] * total_value - value) / total_value)
+        return drift
+
+    def rebalance(self, total_value: float, tolerance: float, rate: float | None) -> RebalancePlan:
+        """ Mismo ciclo que Portfolio.rebalance, sobre los arreglos"""
+        ids, shares, targets = self._ids, self._shares, self._targets
+        name_of = self.universe.name_of
+        actions = RebalancePlan()
+        with self.universe.prices as prices:
+            for position in self._target_positions:
+                target_value = targets[position] * total_value
+                current_price = prices[ids[position]]
+                current_value = shares[position] * current_price
+                if rate is not None:
+                    current_price *= rate
+                    current_value *= rate
+                value_diff = target_value - current_value
+                if abs(value_diff) / total_value > tolerance:
+                    if value_diff > 0:
+                        actions.append(name_of(ids[position]), Action.BUY, value_diff / current_price, value_diff)
+                    else:
+                        actions.append(name_of(ids[position]), Action.SELL, -value_diff / current_price, -value_diff)
+        return actions
+
+
+class _PositionsView(Mapping):
+    """ Vista de solo lectura por ticker sobre las posiciones (se mantiene al dia, sin copiar).
+    Es abstracta (Mapping ya es un ABC): cada subclase define _value."""
+
+    def __init__(self, positions: UniversePositions):
+        self._positions = positions
+
+    def _order(self) -> Iterable[int]:
+        return range(len(self._positions))
+
+    def _has(self, position: int) -> bool:
+        return True
+
+    @abstractmethod
+    def _value(self, position: int):
+        """ Valor de la vista para la posicion (Stock, cantidad u objetivo)"""
+
+    def __len__(self) -> int:
+        return len(self._order())
+
+    def __iter__(self) -> Iterator[str]:
+        return self._positions.names(self._order())
+
+    def __contains__(self, name: object) -> bool:
+        # Sin pasar por __getitem__, que en la vista de acciones crearia el Stock
+        if not isinstance(name, str):
+            return False
+        position = self._positions.position_of(name)
+        return position >= 0 and self._has(position)
+
+    def __getitem__(self, name: str):
+        position = self._positions.position_of(name)
+        if position < 0 or not self._has(position):
+            raise KeyError(name)
+        return self._value(position)
+
+    def items(self) -> ItemsView:
+        return _ItemsView(self)
+
+    def values(self) -> ValuesView:
+        return _ValuesView(self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+
+class _ItemsView(ItemsView):
+    # Recorre por posicion, sin volver a buscar cada ticker
+    def __iter__(self):
+        mapping = self._mapping
+        order = mapping._order()
+        return zip(mapping._positions.names(order), map(mapping._value, order))
+
+
+class _ValuesView(ValuesView):
+    def __iter__(self):
+        mapping = self._mapping
+        return map(mapping._value, mapping._order())
+
+
+class _StocksView(_PositionsView):
+    """ Stock de cada posicion, se crean solo al pedirlos (y el universo los reutiliza)"""
+
+    def _value(self, position: int):
+        return self._positions.universe.stock(self._positions.instrument_id(position))
+
+
+class _HoldingsView(_PositionsView):
+    def _value(self, position: int) -> float:
+        return self._positions.shares(position)
+
+
+class _TargetsView(_PositionsView):
+    def _order(self) -> Iterable[int]:
+        return self._positions.target_positions()
+
+    def _has(self, position: int) -> bool:
+        return self._positions.has_target(position)
+
+    def _value(self, position: int) -> float:
+        return self._positions.target(position)